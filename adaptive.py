@@ -0,0 +1,276 @@
+"""
+Adaptive Difficulty
+===================
+
+Picks each question to match the player's current skill instead of the
+fixed easy -> medium -> hard progression.
+
+Skills and difficulties share one logit scale (a Rasch / 1PL IRT model
+updated online, Elo style). A player with skill s answers a question of
+difficulty d correctly with probability 1 / (1 + exp(d - s)). After every
+answer both estimates move towards the result:
+
+    s += k_player * (correct - p)
+    d -= k_question * (correct - p)
+
+with step sizes that shrink as each estimate sees more answers. Skills are
+kept per player and category. Questions start from a prior for their
+difficulty label and then drift to how hard players actually find them.
+
+The next question targets TARGET_ACCURACY, i.e. difficulty s - logit(0.7).
+DifficultyIndex answers "closest live difficulty to the target, not yet seen
+by this player" in O(log B) for B difficulty buckets, plus an expected O(1)
+number of random picks inside a bucket to skip seen questions. Moving a
+question to a new bucket after an update is O(1), so a 1M-question bank and
+hundreds of concurrent players stay cheap:
+
+    engine = get_adaptive_engine(bank)
+    positions = engine.deal("Ada", ("History",), 5, exclude=seen_ids)
+    engine.record("Ada", positions[0], correct=True)
+    position = engine.next_question("Ada", ("History",), exclude=seen_ids)
+
+Estimates live in the process, like rooms. Skills survive a bank reload;
+question difficulties start again from the priors of the new bank.
+"""
+
+import bisect
+import math
+import random
+import threading
+from array import array
+
+TARGET_ACCURACY = 0.7
+DIFFICULTY_PRIORS = {'easy': -1.0, 'medium': 0.0, 'hard': 1.0}
+BUCKET_WIDTH = 0.25
+
+# (first step, floor) for skill and difficulty updates; steps decay with 1 / sqrt(answers)
+PLAYER_STEP = (0.6, 0.08)
+QUESTION_STEP = (0.4, 0.02)
+
+# Random picks tried per bucket before moving on, and the bucket size below which it is scanned instead
+BUCKET_TRIES = 8
+SCAN_LIMIT = 64
+
+
+def expected_accuracy(skill, difficulty):
+    """Probability that a player of this skill answers a question of this difficulty correctly"""
+    return 1.0 / (1.0 + math.exp(difficulty - skill))
+
+
+def step_size(step, answers):
+    first, floor = step
+    return max(floor, first / math.sqrt(1 + answers))
+
+
+def difficulty_label(difficulty):
+    """The easy/medium/hard label whose prior is closest to a live difficulty"""
+    return min(DIFFICULTY_PRIORS, key=lambda label: abs(DIFFICULTY_PRIORS[label] - difficulty))
+
+
+class DifficultyIndex:
+    """Bank positions bucketed by live difficulty, per category
+
+    Every bucket is an array of positions; each position remembers its bucket
+    and slot, so a position moves between buckets with a swap-remove and an
+    append. Each category keeps its bucket keys sorted for bisection.
+    """
+
+    def __init__(self, bank):
+        self.bank = bank
+        n = len(bank)
+        self.difficulty = array('d', bytes(8 * n))
+        self.answers = array('I', bytes(4 * n))
+        self.categories = []
+        # One code per category; imported banks can have more than a byte's worth
+        count = len({category for _, category in bank.by_category})
+        typecode = 'B' if count <= 1 << 8 else 'H' if count <= 1 << 16 else 'I'
+        self._category_of = array(typecode, bytes(array(typecode).itemsize * n))
+        self._bucket_of = array('i', bytes(4 * n))
+        self._slot_of = array('I', bytes(4 * n))
+        self._buckets = {}
+        self._keys = {}
+        difficulty, bucket_of, slot_of, category_of = self.difficulty, self._bucket_of, self._slot_of, self._category_of
+        for (label, category), view in bank.by_category.items():
+            prior = DIFFICULTY_PRIORS.get(label, 0.0)
+            key = self._key(prior)
+            if category not in self._buckets:
+                self.categories.append(category)
+            code = self.categories.index(category)
+            buckets = self._buckets.setdefault(category, {})
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = array('I')
+                bisect.insort(self._keys.setdefault(category, []), key)
+            start = len(bucket)
+            bucket.extend(view.positions)
+            for slot, position in enumerate(view.positions, start):
+                difficulty[position] = prior
+                bucket_of[position] = key
+                slot_of[position] = slot
+                category_of[position] = code
+
+    @staticmethod
+    def _key(difficulty):
+        return math.floor(difficulty / BUCKET_WIDTH)
+
+    def __len__(self):
+        return len(self.difficulty)
+
+    def category_of(self, position):
+        return self.categories[self._category_of[position]]
+
+    def update(self, position, difficulty):
+        """Set a question's live difficulty, moving it to its new bucket if needed"""
+        self.difficulty[position] = difficulty
+        self.answers[position] += 1
+        key = self._key(difficulty)
+        old_key = self._bucket_of[position]
+        if key == old_key:
+            return
+        category = self.category_of(position)
+        buckets = self._buckets[category]
+
+        # Swap-remove from the old bucket
+        bucket = buckets[old_key]
+        slot = self._slot_of[position]
+        last = bucket.pop()
+        if last != position:
+            bucket[slot] = last
+            self._slot_of[last] = slot
+        if not bucket:
+            del buckets[old_key]
+            keys = self._keys[category]
+            del keys[bisect.bisect_left(keys, old_key)]
+
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = array('I')
+            bisect.insort(self._keys[category], key)
+        self._bucket_of[position] = key
+        self._slot_of[position] = len(bucket)
+        bucket.append(position)
+
+    def _pick(self, bucket, exclude, rng):
+        """A position from bucket whose question id is not in exclude, or None"""
+        record = self.bank.record
+        if len(bucket) <= SCAN_LIMIT:
+            candidates = [p for p in bucket if record(p).id not in exclude]
+            return rng.choice(candidates) if candidates else None
+        for _ in range(BUCKET_TRIES):
+            position = bucket[rng.randrange(len(bucket))]
+            if record(position).id not in exclude:
+                return position
+        return None
+
+    def closest(self, category, target, exclude=(), rng=random):
+        """(distance, position) of an unseen question in category nearest to target, or None"""
+        keys = self._keys.get(category)
+        if not keys:
+            return None
+        buckets = self._buckets[category]
+        # Walk outwards from the target's bucket, nearest bucket edge first, until no
+        # unvisited bucket can hold anything closer than the best question found
+        right = bisect.bisect_left(keys, self._key(target))
+        left = right - 1
+        best = None
+        while left >= 0 or right < len(keys):
+            left_gap = target - (keys[left] + 1) * BUCKET_WIDTH if left >= 0 else math.inf
+            right_gap = keys[right] * BUCKET_WIDTH - target if right < len(keys) else math.inf
+            if best is not None and min(left_gap, right_gap) >= best[0]:
+                break
+            if right_gap <= left_gap:
+                key, right = keys[right], right + 1
+            else:
+                key, left = keys[left], left - 1
+            position = self._pick(buckets[key], exclude, rng)
+            if position is not None:
+                distance = abs(self.difficulty[position] - target)
+                if best is None or distance < best[0]:
+                    best = (distance, position)
+        return best
+
+
+class SkillTable:
+    """Per player and category skill estimates, with the number of answers behind each"""
+
+    def __init__(self):
+        self._skills = {}
+
+    def get(self, player, category):
+        return self._skills.get((player.casefold(), category), (0.0, 0))
+
+    def set(self, player, category, skill, answers):
+        self._skills[(player.casefold(), category)] = (skill, answers)
+
+    def __len__(self):
+        return len(self._skills)
+
+
+class AdaptiveEngine:
+    """Chooses questions from one bank by player skill and learns from every answer"""
+
+    def __init__(self, bank, skills, target_accuracy=TARGET_ACCURACY):
+        self.bank = bank
+        self.skills = skills
+        self.index = DifficultyIndex(bank)
+        self.offset = math.log(target_accuracy / (1 - target_accuracy))
+        self._lock = threading.Lock()
+
+    def skill(self, player, category):
+        return self.skills.get(player, category)[0]
+
+    def target(self, player, category):
+        """Difficulty at which the player is expected to hit the target accuracy"""
+        return self.skill(player, category) - self.offset
+
+    def next_question(self, player, categories, exclude=(), rng=random):
+        """Position of the unseen question closest to the player's target across categories, or None"""
+        best = None
+        with self._lock:
+            for category in dict.fromkeys(categories):
+                found = self.index.closest(category, self.target(player, category), exclude, rng)
+                if found is not None and (best is None or found[0] < best[0]):
+                    best = found
+        return None if best is None else best[1]
+
+    def deal(self, player, categories, k, exclude=(), rng=random):
+        """Choose k distinct questions for a round, each at the player's current target"""
+        exclude = set(exclude)
+        positions = []
+        for _ in range(k):
+            position = self.next_question(player, categories, exclude, rng)
+            if position is None:
+                # Every question left has been seen; repeat the nearest ones
+                position = self.next_question(player, categories, {self.bank.record(p).id for p in positions}, rng)
+            if position is None:
+                raise ValueError(f"Need {k} questions, got {len(positions)}")
+            positions.append(position)
+            exclude.add(self.bank.record(position).id)
+        return positions
+
+    def record(self, player, position, correct):
+        """Update the player's skill and the question's difficulty after one answer, returning the new skill"""
+        index = self.index
+        with self._lock:
+            category = index.category_of(position)
+            skill, answers = self.skills.get(player, category)
+            difficulty = index.difficulty[position]
+            surprise = (1.0 if correct else 0.0) - expected_accuracy(skill, difficulty)
+            skill += step_size(PLAYER_STEP, answers) * surprise
+            self.skills.set(player, category, skill, answers + 1)
+            index.update(position, difficulty - step_size(QUESTION_STEP, index.answers[position]) * surprise)
+        return skill
+
+
+_skills = SkillTable()
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_adaptive_engine(bank):
+    """Return the shared engine for a bank, building its difficulty index on first use"""
+    with _engines_lock:
+        engine = _engines.get(bank.path)
+        if engine is None or engine.bank is not bank:
+            engine = _engines[bank.path] = AdaptiveEngine(bank, _skills)
+    return engine
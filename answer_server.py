@@ -0,0 +1,657 @@
+"""
+Answer Server
+=============
+
+A small asyncio service that takes answers without a Streamlit rerun.
+
+Clients send JSON messages over a WebSocket at /ws, or POST them to /answer
+over keep-alive HTTP. Each reply carries only the fields of the client's view
+that changed, so an answer costs one Game.answer() and a few hundred bytes
+instead of a full script run:
+
+    {"type": "start", "name": "Ada", "avatar": "⚔️"}
+    {"type": "answer", "game_id": "...", "question_id": 7, "choice": 2}
+    {"type": "next", "game_id": "..."}
+    {"type": "next_round", "game_id": "..."}
+
+WebSocket clients can also play in a game_rooms room they have joined in the
+app:
+
+    {"type": "join", "room": "AB3CD", "key": "..."}
+    {"type": "answer", "room": "AB3CD", "key": "...", "question_id": 7, "choice": 2}
+
+Question clocks run on the server: a question is stamped with
+time.monotonic() when it is sent, answers are timed from that stamp, and a
+question past its deadline times out on the next message for its game.
+
+Room answers are only buffered. When the host ticks or advances the room,
+every subscriber gets a diff of its own view pushed to it. A message may
+carry an "id", which is echoed in its reply.
+
+Room moves and pushes run on worker threads, since with a durable state
+store they wait on SQLite locks or journal fsyncs, and so does a deal that
+has to load the question bank. One slow writer then holds up only its own
+message, not every socket on the event loop.
+
+The server runs on its own (python answer_server.py) or in a background
+thread of the app process (ARENA_ANSWER_SERVER=host:port), where it shares
+the room store with the UI. It uses only the standard library, including a
+minimal RFC 6455 WebSocket: text, ping and close frames, no extensions.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import uuid
+
+from game_engine import new_game, new_player, GameError, ANSWERED, FINISHED, QUESTION
+from game_rooms import get_room, RoomError
+from question_bank import (get_question_bank, next_topic, question_bank_loaded, round_config, sample_positions,
+                           QUESTIONS_PATH)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+GAME_IDLE_SECONDS = 30 * 60
+SWEEP_INTERVAL_SECONDS = 60
+MAX_MESSAGE_BYTES = 64 * 1024
+LISTEN_BACKLOG = 4096
+WEBSOCKET_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+# WebSocket opcodes
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# JSON types a message field may have; anything else is refused before it reaches a game or room
+FIELD_TYPES = {
+    'type': (str,),
+    'game_id': (str,),
+    'room': (str,),
+    'key': (str,),
+    'question_id': (int, str),
+    'choice': (int, type(None)),
+}
+
+# Solo messages that deal a round, which may load or convert the question bank first
+DEALING_TYPES = ('start', 'next_round')
+
+HTTP_REASONS = {101: 'Switching Protocols', 200: 'OK', 400: 'Bad Request', 404: 'Not Found'}
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_background = None
+_background_lock = threading.Lock()
+
+
+class ProtocolError(Exception):
+    """Raised for a malformed request or frame; the connection is dropped"""
+
+
+class MessageError(Exception):
+    """Raised for a message that can't be applied; sent back to the client as an error"""
+
+
+def decode_message(data):
+    """Parse one raw JSON message, which must be an object"""
+    message = json.loads(data)
+    if not isinstance(message, dict):
+        raise MessageError("Messages must be JSON objects")
+    return message
+
+
+def check_fields(message):
+    """Refuse a message whose known fields have the wrong JSON type"""
+    for field, types in FIELD_TYPES.items():
+        if field in message:
+            value = message[field]
+            # JSON true/false would otherwise pass as the integers 1 and 0
+            if isinstance(value, bool) or not isinstance(value, types):
+                raise MessageError(f"Field {field!r} has the wrong type: {value!r:.40}")
+
+
+# --- WebSocket framing ---------------------------------------------------------
+
+def websocket_accept(key):
+    """Sec-WebSocket-Accept value for a client's Sec-WebSocket-Key"""
+    return base64.b64encode(hashlib.sha1(key.encode() + WEBSOCKET_GUID).digest()).decode()
+
+
+def _apply_mask(payload, mask):
+    """XOR payload with the repeating 4-byte mask"""
+    length = len(payload)
+    if not length:
+        return payload
+    key = (mask * (length // 4 + 1))[:length]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+
+
+def encode_frame(opcode, payload, mask=False):
+    """Build a single final frame; clients must mask what they send, servers must not"""
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, mask_bit | length)
+    elif length < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, mask_bit | 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, mask_bit | 127, length)
+    if mask:
+        key = os.urandom(4)
+        return header + key + _apply_mask(payload, key)
+    return header + payload
+
+
+async def read_frame(reader):
+    """Return (fin, opcode, payload) for the next frame"""
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack('!H', await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack('!Q', await reader.readexactly(8))
+    if length > MAX_MESSAGE_BYTES:
+        raise ProtocolError(f"Frame of {length} bytes is over the {MAX_MESSAGE_BYTES} byte limit")
+    key = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    return bool(first & 0x80), first & 0x0F, _apply_mask(payload, key) if key else payload
+
+
+async def read_message(reader, writer, mask=False):
+    """Return the next text message, answering pings on the way, or None once the peer closes"""
+    parts = []
+    size = 0
+    while True:
+        fin, opcode, payload = await read_frame(reader)
+        if opcode == OP_PING:
+            writer.write(encode_frame(OP_PONG, payload, mask))
+        elif opcode == OP_CLOSE:
+            return None
+        elif opcode in (OP_TEXT, OP_CONTINUATION):
+            parts.append(payload)
+            size += len(payload)
+            if size > MAX_MESSAGE_BYTES:
+                raise ProtocolError(f"Message is over the {MAX_MESSAGE_BYTES} byte limit")
+            if fin:
+                return b''.join(parts).decode('utf-8')
+        elif opcode != OP_PONG:
+            raise ProtocolError(f"Unsupported WebSocket opcode {opcode}")
+
+
+async def read_head(reader):
+    """Read an HTTP request or status line and its headers, with header names lowercased"""
+    data = await reader.readuntil(b'\r\n\r\n')
+    lines = data.decode('latin-1').split('\r\n')
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+async def open_websocket(host, port, path='/ws'):
+    """Connect to a WebSocket endpoint, returning (reader, writer) after the handshake"""
+    reader, writer = await asyncio.open_connection(host, port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write((
+        f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+    ).encode('latin-1'))
+    status, headers = await read_head(reader)
+    if status.split(' ')[1:2] != ['101'] or headers.get('sec-websocket-accept') != websocket_accept(key):
+        writer.close()
+        raise ProtocolError(f"WebSocket handshake failed: {status}")
+    return reader, writer
+
+
+# --- Game state ----------------------------------------------------------------
+
+class _Session:
+    """A solo game held by the service"""
+
+    __slots__ = ('game', 'records', 'topics', 'seen', 'view', 'updated')
+
+    def __init__(self, game):
+        self.game = game
+        self.records = ()
+        self.topics = []
+        self.seen = set()
+        self.view = {}
+        self.updated = time.monotonic()
+
+
+class _Subscriber:
+    """A WebSocket connection and the last room views pushed to it"""
+
+    __slots__ = ('writer', 'views')
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.views = {}
+
+    def send(self, message):
+        if not self.writer.is_closing():
+            self.writer.write(encode_frame(OP_TEXT, json.dumps(message).encode('utf-8')))
+
+
+def _player_fields(view, player):
+    view.update(hp=player.hp, max_hp=player.max_hp, xp=player.xp, streak=player.streak, shields=player.shields,
+                heals=player.heals, eliminated=player.eliminated, score=player.final_score)
+
+
+def _question_fields(view, record, revealed):
+    view.update(question_id=record['id'], text=record['question'], options=list(record['options']))
+    if revealed:
+        view['answer_index'] = record['answer_index']
+
+
+def game_view(session):
+    """Everything a client needs to render a solo game"""
+    game = session.game
+    view = {'phase': game.phase, 'round': game.round, 'question': game.question, 'time_limit': game.time_limit,
+            'last_correct': game.last_correct, 'outcome': game.last_outcome, 'elapsed': game.last_elapsed}
+    _player_fields(view, game.player)
+    if game.phase in (QUESTION, ANSWERED):
+        _question_fields(view, session.records[game.question], game.phase == ANSWERED)
+    if session.topics:
+        view.update(topic=session.topics[-1], difficulty=round_config(game.round, session.topics[-1])['difficulty'])
+    return view
+
+
+def room_view(room, key):
+    """Everything a client needs to render one player's side of a room"""
+    view = {'phase': room.phase, 'round': room.round, 'question': room.question, 'time_limit': room.time_limit,
+            'players': len(room.players),
+            'answered': room.has_answered(key), 'result': room.results.get(key) if room.phase == ANSWERED else None}
+    _player_fields(view, room.players[key])
+    record = room.current_question
+    if record is not None:
+        _question_fields(view, record, room.phase == ANSWERED)
+    return view
+
+
+def diff_views(old, new):
+    """Fields of new that differ from old; fields that disappeared are sent as None"""
+    diff = {key: value for key, value in new.items() if old.get(key, _MISSING) != value}
+    diff.update((key, None) for key in old.keys() - new.keys())
+    return diff
+
+
+class AnswerService:
+    """Applies JSON messages to solo games and rooms; knows nothing about sockets"""
+
+    def __init__(self, questions_path=QUESTIONS_PATH):
+        self.questions_path = questions_path
+        self.games = {}
+        self.answers = 0
+        self.connections = 0
+        self.loop = None
+        self._subscribers = {}
+        self._watchers = {}
+        self._subscribers_lock = threading.Lock()
+        self._pushing = {}
+        self._handlers = {'start': self._start, 'answer': self._answer, 'next': self._next,
+                          'next_round': self._next_round}
+
+    def dispatch(self, data, subscriber=None):
+        """Apply one raw JSON message and return the reply"""
+        try:
+            message = decode_message(data)
+            reply = self.handle(message, subscriber)
+        except (MessageError, ValueError) as e:
+            return {'error': str(e)}
+        if 'id' in message:
+            reply['id'] = message['id']
+        return reply
+
+    async def dispatch_async(self, data, subscriber=None):
+        """dispatch() for the event loop
+
+        Room messages can block on the state store (a SQLite transaction or a
+        journal fsync), so they run on a worker thread, as does a deal that
+        has to load the question bank first. Everything else stays on the
+        loop: handing it to a thread would only add GIL switches.
+        """
+        try:
+            message = decode_message(data)
+            dealing = message.get('type') in DEALING_TYPES and not question_bank_loaded(self.questions_path)
+            if 'room' in message or dealing:
+                reply = await asyncio.to_thread(self.handle, message, subscriber)
+            else:
+                reply = self.handle(message, subscriber)
+        except (MessageError, ValueError) as e:
+            return {'error': str(e)}
+        if 'id' in message:
+            reply['id'] = message['id']
+        return reply
+
+    def handle(self, message, subscriber=None):
+        """Apply one decoded message and return the reply"""
+        check_fields(message)
+        kind = message.get('type')
+        try:
+            if 'room' in message:
+                return self._handle_room(kind, message, subscriber)
+            handler = self._handlers.get(kind)
+            if handler is None:
+                raise MessageError(f"Unknown message type {kind!r}")
+            return handler(message)
+        except KeyError as e:
+            raise MessageError(f"Missing field {e}") from None
+        except (GameError, RoomError) as e:
+            raise MessageError(str(e)) from None
+
+    def _deal(self, session):
+        """Draw the session's current round with the app's round config and deal, and start its clock"""
+        bank = get_question_bank(self.questions_path)
+        game = session.game
+        config = round_config(game.round, next_topic(session.topics))
+        try:
+            positions = sample_positions(bank.select(config['difficulty'], config['categories']),
+                                         game.questions_per_round, session.seen)
+        except ValueError:
+            raise MessageError(f"Not enough {config['difficulty']} {config['topic']} questions available") from None
+        records = [bank.record(p) for p in positions]
+        session.game = game.deal(((q['id'], q['answer_index']) for q in records),
+                                 config['time_limit']).ask(time.monotonic())
+        session.records = records
+        session.topics.append(config['topic'])
+        session.seen.update(q['id'] for q in records)
+
+    def _session(self, message):
+        """Look up a message's game and apply any timeout that fell due since the last message"""
+        session = self.games.get(message['game_id'])
+        if session is None:
+            raise MessageError(f"Unknown game {message['game_id']!r}")
+        now = session.updated = time.monotonic()
+        session.game = session.game.expire(now)
+        return session
+
+    def _publish(self, game_id, session):
+        """Reply with what changed; a finished game is dropped once its final diff is out"""
+        view = game_view(session)
+        diff = diff_views(session.view, view)
+        session.view = view
+        if session.game.phase == FINISHED:
+            del self.games[game_id]
+        return {'game_id': game_id, 'diff': diff}
+
+    def _start(self, message):
+        name = str(message.get('name') or 'Player')[:40]
+        avatar = str(message.get('avatar') or '⚔️')[:8]
+        session = _Session(new_game(new_player(name, avatar)))
+        self._deal(session)
+        game_id = uuid.uuid4().hex
+        self.games[game_id] = session
+        session.view = game_view(session)
+        return {'game_id': game_id, 'state': session.view}
+
+    def _answer(self, message):
+        session = self._session(message)
+        # An answer that arrives after the deadline finds the question already timed out
+        if session.game.phase == QUESTION:
+            session.game = session.game.answer(message['question_id'], message['choice'], now=time.monotonic())
+            self.answers += 1
+        return self._publish(message['game_id'], session)
+
+    def _next(self, message):
+        session = self._session(message)
+        session.game = session.game.next().ask(time.monotonic())
+        return self._publish(message['game_id'], session)
+
+    def _next_round(self, message):
+        session = self._session(message)
+        session.game = session.game.next_round()
+        self._deal(session)
+        return self._publish(message['game_id'], session)
+
+    def _handle_room(self, kind, message, subscriber):
+        room = get_room(str(message['room']))
+        if room is None:
+            raise MessageError(f"Unknown room {message['room']!r}")
+        key = message['key']
+        if key not in room.players:
+            raise MessageError(f"Player {key!r} is not in room {room.code}")
+
+        if kind == 'join':
+            if subscriber is None:
+                raise MessageError("Joining a room needs a WebSocket connection")
+            self._subscribe(room, subscriber, key)
+            view = subscriber.views[room.code] = room_view(room, key)
+            return {'room': room.code, 'state': view}
+        if kind == 'answer':
+            room.expire()
+            accepted = room.submit(key, message['question_id'], message['choice'])
+            self.answers += accepted
+            return {'room': room.code, 'accepted': accepted}
+        raise MessageError(f"Unknown room message type {kind!r}")
+
+    def _subscribe(self, room, subscriber, key):
+        with self._subscribers_lock:
+            subscribers = self._subscribers.setdefault(room.code, {})
+            if not subscribers:
+                loop = self.loop
+                code = room.code
+
+                def watcher(_room):
+                    # Runs on whichever thread changed the room; the push is scheduled on the event loop
+                    loop.call_soon_threadsafe(self._push_room, code)
+
+                self._watchers[code] = (room, watcher)
+                room.watch(watcher)
+            subscribers[subscriber] = key
+
+    def unsubscribe(self, subscriber):
+        """Forget a closed connection's room subscriptions"""
+        with self._subscribers_lock:
+            for code in subscriber.views:
+                subscribers = self._subscribers.get(code, {})
+                subscribers.pop(subscriber, None)
+                if not subscribers:
+                    self._subscribers.pop(code, None)
+                    room, watcher = self._watchers.pop(code, (None, None))
+                    if room is not None:
+                        room.unwatch(watcher)
+
+    def _push_room(self, code):
+        """Push every subscriber of a room what changed in its view
+
+        Runs on the event loop. The room is read on a worker thread, one push
+        per room at a time; a change that lands meanwhile is pushed once the
+        current push is out, so diffs reach each client in order.
+        """
+        if code in self._pushing:
+            self._pushing[code] = True
+            return
+        self._pushing[code] = False
+        future = self.loop.run_in_executor(None, self._room_diffs, code)
+        future.add_done_callback(lambda done: self._pushed(code, done))
+
+    def _pushed(self, code, done):
+        if done.exception() is not None:
+            logger.warning("Room %s push failed: %s", code, done.exception())
+        else:
+            for subscriber, message in done.result():
+                subscriber.send(message)
+        if self._pushing.pop(code):
+            self._push_room(code)
+
+    def _room_diffs(self, code):
+        """[(subscriber, message)] with what changed in each subscriber's view of a room"""
+        room = get_room(code)
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers.get(code, {}).items())
+        messages = []
+        for subscriber, key in subscribers:
+            if room is None or key not in room.players:
+                continue
+            view = room_view(room, key)
+            diff = diff_views(subscriber.views.get(code, {}), view)
+            if diff:
+                subscriber.views[code] = view
+                messages.append((subscriber, {'room': code, 'diff': diff}))
+        return messages
+
+    def sweep(self, now=None):
+        """Drop solo games nobody has touched for GAME_IDLE_SECONDS"""
+        now = time.monotonic() if now is None else now
+        for game_id in [g for g, session in self.games.items() if now - session.updated > GAME_IDLE_SECONDS]:
+            del self.games[game_id]
+
+    def stats(self):
+        with self._subscribers_lock:
+            rooms = len(self._subscribers)
+        return {
+            'games': len(self.games),
+            'answers': self.answers,
+            'connections': self.connections,
+            'rooms': rooms
+        }
+
+
+# --- Transport -----------------------------------------------------------------
+
+def _write_response(writer, status, body, keep_alive=True):
+    payload = json.dumps(body).encode('utf-8')
+    writer.write((
+        f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    ).encode('latin-1') + payload)
+
+
+async def _serve_websocket(service, reader, writer, headers):
+    writer.write((
+        "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+        f"Sec-WebSocket-Accept: {websocket_accept(headers['sec-websocket-key'])}\r\n\r\n"
+    ).encode('latin-1'))
+    subscriber = _Subscriber(writer)
+    try:
+        while True:
+            text = await read_message(reader, writer)
+            if text is None:
+                writer.write(encode_frame(OP_CLOSE, b''))
+                return
+            subscriber.send(await service.dispatch_async(text, subscriber))
+            await writer.drain()
+    finally:
+        service.unsubscribe(subscriber)
+
+
+async def _handle_connection(service, reader, writer):
+    service.connections += 1
+    try:
+        while True:
+            try:
+                request_line, headers = await read_head(reader)
+            except asyncio.IncompleteReadError:
+                return
+            method, path, _ = request_line.split(' ', 2)
+
+            if headers.get('upgrade', '').lower() == 'websocket' and 'sec-websocket-key' in headers:
+                if path != '/ws':
+                    _write_response(writer, 404, {'error': f"No WebSocket endpoint at {path}"}, keep_alive=False)
+                    return
+                await _serve_websocket(service, reader, writer, headers)
+                return
+
+            length = int(headers.get('content-length') or 0)
+            if length > MAX_MESSAGE_BYTES:
+                raise ProtocolError(f"Request body of {length} bytes is over the limit")
+            body = await reader.readexactly(length)
+            if method == 'POST' and path == '/answer':
+                reply = await service.dispatch_async(body)
+                status = 400 if 'error' in reply else 200
+            elif method == 'GET' and path == '/stats':
+                reply, status = service.stats(), 200
+            else:
+                reply, status = {'error': f"No endpoint for {method} {path}"}, 404
+
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            _write_response(writer, status, reply, keep_alive)
+            await writer.drain()
+            if not keep_alive:
+                return
+    except (ProtocolError, ValueError, KeyError, ConnectionError, asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError) as e:
+        logger.debug("Dropping connection: %s", e)
+    finally:
+        service.connections -= 1
+        writer.close()
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+    """Serve until cancelled; ready (a threading.Event) is set once the socket is listening"""
+    service.loop = asyncio.get_running_loop()
+    server = await asyncio.start_server(
+        lambda reader, writer: _handle_connection(service, reader, writer), host, port, backlog=LISTEN_BACKLOG
+    )
+    logger.info("Answer server listening on %s:%d", host, port)
+    if ready is not None:
+        ready.set()
+    async with server:
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+            service.sweep()
+
+
+def start_in_background(host=DEFAULT_HOST, port=DEFAULT_PORT, questions_path=QUESTIONS_PATH):
+    """Run the server on a daemon thread of this process, once, and return its service
+
+    Returns None if the server could not start, e.g. because another app
+    process on the host already holds the port. The failure is logged once
+    and remembered, so later reruns neither retry nor wait for it.
+    """
+    global _background
+    with _background_lock:
+        if _background is None:
+            service = AnswerService(questions_path)
+            ready = threading.Event()
+            failures = []
+
+            def run():
+                try:
+                    asyncio.run(serve(service, host, port, ready))
+                except OSError as e:
+                    failures.append(e)
+                    ready.set()
+
+            thread = threading.Thread(target=run, name='answer-server', daemon=True)
+            thread.start()
+            if not ready.wait(5):
+                failures.append(TimeoutError("not listening after 5s"))
+            if failures:
+                logger.warning("Answer server not started on %s:%d: %s", host, port, failures[0])
+                _background = failures[0]
+            else:
+                _background = service
+        return None if isinstance(_background, Exception) else _background
+
+
+def main():
+    """Run the answer server in the foreground"""
+    parser = argparse.ArgumentParser(description="Serve answers over WebSocket/HTTP without Streamlit reruns")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--questions', default=QUESTIONS_PATH, help="question bank to deal from")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(asctime)s %(message)s")
+    try:
+        asyncio.run(serve(AnswerService(args.questions), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Static Assets
+=============
+
+Theme CSS served once per page instead of inline on every rerun.
+
+The theme lives in static/theme.css. With server.enableStaticServing on (see
+.streamlit/config.toml), Streamlit serves it at app/static/theme.css and the
+app only sends theme_loader() on the first rerun of a session: a script that
+fetches the stylesheet and adds it to the page's <head>, where it stays for
+the rest of the page's life. It runs through st.html where that can run
+scripts, else in a zero-height component. Later reruns send no CSS at all,
+and the rest of the markup is short class names from the theme.
+
+URLs carry a fingerprint of the file's contents (?v=<hash>), so the browser
+can keep the stylesheet cached across sessions and still picks up a new one
+as soon as the file changes. Streamlit serves static files other than images
+as text/plain, so the loader fetches the text rather than using a
+<link rel="stylesheet">. The fetch always runs in the parent page, so it
+still completes when a component's iframe goes away on the next rerun.
+
+Without static serving, inline_theme() gives the old inline <style> block.
+Page colours and the font come from the [theme] section of the config, which
+Streamlit applies before its first paint. The font (Fira Sans) is bundled in
+static/fonts, so nothing is fetched from a third party.
+"""
+
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+STATIC_URL = 'app/static/'
+THEME_CSS = 'theme.css'
+THEME_ELEMENT_ID = 'arena-theme'
+
+# load() is run as a <script> of the parent page, so its fetch outlives this iframe
+_LOADER = """<script>
+function load(href, id) {
+  var style = document.getElementById(id);
+  if (style && style.dataset.href === href) return;
+  fetch(href).then(function (r) { return r.ok ? r.text() : ''; }).then(function (css) {
+    if (!css) return;
+    style = document.getElementById(id) || document.head.appendChild(document.createElement('style'));
+    style.id = id;
+    style.dataset.href = href;
+    style.textContent = css;
+  });
+}
+var doc = window.parent.document;
+var script = doc.createElement('script');
+script.textContent = '(' + load + ')(' + JSON.stringify(new URL(%(url)s, doc.baseURI).href) + ', %(id)s);';
+doc.head.appendChild(script);
+</script>"""
+
+
+def static_path(name):
+    return os.path.join(STATIC_DIR, name)
+
+
+@lru_cache(maxsize=32)
+def _read(path, mtime_ns, size):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return data, hashlib.blake2b(data, digest_size=6).hexdigest()
+
+
+def read_asset(name):
+    """Return (bytes, fingerprint) of a static file, re-read only when it changes"""
+    path = static_path(name)
+    stat = os.stat(path)
+    return _read(path, stat.st_mtime_ns, stat.st_size)
+
+
+def asset_url(name):
+    """Page-relative URL of a static file, fingerprinted with its contents"""
+    return f"{STATIC_URL}{name}?v={read_asset(name)[1]}"
+
+
+def theme_loader():
+    """HTML for a script that adds the theme stylesheet to the page once"""
+    return _LOADER % {'url': json.dumps(asset_url(THEME_CSS)), 'id': json.dumps(THEME_ELEMENT_ID)}
+
+
+def inline_theme():
+    """The theme as an inline <style> block, for servers without static file serving"""
+    return f"<style>\n{read_asset(THEME_CSS)[0].decode('utf-8')}</style>"
@@ -0,0 +1,240 @@
+"""
+Balance Simulator
+=================
+
+Monte Carlo runs of the HP/XP/streak rules over millions of games at once.
+
+Every game in a batch is a row of an (games, questions) outcome matrix drawn
+up front from a seeded NumPy generator:
+
+* each simulated player gets an accuracy, either fixed or drawn from a Beta
+  distribution around a mean,
+* the difficulty curve scales that accuracy per round (Easy, Medium, Hard),
+* each round has its own chance of running out of the clock.
+
+simulate_outcomes() then plays all rows together, one question column at a
+time, with the rules from game_engine written as array operations. The
+scalar reference is game_engine.simulate_game() itself, applied to the same
+rows, so `--check` can confirm both give identical scores for a seed.
+
+NumPy is only needed here, not by the app:
+
+    pip install numpy
+    python balance_sim.py --games 1000000 --accuracy 0.7 --spread 0.15
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from game_engine import (simulate_game, COMBO_HEAL, COMBO_STREAK, CORRECT, CORRECT_XP, MAX_ROUNDS,
+                         QUESTIONS_PER_ROUND, SCORE_HP_MULTIPLIER, START_HP, TIMED_OUT, TIMEOUT_DAMAGE,
+                         WRONG, WRONG_ANSWER_DAMAGE)
+
+DIFFICULTY_CURVE = (1.0, 0.85, 0.7)
+TIMEOUT_RATES = (0.02, 0.04, 0.08)
+PERCENTILES = (10, 25, 50, 75, 90, 95, 99)
+CHUNK_GAMES = 250_000
+
+
+def per_round(values, max_rounds, name):
+    """Return one float per round, repeating a single value or the last given value"""
+    values = [float(v) for v in np.atleast_1d(values)]
+    if not values:
+        raise ValueError(f"{name} needs at least one value")
+    values += values[-1:] * (max_rounds - len(values))
+    return np.array(values[:max_rounds])
+
+
+def player_accuracies(rng, games, accuracy, spread=0.0):
+    """Draw one answer accuracy per game: fixed, or Beta-distributed with the given mean and std dev"""
+    if not 0.0 < accuracy < 1.0 or spread <= 0.0:
+        return np.full(games, min(max(accuracy, 0.0), 1.0))
+    # Beta(a, b) with mean accuracy and variance spread**2
+    concentration = accuracy * (1.0 - accuracy) / spread ** 2 - 1.0
+    if concentration <= 0.0:
+        raise ValueError(f"spread {spread} is too wide for a mean accuracy of {accuracy}")
+    return rng.beta(accuracy * concentration, (1.0 - accuracy) * concentration, games)
+
+
+def draw_outcomes(rng, accuracies, difficulty=DIFFICULTY_CURVE, timeouts=TIMEOUT_RATES,
+                  questions_per_round=QUESTIONS_PER_ROUND, max_rounds=MAX_ROUNDS):
+    """Return an int8 (games, questions) matrix of CORRECT, WRONG and TIMED_OUT outcomes"""
+    round_of_question = np.repeat(np.arange(max_rounds), questions_per_round)
+    difficulty = per_round(difficulty, max_rounds, 'difficulty')[round_of_question]
+    timeouts = per_round(timeouts, max_rounds, 'timeouts')[round_of_question]
+
+    shape = (len(accuracies), len(round_of_question))
+    timed_out = rng.random(shape) < timeouts
+    correct = rng.random(shape) < np.clip(accuracies[:, None] * difficulty, 0.0, 1.0)
+    outcomes = np.full(shape, WRONG, dtype=np.int8)
+    outcomes[correct] = CORRECT
+    outcomes[timed_out] = TIMED_OUT
+    return outcomes
+
+
+def simulate_outcomes(outcomes, questions_per_round=QUESTIONS_PER_ROUND, max_rounds=MAX_ROUNDS):
+    """Play every row of an outcome matrix at once
+
+    Returns (scores, rounds_played, eliminated) arrays, matching
+    simulate_game() row by row.
+    """
+    games = outcomes.shape[0]
+    hp = np.full(games, START_HP, dtype=np.int32)
+    xp = np.zeros(games, dtype=np.int32)
+    streak = np.zeros(games, dtype=np.int32)
+    shields = np.zeros(games, dtype=np.int32)
+    eliminated = np.zeros(games, dtype=bool)
+    rounds_played = np.zeros(games, dtype=np.int32)
+    playing = np.ones(games, dtype=bool)
+
+    for round_num in range(1, max_rounds + 1):
+        rounds_played[playing] = round_num
+        for column in range((round_num - 1) * questions_per_round, round_num * questions_per_round):
+            outcome = outcomes[:, column]
+            correct = playing & (outcome == CORRECT)
+            timed_out = playing & (outcome == TIMED_OUT)
+            wrong = playing & (outcome == WRONG)
+
+            xp += CORRECT_XP * correct
+            streak += correct
+            combo = correct & (streak >= COMBO_STREAK)
+            hp[combo] = np.minimum(START_HP, hp[combo] + COMBO_HEAL)
+
+            # A shield absorbs a wrong answer but not a timeout
+            shielded = wrong & (shields > 0)
+            shields -= shielded
+            hit = wrong & ~shielded
+            hp[hit] -= WRONG_ANSWER_DAMAGE
+            hp[timed_out] -= TIMEOUT_DAMAGE
+            np.maximum(hp, 0, out=hp)
+
+            streak[combo | hit | timed_out] = 0
+            eliminated |= (hit | timed_out) & (hp <= 0)
+
+        # Eliminated players finish the round they fell in, then stop
+        playing &= ~eliminated
+        shields += playing
+
+    return xp + hp * SCORE_HP_MULTIPLIER, rounds_played, eliminated
+
+
+def simulate_outcomes_scalar(outcomes, questions_per_round=QUESTIONS_PER_ROUND, max_rounds=MAX_ROUNDS):
+    """Reference implementation: game_engine.simulate_game() on each row"""
+    results = [simulate_game(row, questions_per_round, max_rounds) for row in outcomes.tolist()]
+    scores, rounds_played, eliminated = zip(*results) if results else ((), (), ())
+    return (np.array(scores, dtype=np.int32), np.array(rounds_played, dtype=np.int32),
+            np.array(eliminated, dtype=bool))
+
+
+def simulate(games, seed=None, accuracy=0.7, spread=0.0, difficulty=DIFFICULTY_CURVE,
+             timeouts=TIMEOUT_RATES, questions_per_round=QUESTIONS_PER_ROUND, max_rounds=MAX_ROUNDS,
+             vectorized=True, chunk_games=CHUNK_GAMES):
+    """Simulate games in fixed-size chunks, returning (scores, rounds_played, eliminated)
+
+    The random draws depend only on the seed and chunk size, so the vectorized
+    and scalar paths see the same games and must return the same arrays.
+    """
+    rng = np.random.default_rng(seed)
+    play = simulate_outcomes if vectorized else simulate_outcomes_scalar
+    results = []
+    for start in range(0, games, chunk_games):
+        count = min(chunk_games, games - start)
+        accuracies = player_accuracies(rng, count, accuracy, spread)
+        outcomes = draw_outcomes(rng, accuracies, difficulty, timeouts, questions_per_round, max_rounds)
+        results.append(play(outcomes, questions_per_round, max_rounds))
+    if not results:
+        return np.zeros(0, np.int32), np.zeros(0, np.int32), np.zeros(0, bool)
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+
+def summarize(scores, rounds_played, eliminated, max_rounds=MAX_ROUNDS):
+    """Score distribution, per-round elimination rates and leaderboard percentiles"""
+    games = len(scores)
+    if not games:
+        return {'games': 0}
+
+    values, counts = np.unique(scores, return_counts=True)
+    rounds = []
+    for round_num in range(1, max_rounds + 1):
+        reached = int(np.count_nonzero(rounds_played >= round_num))
+        fell = int(np.count_nonzero(eliminated & (rounds_played == round_num)))
+        rounds.append({
+            'round': round_num,
+            'reached': reached,
+            'eliminated': fell,
+            'elimination_rate': fell / games,
+            'conditional_elimination_rate': fell / reached if reached else 0.0
+        })
+
+    return {
+        'games': games,
+        'mean_score': float(scores.mean()),
+        'std_score': float(scores.std()),
+        'survival_rate': 1.0 - float(np.count_nonzero(eliminated)) / games,
+        'percentiles': {p: float(v) for p, v in zip(PERCENTILES, np.percentile(scores, PERCENTILES))},
+        'rounds': rounds,
+        'score_distribution': {int(v): int(c) for v, c in zip(values, counts)}
+    }
+
+
+def print_report(summary, histogram_width=40):
+    """Print a summary as text, with the score distribution as a bar chart"""
+    print(f"Games:        {summary['games']:,}")
+    print(f"Mean score:   {summary['mean_score']:.1f} ± {summary['std_score']:.1f}")
+    print(f"Survived:     {summary['survival_rate']:.1%}")
+    print("Percentiles:  " + "  ".join(f"p{p}={v:.0f}" for p, v in summary['percentiles'].items()))
+    for r in summary['rounds']:
+        print(f"Round {r['round']}:      reached {r['reached']:>10,}  eliminated {r['elimination_rate']:6.2%}"
+              f"  ({r['conditional_elimination_rate']:6.2%} of those who reached it)")
+
+    distribution = summary['score_distribution']
+    peak = max(distribution.values())
+    print("Score distribution:")
+    for score, count in distribution.items():
+        bar = '█' * max(1, round(histogram_width * count / peak))
+        print(f"  {score:>4} {count / summary['games']:7.2%} {bar}")
+
+
+def main():
+    """Run a balance simulation from the command line"""
+    parser = argparse.ArgumentParser(description="Monte Carlo balance simulation of the game rules")
+    parser.add_argument('--games', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--accuracy', type=float, default=0.7, help="mean chance of a correct answer")
+    parser.add_argument('--spread', type=float, default=0.0, help="std dev of accuracy across players")
+    parser.add_argument('--difficulty', type=float, nargs='+', default=DIFFICULTY_CURVE,
+                        help="accuracy multiplier per round")
+    parser.add_argument('--timeouts', type=float, nargs='+', default=TIMEOUT_RATES,
+                        help="chance of running out of time per round")
+    parser.add_argument('--check', type=int, default=10_000,
+                        help="games to replay through game_engine.simulate_game() (0 to skip)")
+    parser.add_argument('--json', action='store_true', help="print the summary as JSON")
+    args = parser.parse_args()
+
+    options = dict(seed=args.seed, accuracy=args.accuracy, spread=args.spread,
+                   difficulty=args.difficulty, timeouts=args.timeouts)
+    if args.check:
+        vectorized = simulate(args.check, **options)
+        scalar = simulate(args.check, vectorized=False, **options)
+        if not all(np.array_equal(v, s) for v, s in zip(vectorized, scalar)):
+            raise SystemExit(f"❌ Vectorized results differ from simulate_game() for seed {args.seed}")
+
+    started = time.perf_counter()
+    results = simulate(args.games, **options)
+    elapsed = time.perf_counter() - started
+    summary = summarize(*results)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print_report(summary)
+    if args.check:
+        print(f"✅ {args.check:,} games match game_engine.simulate_game()")
+    print(f"Simulated {args.games:,} games in {elapsed:.2f}s ({args.games / elapsed:,.0f} games/s)")
+
+
+if __name__ == "__main__":
+    main()
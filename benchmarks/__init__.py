@@ -0,0 +1 @@
+"""Offline micro-benchmarks for The Knowledge Arena"""
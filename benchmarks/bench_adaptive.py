@@ -0,0 +1,118 @@
+"""
+Adaptive difficulty benchmark
+=============================
+
+Plays simulated players against a large synthetic bank through the adaptive
+engine and reports:
+
+* the difficulty index build time,
+* next_question() and record() latency, against a linear scan for the same
+  "closest unseen difficulty" query,
+* how close the skill estimates get to the simulated players' true skills
+  and how close their accuracy gets to the target.
+
+Fails if a pick is ever further from the target than the scan's best plus one
+bucket width.
+
+Usage:
+    python -m benchmarks.bench_adaptive [--size 1000000] [--players 500] [--answers 200000]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+
+from adaptive import expected_accuracy, AdaptiveEngine, SkillTable, BUCKET_WIDTH, DIFFICULTY_PRIORS, TARGET_ACCURACY
+from question_bank import QuestionBank
+from benchmarks.synthetic import make_questions, CATEGORIES
+
+SCAN_SAMPLES = 50
+
+
+def scan_closest(engine, category, target, exclude):
+    """The same query as DifficultyIndex.closest() by checking every question"""
+    index = engine.index
+    best = None
+    for position in range(len(index)):
+        if index.category_of(position) != category or engine.bank.record(position).id in exclude:
+            continue
+        distance = abs(index.difficulty[position] - target)
+        if best is None or distance < best:
+            best = distance
+    return best
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, len(ordered) * p // 100)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=1_000_000)
+    parser.add_argument('--players', type=int, default=500)
+    parser.add_argument('--answers', type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    bank = QuestionBank.from_questions(make_questions(args.size))
+    started = time.perf_counter()
+    engine = AdaptiveEngine(bank, SkillTable())
+    build_seconds = time.perf_counter() - started
+
+    # Hidden truth the engine has to discover
+    true_difficulty = [DIFFICULTY_PRIORS[q.difficulty] + rng.gauss(0, 0.5) for q in bank.questions]
+    true_skill = {(player, category): rng.gauss(0, 1)
+                  for player in range(args.players) for category in CATEGORIES}
+    seen = {player: set() for player in range(args.players)}
+
+    picks = []
+    records = []
+    correct = 0
+    for _ in range(args.answers):
+        player = rng.randrange(args.players)
+        name = f"player{player}"
+        category = rng.choice(CATEGORIES)
+
+        started = time.perf_counter()
+        position = engine.next_question(name, (category,), seen[player], rng)
+        picks.append(time.perf_counter() - started)
+        seen[player].add(bank.record(position).id)
+
+        is_correct = rng.random() < expected_accuracy(true_skill[(player, category)], true_difficulty[position])
+        correct += is_correct
+        started = time.perf_counter()
+        engine.record(name, position, is_correct)
+        records.append(time.perf_counter() - started)
+
+    errors = [abs(engine.skill(f"player{player}", category) - skill)
+              for (player, category), skill in true_skill.items()]
+    print(f"{args.size:,} questions, {args.players:,} players, {args.answers:,} answers")
+    print(f"index build:     {build_seconds * 1000:8.1f} ms")
+    print(f"next_question(): p50 {percentile(picks, 50) * 1e6:6.1f} µs   p99 {percentile(picks, 99) * 1e6:6.1f} µs")
+    print(f"record():        p50 {percentile(records, 50) * 1e6:6.1f} µs   p99 {percentile(records, 99) * 1e6:6.1f} µs")
+    print(f"accuracy {correct / args.answers:.3f} (target {TARGET_ACCURACY}), "
+          f"skill error median {statistics.median(errors):.2f} logits")
+
+    # Compare a few picks with a full scan of the bank
+    failed = 0
+    scan_seconds = 0.0
+    for _ in range(SCAN_SAMPLES):
+        player = rng.randrange(args.players)
+        category = rng.choice(CATEGORIES)
+        target = engine.target(f"player{player}", category)
+        distance, _ = engine.index.closest(category, target, seen[player], rng)
+        started = time.perf_counter()
+        best = scan_closest(engine, category, target, seen[player])
+        scan_seconds += time.perf_counter() - started
+        failed += distance > best + BUCKET_WIDTH
+    print(f"linear scan:     {scan_seconds / SCAN_SAMPLES * 1000:8.1f} ms per query")
+    if failed:
+        print(f"❌ {failed} of {SCAN_SAMPLES} picks were more than a bucket further than the closest question")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
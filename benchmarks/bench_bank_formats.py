@@ -0,0 +1,138 @@
+"""
+Question bank format benchmark
+==============================
+
+Starts several worker processes at once against the same bank, stored as:
+
+* json   - questions.json parsed and validated in every worker,
+* ndjson - the memory-mapped NDJSON bank with its sidecar index,
+* qbank  - the compiled binary bank from question_import.py.
+
+Each worker opens the bank and deals one round per topic and difficulty,
+then reports its startup time and memory while all of them are alive:
+private anonymous memory it added (its own heap copy of the bank), and its
+proportional share (PSS) of everything it added, which splits page-cache
+pages mapped by several workers between them.
+
+Fails if the compiled bank does not start faster, or with less private
+memory, than the JSON path.
+
+Usage:
+    python -m benchmarks.bench_bank_formats [--size 500000] [--workers 4]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import question_bank
+from question_bank import convert_to_binary, convert_to_ndjson, get_question_bank, sample_positions
+from benchmarks.synthetic import write_questions_json
+
+QUESTIONS_PER_ROUND = 5
+FORMATS = ('json', 'ndjson', 'qbank')
+
+
+def memory_kb():
+    """This process's memory from /proc/self/smaps_rollup, in kB"""
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if value.strip().endswith('kB'):
+                    fields[name] = int(value.split()[0])
+    except OSError:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        fields = {'Rss': rss, 'Pss': rss, 'Anonymous': rss}
+    return fields
+
+
+def worker(path):
+    """Open the bank, deal every round once, then report when asked so all workers are alive together"""
+    # Keep a large questions.json on the parse-and-validate path instead of its NDJSON copy
+    question_bank.CONVERT_THRESHOLD_BYTES = float('inf')
+    before = memory_kb()
+    started = time.perf_counter()
+    bank = get_question_bank(path)
+    rng = random.Random(os.getpid())
+    for key, view in bank.by_categories.items():
+        for position in sample_positions(view, min(QUESTIONS_PER_ROUND, len(view)), rng=rng):
+            bank.record(position)
+    startup = time.perf_counter() - started
+    print(json.dumps({'startup': startup}), flush=True)
+
+    sys.stdin.readline()
+    after = memory_kb()
+    print(json.dumps({key: after.get(key, 0) - before.get(key, 0) for key in ('Rss', 'Pss', 'Anonymous')}), flush=True)
+
+
+def run_workers(path, count):
+    """Start count workers on path together; returns their startup and memory reports"""
+    procs = [subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_bank_formats', '--worker', path],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+             for _ in range(count)]
+    startups = [json.loads(proc.stdout.readline()) for proc in procs]
+    for proc in procs:
+        proc.stdin.write('\n')
+        proc.stdin.flush()
+    memories = [json.loads(proc.stdout.readline()) for proc in procs]
+    for proc in procs:
+        proc.wait()
+    return [{**startup, **memory} for startup, memory in zip(startups, memories)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=500_000, help="questions in the bank")
+    parser.add_argument('--workers', type=int, default=4, help="worker processes per format")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker)
+        return
+
+    directory = tempfile.mkdtemp(prefix='arena-formats-')
+    json_path = os.path.join(directory, 'questions.json')
+    write_questions_json(json_path, args.size)
+    paths = {
+        'json': json_path,
+        'ndjson': convert_to_ndjson(json_path),
+        'qbank': convert_to_binary(json_path)
+    }
+
+    print(f"{args.size:,} questions, {args.workers} workers per format")
+    print(f"{'format':<8} {'file MB':>8} {'startup ms':>11} {'private MB':>11} {'PSS MB':>8} {'RSS MB':>8}   (per worker)")
+    results = {}
+    for name in FORMATS:
+        path = paths[name]
+        with open(path, 'rb') as f:
+            # Warm the page cache so every format starts from the same place
+            while f.read(1 << 24):
+                pass
+        reports = run_workers(path, args.workers)
+        results[name] = {key: statistics.median(report[key] for report in reports)
+                         for key in ('startup', 'Anonymous', 'Pss', 'Rss')}
+        result = results[name]
+        print(f"{name:<8} {os.path.getsize(path) / 2**20:8.1f} {result['startup'] * 1000:11.1f} "
+              f"{result['Anonymous'] / 1024:11.1f} {result['Pss'] / 1024:8.1f} {result['Rss'] / 1024:8.1f}")
+
+    compiled, parsed = results['qbank'], results['json']
+    print(f"qbank vs json: {parsed['startup'] / compiled['startup']:,.0f}x faster startup, "
+          f"{(parsed['Anonymous'] - compiled['Anonymous']) / 1024:,.1f} MB less private memory per worker")
+    if compiled['startup'] >= parsed['startup'] or compiled['Anonymous'] >= parsed['Anonymous']:
+        print("❌ the compiled bank is not cheaper to start than questions.json")
+        sys.exit(1)
+    print("✅ compiled bank starts faster and keeps less private memory per worker")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Game engine benchmark
+=====================
+
+Checks that simulate_game() agrees with the step API (Game.answer/next) on
+random games, then measures how many full 3-round games per second each can
+play on one core.
+
+Usage:
+    python -m benchmarks.bench_engine [--games 200000] [--accuracy 0.7]
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from game_engine import (new_game, new_player, simulate_game, CORRECT, FINISHED, MAX_ROUNDS, QUESTIONS_PER_ROUND,
+                         ROUND_OVER, TIMED_OUT, WRONG)
+
+QUESTIONS_PER_GAME = MAX_ROUNDS * QUESTIONS_PER_ROUND
+DEAL = tuple((i, 0) for i in range(QUESTIONS_PER_ROUND))
+
+
+def play_with_steps(outcomes):
+    """Play one game through the step API, answering correctly where outcomes says so"""
+    game = new_game(new_player("bench", "⚔️")).deal(DEAL)
+    outcomes = iter(outcomes)
+    while True:
+        question_id = game.current_question_id
+        outcome = next(outcomes)
+        choice = None if outcome == TIMED_OUT else 0 if outcome == CORRECT else 1
+        game = game.answer(question_id, choice).next()
+        if game.phase == FINISHED:
+            return game.player.final_score, game.round, game.player.eliminated
+        if game.phase == ROUND_OVER:
+            game = game.next_round().deal(DEAL)
+
+
+def make_outcomes(count, accuracy, seed, timeout_rate=0.05):
+    """Random per-question outcomes for count games"""
+    rng = random.Random(seed)
+
+    def outcome():
+        if rng.random() < timeout_rate:
+            return TIMED_OUT
+        return CORRECT if rng.random() < accuracy else WRONG
+
+    return [[outcome() for _ in range(QUESTIONS_PER_GAME)] for _ in range(count)]
+
+
+def games_per_second(play, games):
+    """Play every game and return the throughput"""
+    started = time.perf_counter()
+    for outcomes in games:
+        play(outcomes)
+    return len(games) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=200_000)
+    parser.add_argument('--accuracy', type=float, default=0.7)
+    parser.add_argument('--target', type=float, default=100_000, help="simulated games/s required to pass")
+    args = parser.parse_args()
+
+    games = make_outcomes(args.games, args.accuracy, seed=1)
+    for outcomes in games[:10_000]:
+        assert simulate_game(outcomes) == play_with_steps(outcomes), outcomes
+
+    step_rate = games_per_second(play_with_steps, games[:20_000])
+    simulate_rate = games_per_second(simulate_game, games)
+    print(f"step API:        {step_rate:>12,.0f} games/s")
+    print(f"simulate_game(): {simulate_rate:>12,.0f} games/s")
+    if simulate_rate < args.target:
+        print(f"❌ below the {args.target:,.0f} games/s target")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Fragment rerun benchmark
+========================
+
+Starts the app with `streamlit run` and plays it over the same WebSocket
+protocol the browser uses: add a player, start, then answer and move on
+through a round, start the next round and use a heal.
+
+The server opens every script run with a NewSession message that lists the
+fragments it ran, so for each click this counts how many runs it cost and
+whether each was a full rerun or only a fragment, along with the bytes
+sent back and the time until the run finished.
+
+Fails if an answer or a NEXT within the round costs more than one run, or
+any full rerun. With --baseline REV the same flow also runs against that git
+revision.
+
+Usage:
+    python -m benchmarks.bench_fragments [--baseline HEAD~1] [--port 8599]
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks.bench_rerun_payload import checkout, APP, ROOT, RUNTIME_FILES
+
+STARTUP_TIMEOUT = 60
+QUESTIONS_PER_ROUND = 5
+
+
+class AppClient:
+    """Minimal Streamlit browser: sends clicks, reads runs until the script finishes"""
+
+    def __init__(self, ws):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        self.BackMsg = BackMsg
+        self.ForwardMsg = ForwardMsg
+        self.ws = ws
+        self.widgets = {}
+        self.text_inputs = {}
+
+    def send(self, widget_states=(), fragment_id=''):
+        """Start a run and return (runs, bytes, seconds); runs is a list of fragment id lists, [] for a full rerun"""
+        msg = self.BackMsg()
+        msg.rerun_script.page_script_hash = ''
+        msg.rerun_script.fragment_id = fragment_id
+        for state in widget_states:
+            msg.rerun_script.widget_states.widgets.append(state)
+        started = time.perf_counter()
+        self.ws.send(msg.SerializeToString())
+
+        runs = []
+        received = 0
+        finished = self.ForwardMsg.ScriptFinishedStatus
+        while True:
+            data = self.ws.recv()
+            received += len(data)
+            fwd = self.ForwardMsg()
+            fwd.ParseFromString(data)
+            kind = fwd.WhichOneof('type')
+            if kind == 'new_session':
+                fragments = list(fwd.new_session.fragment_ids_this_run)
+                runs.append(fragments)
+                if not fragments:
+                    self.widgets.clear()
+                    self.text_inputs.clear()
+            elif kind == 'delta' and fwd.delta.WhichOneof('type') == 'new_element':
+                element = fwd.delta.new_element
+                if element.WhichOneof('type') == 'button':
+                    self.widgets[element.button.id] = (element.button, fwd.delta.fragment_id)
+                elif element.WhichOneof('type') == 'text_input':
+                    self.text_inputs[element.text_input.label] = element.text_input.id
+            elif kind == 'script_finished' and fwd.script_finished in (
+                    finished.FINISHED_SUCCESSFULLY, finished.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+                    finished.FINISHED_WITH_COMPILE_ERROR):
+                return runs, received, time.perf_counter() - started
+
+    def button(self, label=None, key=None):
+        """(button proto, fragment id) of the latest button with this label or user key, or None"""
+        for widget_id, (button, fragment_id) in reversed(self.widgets.items()):
+            if (key is not None and widget_id.endswith(f'-{key}')) or (label is not None and button.label == label):
+                return button, fragment_id
+        return None
+
+    def click(self, label=None, key=None, text=None):
+        """Click a button, sending along {text input label: value} typed before the click"""
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        found = self.button(label, key)
+        if found is None:
+            raise LookupError(f"No button {label or key!r} on this screen")
+        button, fragment_id = found
+        states = [WidgetState(id=button.id, trigger_value=True)]
+        for input_label, value in (text or {}).items():
+            states.append(WidgetState(id=self.text_inputs[input_label], string_value=value))
+        return self.send(states, fragment_id)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(app_dir, port):
+    """Run the app in app_dir from a scratch directory; returns the server process"""
+    workdir = tempfile.mkdtemp(prefix='arena-fragments-')
+    for name in RUNTIME_FILES:
+        source = os.path.join(app_dir, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(workdir, name))
+        elif os.path.exists(source):
+            shutil.copy(source, workdir)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', os.path.join(app_dir, APP), '--server.headless', 'true',
+         '--server.port', str(port), '--browser.gatherUsageStats', 'false', '--server.fileWatcherType', 'none'],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"streamlit did not start on port {port}")
+
+
+def play(app_dir, port):
+    """Play a round and a heal against the app in app_dir; returns {action: [(runs, bytes, seconds), ...]}"""
+    from websockets.sync.client import connect
+
+    server = start_server(app_dir, port)
+    try:
+        with connect(f'ws://127.0.0.1:{port}/_stcore/stream', subprotocols=['streamlit'], max_size=None) as ws:
+            return _play_round(AppClient(ws))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _play_round(client):
+    results = {}
+
+    def record(action, result):
+        results.setdefault(action, []).append(result)
+
+    record('setup', client.send())
+    record('add player', client.click('ADD PLAYER', text={next(iter(client.text_inputs)): 'Bench'}))
+    record('start', client.click('START'))
+
+    for round_number in (1, 2):
+        for question in range(QUESTIONS_PER_ROUND):
+            record('answer', client.click(key='option_0'))
+            action = 'next' if question + 1 < QUESTIONS_PER_ROUND else 'next (round over)'
+            record(action, client.click(key='next_question_btn'))
+        if round_number == 1:
+            if client.button('NEXT ROUND') is None:
+                break
+            record('next round', client.click('NEXT ROUND'))
+            heal = client.button(key='use_heal')
+            if heal is not None and not heal[0].disabled:
+                record('heal', client.click(key='use_heal'))
+    return results
+
+
+def print_report(name, results):
+    print(f"{name}:")
+    print(f"  {'action':<18} {'clicks':>6} {'runs/click':>11} {'full':>5} {'fragment':>9} "
+          f"{'bytes/click':>12} {'ms/click':>9}")
+    for action, samples in results.items():
+        runs = [run for sample in samples for run in sample[0]]
+        print(f"  {action:<18} {len(samples):>6} {len(runs) / len(samples):>11.1f} "
+              f"{sum(1 for run in runs if not run):>5} {sum(1 for run in runs if run):>9} "
+              f"{statistics.mean(sample[1] for sample in samples):>12,.0f} "
+              f"{statistics.median(sample[2] for sample in samples) * 1000:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baseline', help="git revision to compare against")
+    parser.add_argument('--port', type=int, default=0, help="server port (default: any free port)")
+    args = parser.parse_args()
+
+    reports = {}
+    if args.baseline:
+        reports[args.baseline] = play(checkout(args.baseline), args.port or free_port())
+    reports['current'] = play(ROOT, args.port or free_port())
+    for name, results in reports.items():
+        print_report(name, results)
+
+    failures = []
+    for action in ('answer', 'next'):
+        for runs, _, _ in reports['current'].get(action, []):
+            if len(runs) != 1 or not runs[0]:
+                failures.append(f"{action} cost {len(runs)} runs ({sum(1 for run in runs if not run)} full)")
+    for failure in dict.fromkeys(failures):
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✅ every answer and NEXT is one fragment rerun")
+
+
+if __name__ == "__main__":
+    main()
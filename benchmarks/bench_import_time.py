@@ -0,0 +1,113 @@
+"""
+Import-time benchmark
+=====================
+
+Measures cold-start import cost with `python -X importtime`, prints the
+slowest modules, and fails if:
+
+- the median cumulative import time of a module regresses by more than
+  --tolerance against the recorded baseline, or
+- a forbidden heavy library (plotly by default) shows up in the import graph.
+
+The first run, or any run with --update-baseline, records the baseline in
+benchmarks/import_time_baseline.json.
+
+Usage:
+    python -m benchmarks.bench_import_time [quiz_royale question_bank ...]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'import_time_baseline.json')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_profile(module):
+    """Import module in a fresh interpreter
+
+    Returns ({name: (self_us, cumulative_us)}, top-level packages loaded).
+    -X importtime also lists imports that failed, such as optional packages
+    a library only tries, so what actually loaded comes from sys.modules.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         f"import {module}, sys; print(' '.join({{name.split('.')[0] for name in sys.modules}}))"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    profile = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            profile[name] = (int(self_us), int(cumulative_us))
+    return profile, set(result.stdout.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('modules', nargs='*', default=['quiz_royale'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown, as a fraction")
+    parser.add_argument('--forbid', nargs='*', default=['plotly'], help="top-level packages that must not load")
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    try:
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+
+    failures = []
+    for module in args.modules:
+        try:
+            profiles, packages = zip(*(import_profile(module) for _ in range(args.runs)))
+        except RuntimeError as e:
+            failures.append(str(e))
+            continue
+
+        median_ms = statistics.median(p[module][1] for p in profiles) / 1000
+        print(f"\n{module}: median cold import {median_ms:.1f} ms over {args.runs} runs")
+
+        slowest = sorted(profiles[-1].items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+        for name, (self_us, cumulative_us) in slowest:
+            print(f"  {self_us / 1000:8.1f} ms self {cumulative_us / 1000:8.1f} ms cumulative  {name}")
+
+        for package in args.forbid:
+            if package in packages[-1]:
+                failures.append(f"{module} imports forbidden package {package}")
+
+        recorded = baseline.get(module)
+        if recorded is None or args.update_baseline:
+            baseline[module] = round(median_ms, 1)
+            print(f"  baseline recorded: {baseline[module]} ms")
+        elif median_ms > recorded * (1 + args.tolerance):
+            failures.append(f"{module} cold import {median_ms:.1f} ms exceeds baseline "
+                            f"{recorded} ms by more than {args.tolerance:.0%}")
+        else:
+            print(f"  within {args.tolerance:.0%} of baseline {recorded} ms")
+
+    with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+    if failures:
+        print()
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
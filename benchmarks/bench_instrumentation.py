@@ -0,0 +1,59 @@
+"""
+Instrumentation overhead benchmark
+==================================
+
+Measures what instrumentation.timed() costs per phase with timing off and
+on, and what share of a rerun that is for the phases quiz_royale.py times.
+Fails if the disabled overhead is over 1% of --rerun-ms.
+
+Usage:
+    python -m benchmarks.bench_instrumentation [--rerun-ms 5] [--phases 12]
+"""
+
+import argparse
+import sys
+import time
+
+import instrumentation
+from instrumentation import begin_rerun, end_rerun, timed
+
+CALLS = 200_000
+
+
+def per_call_seconds(enabled):
+    """Average cost of one `with timed(...)` block"""
+    begin_rerun(enabled)
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        with timed('bench'):
+            pass
+    elapsed = time.perf_counter() - started
+    end_rerun()
+    return elapsed / CALLS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rerun-ms', type=float, default=5.0, help="typical cost of one full rerun")
+    parser.add_argument('--phases', type=int, default=12, help="timed blocks per rerun")
+    args = parser.parse_args()
+
+    # Keep the benchmark from exporting files or dumping profiles
+    instrumentation.EXPORT_EVERY = instrumentation.PROFILE_EVERY = instrumentation.METRICS_PORT = 0
+    instrumentation.ENABLED = False
+    rerun_seconds = args.rerun_ms / 1000
+
+    disabled = per_call_seconds(False)
+    enabled = per_call_seconds(True)
+    instrumentation.reset()
+    for label, seconds in (('disabled', disabled), ('enabled', enabled)):
+        share = seconds * args.phases / rerun_seconds
+        print(f"{label:>8}: {seconds * 1e9:8.0f} ns per phase, {share:7.3%} of a {args.rerun_ms:g} ms rerun")
+
+    if disabled * args.phases / rerun_seconds > 0.01:
+        print("❌ disabled instrumentation costs more than 1% of a rerun")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
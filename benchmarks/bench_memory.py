@@ -0,0 +1,92 @@
+"""
+Question memory benchmark
+=========================
+
+Reports heap usage per 100k questions and per game session for the plain
+dict layout the app used to hold versus the compact Question records and
+position lists it holds now, and the deduplication state question_import.py
+keeps per accepted question.
+
+Usage:
+    python -m benchmarks.bench_memory [--questions 100000] [--sessions 1000]
+"""
+
+import argparse
+import json
+import random
+import tracemalloc
+
+from question_bank import QuestionBank, TOPIC_TO_CATEGORIES
+from question_import import Deduplicator, fingerprint
+from benchmarks.synthetic import make_questions
+
+QUESTIONS_PER_ROUND = 5
+
+
+def measure(build):
+    """Return (result, bytes allocated) for build()"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=100_000)
+    parser.add_argument('--sessions', type=int, default=1_000)
+    args = parser.parse_args()
+
+    raw = json.dumps(make_questions(args.questions))
+    scale = 100_000 / args.questions
+
+    # Bank held in every worker: parsed dicts vs. compact records plus index
+    dicts, dict_bytes = measure(lambda: json.loads(raw))
+    bank, bank_bytes = measure(lambda: QuestionBank.from_questions(json.loads(raw)))
+    del dicts
+
+    categories = TOPIC_TO_CATEGORIES['Hollywood/Bollywood']
+    pool = bank.select('easy', categories)
+
+    # Old session: its own parsed copy of the round pool, shuffled into session state
+    def old_sessions(count):
+        sessions = []
+        for _ in range(count):
+            fresh = [q for q in json.loads(raw) if q['difficulty'] == 'easy' and q['category'] in categories]
+            random.shuffle(fresh)
+            sessions.append(fresh)
+        return sessions
+
+    # New session: questions_per_round integer positions into the shared bank
+    def new_sessions(count):
+        return [[pool.positions[i] for i in random.sample(range(len(pool)), QUESTIONS_PER_ROUND)]
+                for _ in range(count)]
+
+    # Re-parsing the bank per session is slow, so the old layout is sampled
+    old_count = min(args.sessions, 20)
+    _, old_bytes = measure(lambda: old_sessions(old_count))
+    _, new_bytes = measure(lambda: new_sessions(args.sessions))
+
+    # Import dedup state: the id, record location and fingerprint of every accepted question
+    fingerprinted = [(q['id'], q['question'], q['options']) for q in json.loads(raw)]
+
+    def deduplicate():
+        dedup = Deduplicator()
+        for n, (question_id, question, options) in enumerate(fingerprinted, 1):
+            dedup.add(question_id, f"dump.json:{n}", fingerprint(question, options))
+        return dedup
+
+    _, dedup_bytes = measure(deduplicate)
+
+    print(f"Bank per 100k questions:   dicts {dict_bytes * scale / 2**20:8.1f} MiB   "
+          f"records {bank_bytes * scale / 2**20:8.1f} MiB")
+    print(f"Round state per session:   dicts {old_bytes / old_count / 2**10:8.1f} KiB   "
+          f"positions {new_bytes / args.sessions / 2**10:8.3f} KiB   (pool of {len(pool)} questions)")
+    print(f"Import dedup per question: {dedup_bytes / len(fingerprinted):8.0f} bytes   "
+          f"({dedup_bytes * scale / 2**20:.1f} MiB per 100k questions)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Player stats benchmark
+======================
+
+Simulates many sessions finishing games at once and measures:
+
+* what record_game() costs the session that calls it (the UI path),
+* how fast the writer thread gets the games onto disk,
+* how long a profile read takes once the history is large.
+
+Then checks the incrementally kept aggregates against a full recount of the
+stored answers. Fails if they disagree or if the p99 cost of record_game()
+is over --max-record-ms. The maximum mostly shows how long a session thread
+waited for the CPU, so it is reported but not checked.
+
+Usage:
+    python -m benchmarks.bench_player_stats [--sessions 16] [--games 2000] [--players 500]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import player_stats
+from game_engine import CORRECT, TIMED_OUT, WRONG
+from player_stats import connect, get_profile, record_game
+from benchmarks.synthetic import CATEGORIES, DIFFICULTIES
+
+ANSWERS_PER_GAME = 15
+PROFILE_READS = 2000
+
+
+def make_answers(rng):
+    answers = []
+    for _ in range(ANSWERS_PER_GAME):
+        roll = rng.random()
+        outcome = CORRECT if roll < 0.65 else TIMED_OUT if roll > 0.95 else WRONG
+        elapsed = None if outcome == TIMED_OUT else rng.uniform(1, 12)
+        answers.append((rng.randrange(1_000_000), rng.choice(CATEGORIES), rng.choice(DIFFICULTIES), outcome, elapsed))
+    return answers
+
+
+def session(path, games, players, seed, latencies):
+    """One session thread finishing games back to back"""
+    rng = random.Random(seed)
+    for _ in range(games):
+        answers = make_answers(rng)
+        name = f"player{rng.randrange(players)}"
+        started = time.perf_counter()
+        record_game(uuid.uuid4().hex, name, "⚔️", rng.randrange(400), answers, 3, False, path=path)
+        latencies.append(time.perf_counter() - started)
+
+
+def recount(conn):
+    """Per-player totals straight from the answers table"""
+    return {
+        (player, category): (answered, correct)
+        for player, category, answered, correct in conn.execute(
+            "SELECT g.player, a.category, COUNT(*), SUM(a.outcome = ?) FROM answers a "
+            "JOIN games g ON g.game_id = a.game_id GROUP BY g.player, a.category", (CORRECT,)
+        )
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=16, help="concurrent session threads")
+    parser.add_argument('--games', type=int, default=2000, help="games per session")
+    parser.add_argument('--players', type=int, default=500, help="distinct player names")
+    parser.add_argument('--max-record-ms', type=float, default=1.0, help="p99 limit for record_game()")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='arena-stats-'), 'player_stats.db')
+    connect(path)
+    writer = player_stats.get_writer(path)
+    latencies = []
+    threads = [threading.Thread(target=session, args=(path, args.games, args.players, seed, latencies))
+               for seed in range(args.sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queued = time.perf_counter() - started
+    writer.flush()
+    stored = time.perf_counter() - started
+
+    total = args.sessions * args.games
+    latencies.sort()
+    p99 = latencies[len(latencies) * 99 // 100]
+    print(f"{total:,} games × {ANSWERS_PER_GAME} answers from {args.sessions} sessions, {args.players:,} players")
+    print(f"record_game(): p50 {latencies[len(latencies) // 2] * 1e6:7.1f} µs   "
+          f"p99 {p99 * 1e6:7.1f} µs   max {latencies[-1] * 1e3:6.2f} ms")
+    print(f"queued in {queued:5.2f}s, on disk after {stored:5.2f}s: {total / stored:,.0f} games/s "
+          f"in {writer.batches:,} transactions")
+
+    rng = random.Random(1)
+    reads = []
+    for _ in range(PROFILE_READS):
+        name = f"player{rng.randrange(args.players)}"
+        read_started = time.perf_counter()
+        get_profile(name, path=path)
+        reads.append(time.perf_counter() - read_started)
+    print(f"get_profile(): median {statistics.median(reads) * 1e6:7.1f} µs over "
+          f"{total * ANSWERS_PER_GAME:,} stored answers")
+
+    conn = connect(path)
+    kept = {(player, category): (answered, correct) for player, category, answered, correct in conn.execute(
+        "SELECT player, category, answered, correct FROM player_categories")}
+    games = sum(row[0] for row in conn.execute("SELECT games FROM players"))
+    failed = False
+    if writer.written != total or games != total:
+        print(f"❌ {writer.written:,} games written and {games:,} counted, expected {total:,}")
+        failed = True
+    if kept != recount(conn):
+        print("❌ category aggregates differ from a recount of the answers")
+        failed = True
+    if p99 * 1000 > args.max_record_ms:
+        print(f"❌ record_game() p99 is over {args.max_record_ms:g} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("✅ aggregates match a full recount")
+
+
+if __name__ == "__main__":
+    main()
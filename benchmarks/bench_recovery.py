@@ -0,0 +1,243 @@
+"""
+Crash recovery benchmark
+========================
+
+Kills a process holding 100k in-flight games on the journaled state store
+(state_journal.py) and measures how long a new one takes to get them back.
+
+A worker process starts --games sessions, then makes --moves moves on random
+games, saving each session after every move as the app does. Snapshots are
+taken along the way. It also opens a multiplayer room on the same store
+(game_rooms.py) and plays a round up to its last question, whose answers
+are left buffered. The worker then writes half of one more journal entry
+and exits with os._exit(), with no close, flush or fsync, like a crash in
+the middle of a write.
+
+This process then opens the same directory and reports:
+
+* the worker's write throughput and save latency with the journal on,
+* recovery time, split into loading the snapshot and replaying the journal,
+* how much journal was replayed, against the snapshot threshold.
+
+Every save that returned before the crash must be recovered exactly, and
+the recovered room, once its last question is ticked, must match the same
+moves played on a room with no store. Fails if any session is missing or
+different, if the room is, or if recovery takes longer than
+--max-recovery-s.
+
+Usage:
+    python -m benchmarks.bench_recovery [--games 100000] [--moves 300000] [--fsync everysec]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import state_store
+from game_engine import new_game, new_player, FINISHED, MAX_ROUNDS, QUESTION, QUESTIONS_PER_ROUND, READY, ROUND_OVER
+from game_rooms import create_room, get_room, Room, ROOM_KEY_PREFIX
+from state_journal import encode_entry, JournaledStateStore, SET, SNAPSHOT_BYTES
+from state_store import encode_session, session_key
+from benchmarks.synthetic import make_questions
+
+BANK_SIGNATURE = (1_700_000_000_000_000_000, 4096)
+ROOM_PLAYERS = 50
+
+
+def new_session(session_id):
+    player = new_player(f"player-{session_id}", "⚔️")
+    return {'game_state': 'playing', 'players': [player], 'game': new_game(player), 'game_id': session_id,
+            'game_started': True, 'seen_questions': set(), 'question_details': {},
+            'questions_per_round': QUESTIONS_PER_ROUND, 'max_rounds': MAX_ROUNDS}
+
+
+def move(state, rng):
+    """Make the game's next move; a finished game starts over"""
+    game = state['game']
+    if game.phase == FINISHED:
+        state.update(new_session(state['game_id']))
+    elif game.phase == READY:
+        first = (game.round - 1) * QUESTIONS_PER_ROUND
+        positions = list(range(first, first + QUESTIONS_PER_ROUND))
+        state[f'round_{game.round}_questions'] = positions
+        state[f'round_{game.round}_bank'] = BANK_SIGNATURE
+        state['game'] = game.deal([(1000 + p, p % 4) for p in positions], 15)
+    elif game.phase == ROUND_OVER:
+        state['game'] = game.next_round()
+    elif game.phase == QUESTION:
+        question_id, answer_index = game.questions[game.question]
+        state['seen_questions'].add(question_id)
+        state['question_details'][question_id] = ('History', 'easy')
+        state['game'] = game.answer(question_id, rng.randrange(4), elapsed=round(rng.uniform(1, 12), 2))
+    else:
+        state['game'] = game.next()
+
+
+def saves(games, moves, seed=1):
+    """Yield the (key, encoded session) saves of the run, the same every time"""
+    rng = random.Random(seed)
+    states = {}
+    for i in range(games):
+        session_id = f"{i:08x}"
+        states[session_id] = new_session(session_id)
+        yield session_key(session_id), encode_session(states[session_id])
+    session_ids = list(states)
+    for _ in range(moves):
+        session_id = rng.choice(session_ids)
+        move(states[session_id], rng)
+        yield session_key(session_id), encode_session(states[session_id])
+
+
+def use_store(store, directory):
+    """Make store the one game_rooms finds through get_state_store()"""
+    state_store.STATE_STORE = f'journal:{directory}'
+    state_store._stores[state_store.STATE_STORE] = store
+
+
+def join_room(room):
+    """Seat the room's players; the host is already in"""
+    for i in range(1, ROOM_PLAYERS):
+        room.join(f"player-{i}", f"Player {i}", "🛡️")
+
+
+def play_room(room, seed=1):
+    """Deal a round and play it to its last question, leaving that question's answers buffered"""
+    rng = random.Random(seed)
+    questions = make_questions(QUESTIONS_PER_ROUND, seed=seed)
+    room.deal(questions)
+    for question in questions:
+        for key in list(room.players):
+            if rng.random() < 0.9:
+                room.submit(key, question['id'], rng.randrange(4), now=room.asked_at + rng.uniform(1, 12))
+        if question is questions[-1]:
+            return
+        room.tick()
+        room.next()
+
+
+def room_state(room):
+    """Players and answer history, with elapsed times rounded past clock noise"""
+    history = {key: [(question_id, outcome, None if elapsed is None else round(elapsed, 6))
+                     for question_id, outcome, elapsed in answers] for key, answers in room.history.items()}
+    return dict(room.players), history
+
+
+def worker(directory, games, moves, fsync, snapshot_bytes):
+    """Write every save to a journaled store, then crash mid-entry"""
+    store = JournaledStateStore(directory, fsync=fsync, snapshot_bytes=snapshot_bytes)
+    use_store(store, directory)
+    latencies = []
+    started = time.perf_counter()
+    for key, data in saves(games, moves):
+        saving = time.perf_counter()
+        store.set(key, data)
+        latencies.append(time.perf_counter() - saving)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    room = create_room("host", "Host", "⚔️")
+    join_room(room)
+    play_room(room)
+    print(json.dumps({
+        'saves': len(latencies),
+        'seconds': elapsed,
+        'p50_us': latencies[len(latencies) // 2] * 1e6,
+        'p99_us': latencies[len(latencies) * 99 // 100] * 1e6,
+        'snapshots': store.snapshots,
+        'room': room.code,
+        'buffered': room.answered
+    }), flush=True)
+
+    # The crash: half an entry reaches the journal, then the process is gone without closing anything
+    entry = encode_entry(SET, time.time(), 1, b'session/torn', b'x' * 512)
+    with store._lock:
+        os.write(store._fd, entry[:len(entry) // 2])
+        os._exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=100_000, help="in-flight games")
+    parser.add_argument('--moves', type=int, default=300_000, help="moves made after every game has started")
+    parser.add_argument('--fsync', choices=('everysec', 'always'), default='everysec')
+    parser.add_argument('--snapshot-mb', type=float, default=SNAPSHOT_BYTES / 2**20,
+                        help="journal size that triggers a snapshot (at least the last snapshot's size)")
+    parser.add_argument('--max-recovery-s', type=float, default=5.0)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    snapshot_bytes = int(args.snapshot_mb * 2**20)
+
+    if args.worker:
+        worker(args.worker, args.games, args.moves, args.fsync, snapshot_bytes)
+        return
+
+    directory = tempfile.mkdtemp(prefix='arena-journal-')
+    command = [sys.executable, '-m', 'benchmarks.bench_recovery', '--worker', directory, '--games', str(args.games),
+               '--moves', str(args.moves), '--fsync', args.fsync, '--snapshot-mb', str(args.snapshot_mb)]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 1 or not result.stdout.strip():
+        print(result.stderr)
+        print("❌ worker failed before the crash")
+        sys.exit(1)
+    written = json.loads(result.stdout.strip().splitlines()[-1])
+    on_disk = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+    store = JournaledStateStore(directory, fsync=args.fsync, snapshot_bytes=snapshot_bytes)
+    recovery = store.recovery
+
+    # The room as it would be had nothing crashed, then the recovered one with its last question ticked
+    reference = Room(written['room'], "host")
+    reference.join("host", "Host", "⚔️")
+    join_room(reference)
+    play_room(reference)
+    reference.tick()
+    use_store(store, directory)
+    room = get_room(written['room'])
+    buffered = room.answered if room is not None else 0
+    if room is not None:
+        room.tick()
+
+    expected = {}
+    for key, data in saves(args.games, args.moves):
+        expected[key] = hashlib.blake2b(data, digest_size=8).digest()
+    recovered = {key: hashlib.blake2b(value, digest_size=8).digest() for key, (value, _, _) in store._values.items()
+                 if not key.startswith(ROOM_KEY_PREFIX)}
+    wrong = sum(recovered.get(key) != digest for key, digest in expected.items())
+    extra = len(recovered.keys() - expected.keys())
+    store.close()
+
+    print(f"worker: {written['saves']:,} saves in {written['seconds']:.1f}s "
+          f"({written['saves'] / written['seconds']:,.0f}/s), fsync {args.fsync}, "
+          f"save p50 {written['p50_us']:.1f} µs  p99 {written['p99_us']:.1f} µs, "
+          f"{written['snapshots']} snapshots, {on_disk / 2**20:,.1f} MB on disk at the crash")
+    print(f"recovery: {recovery['keys']:,} keys in {recovery['seconds']:.2f}s "
+          f"(snapshot {recovery['snapshot_seconds']:.2f}s, "
+          f"{recovery['entries']:,} journal entries / {recovery['journal_bytes'] / 2**20:,.1f} MB "
+          f"from {recovery['journals']} file(s) in {recovery['seconds'] - recovery['snapshot_seconds']:.2f}s)")
+
+    print(f"room: {len(reference.players)} players, {written['buffered']} answers buffered at the crash, "
+          f"{buffered} recovered")
+
+    failed = False
+    if room is None or buffered != written['buffered'] or room_state(room) != room_state(reference):
+        print(f"❌ room {written['room']} missing or different after recovery")
+        failed = True
+    if wrong or extra:
+        print(f"❌ {wrong:,} of {len(expected):,} sessions missing or different after recovery, {extra:,} extra")
+        failed = True
+    if recovery['seconds'] > args.max_recovery_s:
+        print(f"❌ recovery took over {args.max_recovery_s:g}s")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print(f"✅ all {len(expected):,} sessions and the room recovered exactly; the torn entry was dropped")
+
+
+if __name__ == "__main__":
+    main()
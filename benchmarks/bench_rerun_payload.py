@@ -0,0 +1,186 @@
+"""
+Rerun payload benchmark
+=======================
+
+Plays through the app with Streamlit's AppTest (setup screen, typing a
+name, adding a player, starting, answering, next question) and reports for
+each rerun:
+
+* bytes: the serialized size of every element the rerun sends,
+* css: how much of that is theme CSS or the theme loader,
+* the first run's script time and the external URLs its markup fetches
+  before the page can paint (e.g. a web font @import),
+* an estimate of time to first paint: the first run plus the time this
+  host takes to fetch those URLs, or to fail or give up on them after
+  --fetch-timeout. A browser holds the first paint for render-blocking
+  stylesheets, so an offline host pays the full wait. Browser layout and
+  paint time itself is not included.
+
+With --baseline REV the same flow also runs against that git revision, for
+a before/after comparison. Each version runs in its own process and scratch
+directory, so databases and imports don't mix.
+
+Usage:
+    python -m benchmarks.bench_rerun_payload [--baseline HEAD~1] [--fetch-timeout 10]
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = 'quiz_royale.py'
+RUNTIME_FILES = ('questions.json', '.streamlit')
+EXTERNAL_URL = re.compile(r"""(?:@import\s+url\(|<link[^>]+href=)['"]?(https?://[^'")\s>]+)""")
+THEME_MARKERS = ('<style', 'theme.css')
+
+
+def element_payloads(node, out):
+    """Collect (proto bytes, serialized size) for every element under an AppTest node"""
+    proto = getattr(node, 'proto', None)
+    if proto is not None and hasattr(proto, 'SerializeToString'):
+        out.append(proto.SerializeToString())
+    children = getattr(node, 'children', None)
+    if isinstance(children, dict):
+        for child in children.values():
+            element_payloads(child, out)
+    return out
+
+
+def measure(at, step):
+    payloads = element_payloads(at._tree, [])
+    css = sum(len(p) for p in payloads if any(marker.encode() in p for marker in THEME_MARKERS))
+    urls = sorted({url for p in payloads for url in EXTERNAL_URL.findall(p.decode('utf-8', 'ignore'))})
+    errors = [str(e.value) for e in at.exception]
+    return {'step': step, 'bytes': sum(len(p) for p in payloads), 'css': css, 'external': urls, 'errors': errors}
+
+
+def fetch_seconds(url, timeout):
+    """Time until url is fetched, fails or times out"""
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+    except OSError:
+        pass
+    return min(time.perf_counter() - started, timeout)
+
+
+def blocking_seconds(urls, timeout):
+    """Time the first paint waits on urls; a browser fetches them in parallel"""
+    if not urls:
+        return 0.0
+    with ThreadPoolExecutor(len(urls)) as pool:
+        return max(pool.map(lambda url: fetch_seconds(url, timeout), urls))
+
+
+def click(at, label=None, key=None):
+    for button in at.button:
+        if (key is not None and button.key == key) or (label is not None and button.label == label):
+            return button.click().run()
+    raise LookupError(f"No button {label or key!r} on this screen")
+
+
+def worker(app_dir):
+    """Play through the app in app_dir from the current directory; prints one JSON report"""
+    sys.path.insert(0, app_dir)
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(app_dir, APP), default_timeout=60)
+    started = time.perf_counter()
+    at.run()
+    first_run = time.perf_counter() - started
+    steps = [measure(at, 'setup (first run)')]
+
+    at.text_input[0].input("Bench").run()
+    steps.append(measure(at, 'type name'))
+    click(at, 'ADD PLAYER')
+    steps.append(measure(at, 'add player'))
+    click(at, 'START')
+    steps.append(measure(at, 'start: question'))
+    click(at, key='option_0')
+    steps.append(measure(at, 'answer'))
+    click(at, key='next_question_btn')
+    steps.append(measure(at, 'next question'))
+    print(json.dumps({'first_run_s': first_run, 'steps': steps}))
+
+
+def run_version(app_dir):
+    """Run the flow for the app in app_dir in a fresh scratch directory and process"""
+    workdir = tempfile.mkdtemp(prefix='arena-payload-')
+    for name in RUNTIME_FILES:
+        source = os.path.join(app_dir, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(workdir, name))
+        elif os.path.exists(source):
+            shutil.copy(source, workdir)
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', app_dir],
+                            cwd=workdir, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def checkout(rev):
+    """Extract a git revision of the repository into a scratch directory"""
+    target = tempfile.mkdtemp(prefix='arena-baseline-')
+    archive = subprocess.run(['git', 'archive', rev], cwd=ROOT, capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', target], input=archive, check=True)
+    return target
+
+
+def print_report(name, report, timeout):
+    steps = report['steps']
+    blocking = blocking_seconds(steps[0]['external'], timeout)
+    report['first_paint_s'] = report['first_run_s'] + blocking
+    print(f"{name}: first run {report['first_run_s'] * 1000:.0f} ms, "
+          f"external fetches before first paint: {', '.join(steps[0]['external']) or 'none'}")
+    print(f"  first paint ~{report['first_paint_s'] * 1000:,.0f} ms "
+          f"(script {report['first_run_s'] * 1000:,.0f} ms + blocking fetches {blocking * 1000:,.0f} ms)")
+    for step in steps:
+        errors = f"   ❌ {step['errors'][0]}" if step['errors'] else ''
+        print(f"  {step['step']:<20} {step['bytes']:>7,} bytes   css {step['css']:>6,}{errors}")
+    later = steps[1:]
+    print(f"  {'mean after first':<20} {sum(s['bytes'] for s in later) / len(later):>7,.0f} bytes   "
+          f"css {sum(s['css'] for s in later) / len(later):>6,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baseline', help="git revision to compare against")
+    parser.add_argument('--fetch-timeout', type=float, default=10.0,
+                        help="seconds before a render-blocking fetch is given up, for the first-paint estimate")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker)
+        return
+
+    reports = {}
+    if args.baseline:
+        reports[args.baseline] = run_version(checkout(args.baseline))
+    reports['current'] = run_version(ROOT)
+    for name, report in reports.items():
+        print_report(name, report, args.fetch_timeout)
+
+    if any(step['errors'] for report in reports.values() for step in report['steps']):
+        sys.exit(1)
+    if args.baseline:
+        before, after = (sum(s['bytes'] for s in report['steps'][1:]) for report in reports.values())
+        print(f"{'✅' if after < before else '❌'} {before - after:,} fewer bytes over "
+              f"{len(reports['current']['steps']) - 1} reruns ({1 - after / before:.0%}); first paint "
+              f"~{reports[args.baseline]['first_paint_s'] * 1000:,.0f} -> "
+              f"~{reports['current']['first_paint_s'] * 1000:,.0f} ms")
+        if after >= before:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Room tick benchmark
+===================
+
+Plays full 3-round games in one room with many players. Submitter threads
+buffer answers concurrently, the way separate sessions would, and each
+question closes with a single tick(). The script reports submit throughput
+and per-tick scoring latency. It also checks every player's final score
+against game_engine.simulate_game() on that player's outcomes.
+
+Usage:
+    python -m benchmarks.bench_rooms [--players 1000] [--games 20] [--threads 4]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+
+from game_engine import simulate_game, CORRECT, FINISHED, MAX_ROUNDS, QUESTIONS_PER_ROUND, TIMED_OUT, WRONG
+from game_rooms import close_room, create_room
+from benchmarks.synthetic import make_questions
+
+QUESTIONS_PER_GAME = MAX_ROUNDS * QUESTIONS_PER_ROUND
+
+
+def make_outcomes(players, seed, accuracy=0.7, timeout_rate=0.05):
+    """One row of per-question outcomes per player"""
+    rng = random.Random(seed)
+
+    def outcome():
+        if rng.random() < timeout_rate:
+            return TIMED_OUT
+        return CORRECT if rng.random() < accuracy else WRONG
+
+    return {f"player-{i}": [outcome() for _ in range(QUESTIONS_PER_GAME)] for i in range(players)}
+
+
+def submit_all(room, keys, outcomes, column, question):
+    """Submit one answer per player in keys, skipping the ones who time out"""
+    for key in keys:
+        outcome = outcomes[key][column]
+        if outcome == TIMED_OUT:
+            continue
+        choice = question['answer_index'] if outcome == CORRECT else (question['answer_index'] + 1) % 4
+        room.submit(key, question['id'], choice)
+
+
+def play_room(outcomes, questions, threads):
+    """Play one room to the end, returning its final standings and timings"""
+    keys = list(outcomes)
+    room = create_room(keys[0], keys[0], "⚔️")
+    for key in keys[1:]:
+        room.join(key, key, "🛡️")
+
+    submit_seconds = 0.0
+    submits = 0
+    tick_seconds = []
+    column = 0
+    while room.phase != FINISHED:
+        room.deal(questions[(room.round - 1) * QUESTIONS_PER_ROUND:room.round * QUESTIONS_PER_ROUND])
+        for _ in range(QUESTIONS_PER_ROUND):
+            question = room.current_question
+            active = [key for key in keys if room.is_active(key)]
+            workers = [
+                threading.Thread(target=submit_all, args=(room, active[i::threads], outcomes, column, question))
+                for i in range(threads)
+            ]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            submit_seconds += time.perf_counter() - started
+            submits += room.answered
+
+            started = time.perf_counter()
+            room.tick()
+            tick_seconds.append(time.perf_counter() - started)
+            room.next()
+            column += 1
+        if room.phase != FINISHED:
+            room.next_round()
+
+    close_room(room.code)
+    return room.players, submits, submit_seconds, tick_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=1000)
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--target-ms', type=float, default=50.0, help="p99 tick latency required to pass")
+    args = parser.parse_args()
+
+    questions = make_questions(QUESTIONS_PER_GAME, seed=1)
+    total_submits = 0
+    total_submit_seconds = 0.0
+    ticks = []
+    for game in range(args.games):
+        outcomes = make_outcomes(args.players, seed=game)
+        players, submits, submit_seconds, tick_seconds = play_room(outcomes, questions, args.threads)
+        for key, player in players.items():
+            expected = simulate_game(outcomes[key])
+            actual = (player.final_score, player.eliminated)
+            assert actual == (expected[0], expected[2]), (key, actual, expected)
+        total_submits += submits
+        total_submit_seconds += submit_seconds
+        ticks.extend(tick_seconds)
+
+    ticks_ms = sorted(t * 1000 for t in ticks)
+    p99 = ticks_ms[min(len(ticks_ms) - 1, int(len(ticks_ms) * 0.99))]
+    print(f"{args.games} games × {args.players:,} players, {len(ticks):,} ticks; scores match simulate_game()")
+    print(f"submit:  {total_submits / total_submit_seconds:>12,.0f} answers/s over {args.threads} threads")
+    print(f"tick:    p50 {statistics.median(ticks_ms):7.2f} ms   p99 {p99:7.2f} ms   max {ticks_ms[-1]:7.2f} ms")
+    if p99 > args.target_ms:
+        print(f"❌ p99 tick above the {args.target_ms:.0f} ms target")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Round selection benchmark
+=========================
+
+Compares the linear scan in get_questions_by_difficulty_and_topic() with the
+(difficulty, category) index built by the question bank.
+
+Usage:
+    python -m benchmarks.bench_round_selection [--sizes 1000 100000 1000000]
+"""
+
+import argparse
+import time
+
+from question_bank import QuestionBank, TOPIC_TO_CATEGORIES
+from benchmarks.synthetic import make_questions
+
+
+def scan(questions, difficulty, topic_categories):
+    """The original per-rerun filter, kept here as the baseline"""
+    return [q for q in questions if q['difficulty'] == difficulty and q['category'] in topic_categories]
+
+
+def time_per_call(func, repeat):
+    """Return the mean seconds per call over repeat calls"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def run(sizes):
+    """Benchmark both selection paths at each bank size"""
+    categories = TOPIC_TO_CATEGORIES['Hollywood/Bollywood']
+    results = []
+    for size in sizes:
+        questions = make_questions(size)
+        started = time.perf_counter()
+        bank = QuestionBank.from_questions(questions)
+        build_seconds = time.perf_counter() - started
+
+        assert len(bank.select('easy', categories)) == len(scan(questions, 'easy', categories))
+
+        repeat = max(3, 1_000_000 // size)
+        scan_seconds = time_per_call(lambda: scan(questions, 'easy', categories), repeat)
+        index_seconds = time_per_call(lambda: bank.select('easy', categories), 10_000)
+        results.append({
+            'size': size,
+            'index_build_ms': build_seconds * 1000,
+            'scan_us': scan_seconds * 1e6,
+            'index_us': index_seconds * 1e6,
+            'speedup': scan_seconds / index_seconds
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'questions':>10} {'build ms':>10} {'scan us':>12} {'index us':>10} {'speedup':>10}")
+    for r in run(args.sizes):
+        print(f"{r['size']:>10} {r['index_build_ms']:>10.1f} {r['scan_us']:>12.1f} "
+              f"{r['index_us']:>10.3f} {r['speedup']:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Round sampling benchmark
+========================
+
+Compares the draw latency of the original round setup (copy the whole pool,
+shuffle it, track used ids in a list) with sample_positions(), which draws
+questions_per_round positions with a partial Fisher-Yates shuffle and a
+set-based "already seen" exclusion.
+
+Usage:
+    python -m benchmarks.bench_sampling [--sizes 1000 100000 1000000]
+"""
+
+import argparse
+import random
+import time
+
+from question_bank import QuestionBank, sample_positions
+from benchmarks.synthetic import make_questions
+
+QUESTIONS_PER_ROUND = 5
+
+
+def original_draw(pool, questions_per_round):
+    """Copy and shuffle the pool, then walk it with a list of used ids"""
+    shuffled = list(pool)
+    random.shuffle(shuffled)
+    used = []
+    for current in range(questions_per_round):
+        q = shuffled[current]
+        if q['id'] not in used:
+            used.append(q['id'])
+    # A second pass for unused questions, as when a round runs out
+    return [q for q in shuffled if q['id'] not in used][:1]
+
+
+def sampled_draw(pool, questions_per_round, seen):
+    """Draw positions directly, excluding questions the player has seen"""
+    # Start a new player every 20 draws (about seven 3-round games)
+    if len(seen) >= 20 * questions_per_round:
+        seen.clear()
+    positions = sample_positions(pool, questions_per_round, seen)
+    for position in positions:
+        seen.add(pool.bank.record(position).id)
+    return positions
+
+
+def time_per_call(func, repeat):
+    """Return the mean seconds per call over repeat calls"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def run(sizes):
+    """Benchmark both draw paths on the easy-question pool of each bank size"""
+    results = []
+    for size in sizes:
+        bank = QuestionBank.from_questions(make_questions(size))
+        pool = bank.select('easy', ('Hollywood', 'Bollywood', 'History', 'Sports'))
+
+        repeat = max(3, 200_000 // size)
+        original_seconds = time_per_call(lambda: original_draw(pool, QUESTIONS_PER_ROUND), repeat)
+
+        # The seen set grows across draws, as it does over a player's games
+        seen = set()
+        sampled_seconds = time_per_call(lambda: sampled_draw(pool, QUESTIONS_PER_ROUND, seen), 2_000)
+        results.append({
+            'size': len(pool),
+            'bank': len(bank),
+            'original_us': original_seconds * 1e6,
+            'sampled_us': sampled_seconds * 1e6,
+            'speedup': original_seconds / sampled_seconds
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'bank':>10} {'pool':>10} {'original us':>12} {'sampled us':>11} {'speedup':>10}")
+    for r in run(args.sizes):
+        print(f"{r['bank']:>10} {r['size']:>10} {r['original_us']:>12.1f} {r['sampled_us']:>11.2f} "
+              f"{r['speedup']:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Shared state store benchmark
+============================
+
+Plays games the way several app processes behind a load balancer would, with
+every process on one SQLite state store (state_store.py):
+
+* sessions: every move of every game is made by whichever worker process
+  picks it up. The worker restores the session from the store, makes the move
+  and saves it again. Halfway through, all the workers are replaced, as in a
+  restart. Reports bytes per saved session and save/restore latency.
+* a room: players join and answer from different worker processes, while
+  this process deals and ticks each question.
+
+Fails unless every final score matches game_engine.simulate_game() on the
+game's outcomes.
+
+Usage:
+    python -m benchmarks.bench_state_store [--sessions 1000] [--players 200] [--workers 4]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import state_store
+from game_engine import (new_game, new_player, simulate_game, CORRECT, FINISHED, MAX_ROUNDS, QUESTION,
+                         QUESTIONS_PER_ROUND, READY, ROUND_OVER, TIMED_OUT, WRONG)
+from game_rooms import create_room, get_room
+from state_store import decode_session, encode_session, get_state_store, session_key
+from benchmarks.synthetic import make_questions
+
+QUESTIONS_PER_GAME = MAX_ROUNDS * QUESTIONS_PER_ROUND
+BANK_SIGNATURE = (1_700_000_000_000_000_000, 4096)
+
+
+def make_outcomes(seed, accuracy=0.7, timeout_rate=0.05):
+    rng = random.Random(seed)
+    return [TIMED_OUT if rng.random() < timeout_rate else CORRECT if rng.random() < accuracy else WRONG
+            for _ in range(QUESTIONS_PER_GAME)]
+
+
+def init_worker(spec):
+    state_store.STATE_STORE = spec
+
+
+def new_session(session_id):
+    """The session state of a game that was just started"""
+    player = new_player(f"player-{session_id}", "⚔️")
+    return {'game_state': 'playing', 'players': [player], 'game': new_game(player), 'game_id': session_id,
+            'game_started': True, 'seen_questions': set(), 'question_details': {},
+            'questions_per_round': QUESTIONS_PER_ROUND, 'max_rounds': MAX_ROUNDS}
+
+
+def move(state, session_id):
+    """Make the game's next move: deal, answer, next question or next round"""
+    game = state['game']
+    if game.phase == READY:
+        first = (game.round - 1) * QUESTIONS_PER_ROUND
+        positions = list(range(first, first + QUESTIONS_PER_ROUND))
+        state[f'round_{game.round}_questions'] = positions
+        state[f'round_{game.round}_bank'] = BANK_SIGNATURE
+        state[f'round_{game.round}_topic'] = 'History/GK'
+        game = game.deal([(1000 + p, p % 4) for p in positions], 15).ask(time.monotonic())
+    elif game.phase == ROUND_OVER:
+        game = game.next_round()
+    elif game.phase == QUESTION:
+        question_id, answer_index = game.questions[game.question]
+        outcome = make_outcomes(int(session_id, 16))[len(game.history)]
+        state['seen_questions'].add(question_id)
+        state['question_details'][question_id] = ('History', 'easy')
+        choice = None if outcome == TIMED_OUT else answer_index if outcome == CORRECT else (answer_index + 1) % 4
+        game = game.answer(question_id, choice, elapsed=2.5)
+    else:
+        game = game.next().ask(time.monotonic())
+    state['game'] = game
+    return game.phase == FINISHED
+
+
+def step_sessions(session_ids):
+    """Restore, move and save each session; returns (session id, pid, restore s, save s, bytes, finished) rows"""
+    store = get_state_store()
+    results = []
+    for session_id in session_ids:
+        started = time.perf_counter()
+        state = decode_session(store.get(session_key(session_id))[1])
+        restored = time.perf_counter()
+        finished = move(state, session_id)
+        saving = time.perf_counter()
+        data = encode_session(state)
+        store.set(session_key(session_id), data)
+        results.append((session_id, os.getpid(), restored - started, time.perf_counter() - saving, len(data),
+                        finished))
+    return results
+
+
+def play_sessions(spec, sessions, workers):
+    """Play every session to the end through worker pools; returns timings and wrongly scored games"""
+    store = get_state_store()
+    session_ids = [f"{i:08x}" for i in range(1, sessions + 1)]
+    for session_id in session_ids:
+        store.set(session_key(session_id), encode_session(new_session(session_id)))
+
+    restores, saves, sizes = [], [], []
+    last_pid = {}
+    moves = switched = 0
+    active = list(session_ids)
+    passes = 0
+    pool = multiprocessing.Pool(workers, init_worker, (spec,))
+    restarted = False
+    while active:
+        if not restarted and passes >= QUESTIONS_PER_GAME:
+            # Halfway through: every worker goes away and new ones take over the same games
+            pool.close()
+            pool.join()
+            pool = multiprocessing.Pool(workers, init_worker, (spec,))
+            restarted = True
+        # Shuffled small chunks, so consecutive moves of a game land on different workers
+        random.shuffle(active)
+        chunks = [active[i:i + 16] for i in range(0, len(active), 16)]
+        still_active = []
+        for results in pool.imap_unordered(step_sessions, chunks):
+            for session_id, pid, restore, save, size, finished in results:
+                moves += 1
+                switched += last_pid.get(session_id, pid) != pid
+                last_pid[session_id] = pid
+                restores.append(restore)
+                saves.append(save)
+                sizes.append(size)
+                if not finished:
+                    still_active.append(session_id)
+        active = still_active
+        passes += 1
+    pool.close()
+    pool.join()
+
+    mismatches = 0
+    for session_id in session_ids:
+        game = decode_session(store.get(session_key(session_id))[1])['game']
+        expected = simulate_game(make_outcomes(int(session_id, 16)))
+        mismatches += (game.player.final_score, game.player.eliminated) != (expected[0], expected[2])
+    return {'moves': moves, 'switched': switched, 'restores': restores, 'saves': saves, 'sizes': sizes,
+            'mismatches': mismatches}
+
+
+def join_players(code, keys):
+    room = get_room(code)
+    for key in keys:
+        room.join(key, key, "🛡️")
+    return len(keys)
+
+
+def submit_answers(code, keys):
+    """Answer the room's open question for each player in keys, from this worker process"""
+    room = get_room(code)
+    question = room.current_question
+    accepted = 0
+    for key in keys:
+        if not room.is_active(key):
+            continue
+        outcome = make_outcomes(int(key.split('-')[1]))[(room.round - 1) * QUESTIONS_PER_ROUND + room.question]
+        if outcome == TIMED_OUT:
+            continue
+        choice = question['answer_index'] if outcome == CORRECT else (question['answer_index'] + 1) % 4
+        accepted += room.submit(key, question['id'], choice)
+    return accepted
+
+
+def play_room(spec, players, workers):
+    """Play one room whose players are spread over the worker processes"""
+    keys = [f"player-{i}" for i in range(players)]
+    questions = make_questions(QUESTIONS_PER_GAME, seed=1)
+    room = create_room(keys[0], keys[0], "⚔️")
+    chunks = [keys[1:][i::workers] for i in range(workers)]
+    submits = 0
+    submit_seconds = 0.0
+    ticks = []
+    with multiprocessing.Pool(workers, init_worker, (spec,)) as pool:
+        pool.starmap(join_players, [(room.code, chunk) for chunk in chunks])
+        room.refresh()
+        while room.phase != FINISHED:
+            room.deal(questions[(room.round - 1) * QUESTIONS_PER_ROUND:room.round * QUESTIONS_PER_ROUND])
+            for _ in range(QUESTIONS_PER_ROUND):
+                started = time.perf_counter()
+                submits += sum(pool.starmap(submit_answers, [(room.code, chunk) for chunk in [keys[:1]] + chunks]))
+                submit_seconds += time.perf_counter() - started
+                started = time.perf_counter()
+                room.tick()
+                ticks.append(time.perf_counter() - started)
+                room.next()
+            if room.phase != FINISHED:
+                room.next_round()
+
+    mismatches = sum(
+        (player.final_score, player.eliminated) != (expected[0], expected[2])
+        for key, player in room.players.items()
+        for expected in [simulate_game(make_outcomes(int(key.split('-')[1])))]
+    )
+    return {'players': len(room.players), 'submits': submits, 'submit_seconds': submit_seconds, 'ticks': ticks,
+            'mismatches': mismatches}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=1000)
+    parser.add_argument('--players', type=int, default=200, help="players in the shared room")
+    parser.add_argument('--workers', type=int, default=4, help="app worker processes")
+    args = parser.parse_args()
+
+    spec = f"sqlite:{os.path.join(tempfile.mkdtemp(prefix='arena-state-'), 'arena_state.db')}"
+    init_worker(spec)
+
+    sessions = play_sessions(spec, args.sessions, args.workers)
+    sizes = sessions['sizes']
+    print(f"sessions: {args.sessions:,} games, {sessions['moves']:,} moves over {args.workers} workers "
+          f"and a restart; {sessions['switched'] / sessions['moves']:.0%} of moves on another process than the last")
+    print(f"  saved session: mean {statistics.mean(sizes):,.0f} bytes, max {max(sizes):,}")
+    print(f"  restore: p50 {percentile(sessions['restores'], 0.5) * 1e6:7.1f} µs   "
+          f"p99 {percentile(sessions['restores'], 0.99) * 1e6:7.1f} µs")
+    print(f"  save:    p50 {percentile(sessions['saves'], 0.5) * 1e6:7.1f} µs   "
+          f"p99 {percentile(sessions['saves'], 0.99) * 1e6:7.1f} µs")
+
+    room = play_room(spec, args.players, args.workers)
+    ticks_ms = [t * 1000 for t in room['ticks']]
+    print(f"room: {room['players']:,} players on {args.workers} workers, {len(ticks_ms)} questions")
+    print(f"  submit: {room['submits'] / room['submit_seconds']:,.0f} answers/s across processes")
+    print(f"  tick:   p50 {statistics.median(ticks_ms):7.2f} ms   p99 {percentile(ticks_ms, 0.99):7.2f} ms")
+
+    failed = False
+    if sessions['mismatches']:
+        print(f"❌ {sessions['mismatches']:,} resumed games ended with the wrong score")
+        failed = True
+    if room['mismatches'] or room['players'] != args.players:
+        print(f"❌ {room['mismatches']:,} of {room['players']:,} room players ended with the wrong score")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("✅ every game resumed on any process and scored as simulate_game()")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Tournament tick benchmark
+=========================
+
+Plays whole single-elimination tournaments (tournament.py) whose first stage
+has 100, 1,000 and 10,000 head-to-head matches at once. Every entrant
+submits their answers and each question closes with a single tick() across
+every match of the wave.
+
+For each size the script reports the first stage's per-tick latency and its
+cost per match. Scoring is inline by default, so the latency grows linearly
+with the number of matches in the wave; what stays flat, and what is
+checked, is the cost per match. It checks that:
+
+* every player's final score and answer history in every match match
+  game_engine.simulate_game() on their outcomes for that stage,
+* every match was won by the best score (the higher seed on a tie),
+* one champion is left after entrants - 1 matches.
+
+Fails if any check fails, or if the cost per match at the largest size is
+more than --max-growth times the cost at the smallest.
+
+Usage:
+    python -m benchmarks.bench_tournament [--matches 100,1000,10000] [--workers N] [--capacity N]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+
+from game_engine import simulate_game, CORRECT, FINISHED, MAX_ROUNDS, QUESTIONS_PER_ROUND, TIMED_OUT, WRONG
+from tournament import Tournament
+from benchmarks.synthetic import make_questions
+
+QUESTIONS_PER_GAME = MAX_ROUNDS * QUESTIONS_PER_ROUND
+
+
+def make_outcomes(key, stage, accuracy=0.7, timeout_rate=0.05):
+    """An entrant's per-question outcomes for one stage, the same on every run"""
+    rng = random.Random(f"{key}/{stage}")
+    return [TIMED_OUT if rng.random() < timeout_rate else CORRECT if rng.random() < accuracy else WRONG
+            for _ in range(QUESTIONS_PER_GAME)]
+
+
+def play_tournament(entrants, questions, workers, capacity):
+    """Play a tournament to the end
+
+    Returns it with the matches played, (seconds, matches in the wave) for
+    each first-stage tick, and the number of mismatches found.
+    """
+    tournament = Tournament({key: (key, "⚔️") for key in entrants}, workers=workers, capacity=capacity)
+    seeds = {key: seed for seed, key in enumerate(entrants)}
+    outcomes = {}
+    first_stage_ticks = []
+    mismatches = 0
+    played = []
+    while tournament.phase != FINISHED:
+        stage = tournament.stage
+        wave = tournament.matches
+        keys = [key for match in wave for key in match.keys]
+        for key in keys:
+            outcomes[key] = make_outcomes(key, stage)
+
+        while True:
+            first = (tournament.round - 1) * QUESTIONS_PER_ROUND
+            tournament.deal(questions[first:first + QUESTIONS_PER_ROUND])
+            for column in range(first, first + QUESTIONS_PER_ROUND):
+                question = tournament.questions[tournament.question]
+                for key in keys:
+                    outcome = outcomes[key][column]
+                    if outcome == TIMED_OUT or not tournament.is_active(key):
+                        continue
+                    choice = question['answer_index'] if outcome == CORRECT else (question['answer_index'] + 1) % 4
+                    tournament.submit(key, question['id'], choice)
+                started = time.perf_counter()
+                tournament.tick()
+                if stage == 1:
+                    first_stage_ticks.append((time.perf_counter() - started, len(wave)))
+                tournament.next()
+            if tournament.matches is not wave:
+                break
+            tournament.next_round()
+
+        for match in wave:
+            for key, player in match.players.items():
+                expected = simulate_game(outcomes[key])
+                mismatches += (player.final_score, player.eliminated) != (expected[0], expected[2])
+                history = [outcome for _, outcome, _ in match.history[key]]
+                mismatches += history != outcomes[key][:expected[1] * QUESTIONS_PER_ROUND]
+            best = max(match.keys, key=lambda key: (match.players[key].final_score, -seeds[key]))
+            mismatches += match.winner != best
+        played.extend(wave)
+    return tournament, played, first_stage_ticks, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--matches', default='100,1000,10000', help="first-stage matches played at once")
+    parser.add_argument('--workers', type=int, default=1, help="scoring pool processes, capped at the CPU count")
+    parser.add_argument('--capacity', type=int, default=None, help="most matches played at once")
+    parser.add_argument('--max-growth', type=float, default=1.5,
+                        help="largest allowed ratio of per-match tick cost, largest size over smallest")
+    args = parser.parse_args()
+
+    questions = make_questions(QUESTIONS_PER_GAME, seed=1)
+    failed = False
+    per_match = []
+    for matches in [int(size) for size in args.matches.split(',')]:
+        # Enough entrants for exactly this many full first-stage matches; the rest of the slots are byes
+        slots = 1
+        while slots < matches:
+            slots *= 2
+        entrants = [f"player-{i}" for i in range(slots + matches)]
+
+        started = time.perf_counter()
+        tournament, played, ticks, mismatches = play_tournament(entrants, questions, args.workers, args.capacity)
+        elapsed = time.perf_counter() - started
+        ticks_ms = sorted(seconds * 1000 for seconds, _ in ticks)
+        p99 = ticks_ms[min(len(ticks_ms) - 1, int(len(ticks_ms) * 0.99))]
+        cost = statistics.median(seconds * 1e6 / size for seconds, size in ticks)
+        per_match.append(cost)
+        print(f"{matches:>6,} first-stage matches ({len(entrants):,} entrants, {tournament.stage} stages, "
+              f"{tournament.waves} waves, {elapsed:.1f}s): tick p50 {statistics.median(ticks_ms):7.2f} ms   "
+              f"p99 {p99:7.2f} ms   {cost:5.2f} µs per match")
+
+        if mismatches:
+            print(f"❌ {mismatches:,} wrong scores or winners")
+            failed = True
+        if len(played) != len(entrants) - 1 or tournament.champion is None:
+            print(f"❌ {len(played):,} matches played for {len(entrants):,} entrants")
+            failed = True
+
+    growth = per_match[-1] / per_match[0]
+    print(f"per-match tick cost: {growth:.2f}x from the smallest to the largest size, workers={tournament.workers}")
+    if growth > args.max_growth:
+        print(f"❌ per-match tick cost grew more than {args.max_growth:g}x")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("✅ every match scored as simulate_game() and every bracket crowned one champion")
+
+
+if __name__ == "__main__":
+    main()
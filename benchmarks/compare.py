@@ -0,0 +1,68 @@
+"""
+Benchmark comparison
+====================
+
+Compares two result files from benchmarks.suite and fails if any case got
+slower than the tolerance allows. Cases faster than the noise floor in both
+runs are reported but never fail.
+
+Usage:
+    python -m benchmarks.compare baseline.json current.json [--tolerance 0.25] [--floor-us 2]
+"""
+
+import argparse
+import json
+import sys
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+def compare(baseline, current, tolerance, floor_seconds):
+    """Return [(case, baseline s, current s, ratio, status)] for cases in both runs"""
+    rows = []
+    for case in sorted(baseline.keys() & current.keys()):
+        before = baseline[case]['median_s']
+        after = current[case]['median_s']
+        ratio = after / before if before else float('inf')
+        if max(before, after) < floor_seconds:
+            status = 'noise'
+        elif ratio > 1 + tolerance:
+            status = 'REGRESSION'
+        elif ratio < 1 / (1 + tolerance):
+            status = 'faster'
+        else:
+            status = 'ok'
+        rows.append((case, before, after, ratio, status))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown, as a fraction")
+    parser.add_argument('--floor-us', type=float, default=2.0, help="ignore cases faster than this")
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    current = load_results(args.current)
+    rows = compare(baseline, current, args.tolerance, args.floor_us / 1e6)
+
+    print(f"{'case':<32} {'baseline µs':>14} {'current µs':>14} {'ratio':>7}")
+    for case, before, after, ratio, status in rows:
+        print(f"{case:<32} {before * 1e6:>14,.1f} {after * 1e6:>14,.1f} {ratio:>6.2f}x  {status}")
+    for case in sorted(baseline.keys() - current.keys()):
+        print(f"{case:<32} missing from {args.current}")
+
+    regressions = [row for row in rows if row[4] == 'REGRESSION']
+    if regressions:
+        print(f"❌ {len(regressions)} case(s) slower than the {args.tolerance:.0%} tolerance")
+        sys.exit(1)
+    print(f"✅ No regressions over {len(rows)} cases")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Answer server load test
+=======================
+
+Opens thousands of concurrent clients against answer_server.py. Each client
+plays solo games back to back, pausing a random think time before every
+move. The script reports p50/p99 latency from sending an answer to receiving
+its diff, plus answer throughput.
+
+Clients are spread over several processes so the generator isn't the
+bottleneck. A local server is started on a free port unless --port is given.
+
+Usage:
+    python -m benchmarks.load_answers [--clients 10000] [--seconds 30] [--think 5] [--transport ws]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from answer_server import encode_frame, open_websocket, read_head, read_message, OP_TEXT
+
+CONNECT_CONCURRENCY = 200
+
+
+class WebSocketClient:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    async def connect(self):
+        self.reader, self.writer = await open_websocket(self.host, self.port)
+
+    async def call(self, message):
+        self.writer.write(encode_frame(OP_TEXT, json.dumps(message).encode('utf-8'), mask=True))
+        return json.loads(await read_message(self.reader, self.writer, mask=True))
+
+
+class HttpClient:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def call(self, message):
+        body = json.dumps(message).encode('utf-8')
+        self.writer.write((
+            f"POST /answer HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n"
+        ).encode('latin-1') + body)
+        _, headers = await read_head(self.reader)
+        return json.loads(await self.reader.readexactly(int(headers['content-length'])))
+
+
+async def play(client, rng, think, start_at, stop_at, latencies, counts):
+    """Play games until stop_at, timing answers sent after start_at"""
+    state = game_id = None
+    while time.monotonic() < stop_at:
+        if state is None or state['phase'] == 'finished':
+            reply = await client.call({'type': 'start', 'name': 'load', 'avatar': '⚔️'})
+            game_id, state = reply['game_id'], reply['state']
+            continue
+
+        await asyncio.sleep(rng.expovariate(1 / think) if think else 0)
+        phase = state['phase']
+        if phase == 'question':
+            message = {'type': 'answer', 'game_id': game_id, 'question_id': state['question_id'],
+                       'choice': rng.randrange(len(state['options']))}
+        elif phase == 'answered':
+            message = {'type': 'next', 'game_id': game_id}
+        else:
+            message = {'type': 'next_round', 'game_id': game_id}
+
+        started = time.perf_counter()
+        reply = await client.call(message)
+        if phase == 'question' and time.monotonic() >= start_at:
+            latencies.append(time.perf_counter() - started)
+        if 'error' in reply:
+            counts['errors'] += 1
+            state = None
+            continue
+        state.update(reply['diff'])
+
+
+async def run_clients(transport, host, port, clients, think, warmup, seconds, seed):
+    """Connect every client first, then play; returns (answer latencies, counts)"""
+    rng = random.Random(seed)
+    client_class = WebSocketClient if transport == 'ws' else HttpClient
+    connections = [client_class(host, port) for _ in range(clients)]
+    counts = {'errors': 0, 'connect_failures': 0}
+
+    gate = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+    async def connect(client):
+        async with gate:
+            try:
+                await client.connect()
+                return client
+            except OSError:
+                counts['connect_failures'] += 1
+
+    connected = [c for c in await asyncio.gather(*(connect(c) for c in connections)) if c is not None]
+
+    latencies = []
+    start_at = time.monotonic() + warmup
+    stop_at = start_at + seconds
+    results = await asyncio.gather(
+        *(play(c, random.Random(rng.random()), think, start_at, stop_at, latencies, counts) for c in connected),
+        return_exceptions=True
+    )
+    counts['client_errors'] = sum(isinstance(r, Exception) for r in results)
+    counts['connected'] = len(connected)
+    for client in connected:
+        client.writer.close()
+    return latencies, counts
+
+
+def worker(args):
+    return asyncio.run(run_clients(*args))
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    """Start answer_server.py on port and wait until it accepts connections"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server = subprocess.Popen([sys.executable, os.path.join(root, 'answer_server.py'), '--port', str(port)],
+                              cwd=root, preexec_fn=raise_fd_limit)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise SystemExit("❌ answer_server.py did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=10_000)
+    parser.add_argument('--processes', type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument('--seconds', type=float, default=30, help="measured run time")
+    parser.add_argument('--warmup', type=float, default=5, help="unmeasured time after all clients connect")
+    parser.add_argument('--think', type=float, default=5.0, help="mean seconds between a client's moves")
+    parser.add_argument('--transport', choices=('ws', 'http'), default='ws')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help="use a running server instead of starting one")
+    args = parser.parse_args()
+
+    limit = raise_fd_limit()
+    per_process = -(-args.clients // args.processes)
+    if per_process + 64 > limit:
+        raise SystemExit(f"❌ {per_process} clients per process needs more than the {limit} open file limit; "
+                         f"use more --processes")
+
+    server = None
+    port = args.port
+    if port is None:
+        port = free_port()
+        server = start_server(port)
+    try:
+        jobs = [(args.transport, args.host, port, min(per_process, args.clients - i * per_process),
+                 args.think, args.warmup, args.seconds, i) for i in range(args.processes)]
+        with multiprocessing.Pool(len(jobs)) as pool:
+            results = pool.map(worker, jobs)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies = sorted(t * 1000 for part, _ in results for t in part)
+    totals = {key: sum(counts[key] for _, counts in results) for key in results[0][1]}
+    print(f"{totals['connected']:,} / {args.clients:,} {args.transport} clients connected, "
+          f"think time {args.think:g}s, {args.seconds:g}s measured")
+    if not latencies:
+        raise SystemExit("❌ no answers were measured")
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"answers: {len(latencies):,} ({len(latencies) / args.seconds:,.0f}/s)")
+    print(f"latency: p50 {statistics.median(latencies):.2f} ms   p99 {p99:.2f} ms   max {latencies[-1]:.2f} ms")
+    print(f"errors:  {totals['errors']} replies, {totals['client_errors']} clients, "
+          f"{totals['connect_failures']} failed connections")
+
+
+if __name__ == "__main__":
+    main()
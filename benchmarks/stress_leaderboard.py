@@ -0,0 +1,65 @@
+"""
+Leaderboard stress test
+=======================
+
+Submits scores from many processes at once into a fresh leaderboard
+database, then checks that every single submission landed exactly once.
+Exits non-zero if any write was lost or duplicated.
+
+Usage:
+    python -m benchmarks.stress_leaderboard [--processes 8] [--submissions 2000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import leaderboard_store
+
+
+def submit_scores(args):
+    """Worker: submit a numbered run of scores under one player name"""
+    path, worker, submissions = args
+    started = time.perf_counter()
+    for seq in range(submissions):
+        leaderboard_store.add_score(f"stress-{worker}", seq, "⚔️", "2024-01-01 00:00:00", path=path)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--submissions', type=int, default=2000, help="scores submitted by each process")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, leaderboard_store.LEADERBOARD_DB)
+        leaderboard_store.connect(path)
+
+        jobs = [(path, worker, args.submissions) for worker in range(args.processes)]
+        started = time.perf_counter()
+        with multiprocessing.Pool(args.processes) as pool:
+            pool.map(submit_scores, jobs)
+        elapsed = time.perf_counter() - started
+
+        expected = {(f"stress-{w}", seq) for w in range(args.processes) for seq in range(args.submissions)}
+        rows = leaderboard_store.connect(path).execute("SELECT name, score FROM scores").fetchall()
+        found = set(rows)
+
+        total = args.processes * args.submissions
+        print(f"{total} submissions from {args.processes} processes in {elapsed:.2f}s "
+              f"({total / elapsed:,.0f} writes/s)")
+
+        lost = expected - found
+        duplicated = len(rows) - len(found)
+        if lost or duplicated:
+            print(f"❌ {len(lost)} lost, {duplicated} duplicated writes")
+            sys.exit(1)
+        print(f"✅ all {len(rows)} writes present exactly once; top score {leaderboard_store.top_scores(1, path)[0]['score']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Benchmark suite
+===============
+
+Times the paths every rerun and every game goes through, at several bank
+and leaderboard sizes, and writes the results as JSON for compare.py:
+
+* load/<size>         cold get_question_bank() (what load_questions() calls)
+* load_cached/<size>  the per-rerun cache hit
+* load_compiled/<size>
+                      cold get_question_bank() of the same bank compiled to .qbank
+* select/<size>       get_questions_by_difficulty_and_topic() on the bank index
+* draw/<size>         the round deal: sample_positions() with seen questions excluded
+* answer              handle_answer(): Game.answer() and next() on the clock
+* leaderboard_add/<rows>, leaderboard_read/<rows>, leaderboard_refresh/<rows>,
+  leaderboard_rebuild/<rows>
+                      add_to_leaderboard() and load_leaderboard() on a store
+                      already holding that many scores
+
+The app functions themselves need a Streamlit runtime, so each case calls the
+module function it delegates to. Bank size 70 is the shipped questions.json;
+larger banks are synthetic and written to a scratch directory, the 1M one
+streamed to disk and auto-converted to NDJSON like in production.
+
+Usage:
+    python -m benchmarks.suite [--sizes 70 10000 1000000] [--leaderboard-rows 100 10000 100000]
+                               [--output benchmarks/results/latest.json] [--quick]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import uuid
+from datetime import datetime, timezone
+
+from game_engine import new_game, new_player
+from leaderboard_store import add_score, connect, get_leaderboard_view, LeaderboardView, INSERT_SCORE
+from question_bank import (clear_cache, convert_to_binary, get_question_bank, sample_positions, BINARY_SUFFIX,
+                           QUESTIONS_FILE, TOPIC_TO_CATEGORIES)
+from benchmarks.synthetic import write_questions_json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join('benchmarks', 'results', 'latest.json')
+SHIPPED_BANK_SIZE = 70
+QUESTIONS_PER_ROUND = 5
+REPEAT = 5
+
+
+def measure(func, repeat=REPEAT):
+    """Per-call seconds over repeat batches, each long enough to time reliably"""
+    timer = timeit.Timer(func)
+    loops, _ = timer.autorange()
+    per_call = [timer.timeit(loops) / loops for _ in range(repeat)]
+    return {'median_s': statistics.median(per_call), 'min_s': min(per_call), 'loops': loops, 'repeat': repeat}
+
+
+def prepare_bank(workdir, size):
+    """Return the path of a question file with size questions"""
+    if size == SHIPPED_BANK_SIZE:
+        return os.path.join(ROOT, QUESTIONS_FILE)
+    path = os.path.join(workdir, f'questions-{size}.json')
+    write_questions_json(path, size)
+    # Pay any NDJSON conversion now so load/<size> measures a normal cold start
+    clear_cache()
+    get_question_bank(path)
+    return path
+
+
+def compiled_load_case(workdir, path, size):
+    """Time a cold open of the bank compiled to a .qbank"""
+    compiled = convert_to_binary(path, os.path.join(workdir, f'questions-{size}{BINARY_SUFFIX}'))
+
+    def cold_load():
+        clear_cache()
+        get_question_bank(compiled)
+
+    return measure(cold_load)
+
+
+def bank_cases(path):
+    """Time loading, filtering and dealing from one bank"""
+    results = {}
+
+    def cold_load():
+        clear_cache()
+        get_question_bank(path)
+
+    results['load'] = measure(cold_load)
+    clear_cache()
+    bank = get_question_bank(path)
+    results['load_cached'] = measure(lambda: get_question_bank(path))
+
+    categories = TOPIC_TO_CATEGORIES['Hollywood/Bollywood']
+    results['select'] = measure(lambda: bank.select('medium', categories))
+
+    view = bank.select('medium', categories)
+    seen = set()
+
+    def draw():
+        # A new player every 20 draws, like bench_sampling
+        if len(seen) >= 20 * QUESTIONS_PER_ROUND:
+            seen.clear()
+        for position in sample_positions(view, QUESTIONS_PER_ROUND, seen):
+            seen.add(bank.record(position)['id'])
+
+    results['draw'] = measure(draw)
+    return results
+
+
+def answer_case():
+    """Time one answer and advance through the engine, as handle_answer() and next_question() do"""
+    game = new_game(new_player("bench", "⚔️")).deal(((i, i % 4) for i in range(QUESTIONS_PER_ROUND)), 15)
+    game = game.ask(time.monotonic())
+    return measure(lambda: game.answer(0, 0, now=time.monotonic()).next())
+
+
+def fill_leaderboard(path, rows):
+    """Insert rows random scores in a single transaction"""
+    rng = random.Random(rows)
+    conn = connect(path)
+    conn.execute("BEGIN")
+    conn.executemany(INSERT_SCORE, (
+        (f"player{rng.randrange(rows // 2 + 1)}", rng.randrange(400), "⚔️", "2025-01-01 00:00:00", uuid.uuid4().hex)
+        for _ in range(rows)
+    ))
+    conn.execute("COMMIT")
+
+
+def leaderboard_cases(workdir, rows):
+    """Time score submission and leaderboard reads against a store holding rows scores"""
+    path = os.path.join(workdir, f'leaderboard-{rows}.db')
+    fill_leaderboard(path, rows)
+    rng = random.Random(0)
+    results = {}
+
+    # Reads first: every timed add grows the store past its nominal size
+    conn = connect(path)
+    results['leaderboard_rebuild'] = measure(lambda: LeaderboardView().refresh(conn), repeat=3)
+    get_leaderboard_view(path)
+    results['leaderboard_read'] = measure(lambda: get_leaderboard_view(path).top())
+
+    def add():
+        add_score("bench", rng.randrange(400), "⚔️", "2025-01-01 00:00:00", uuid.uuid4().hex, path=path)
+
+    def refresh():
+        add()
+        get_leaderboard_view(path).top()
+
+    results['leaderboard_add'] = measure(add)
+    results['leaderboard_refresh'] = measure(refresh)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, leaderboard_rows, workdir):
+    """Run every case and return {case name: timing}"""
+    results = {}
+    for size in sizes:
+        started = time.perf_counter()
+        path = prepare_bank(workdir, size)
+        for case, timing in bank_cases(path).items():
+            results[f'{case}/{size}'] = timing
+        results[f'load_compiled/{size}'] = compiled_load_case(workdir, path, size)
+        print(f"  bank {size:>9,}: {time.perf_counter() - started:6.1f}s", file=sys.stderr)
+
+    results['answer'] = answer_case()
+
+    for rows in leaderboard_rows:
+        started = time.perf_counter()
+        for case, timing in leaderboard_cases(workdir, rows).items():
+            results[f'{case}/{rows}'] = timing
+        print(f"  leaderboard {rows:>9,}: {time.perf_counter() - started:6.1f}s", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[SHIPPED_BANK_SIZE, 10_000, 1_000_000])
+    parser.add_argument('--leaderboard-rows', type=int, nargs='+', default=[100, 10_000, 100_000])
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--quick', action='store_true', help="skip the largest bank and leaderboard")
+    args = parser.parse_args()
+    if args.quick:
+        args.sizes = [size for size in args.sizes if size <= 10_000]
+        args.leaderboard_rows = [rows for rows in args.leaderboard_rows if rows <= 10_000]
+
+    workdir = tempfile.mkdtemp(prefix='arena-bench-')
+    try:
+        results = run(args.sizes, args.leaderboard_rows, workdir)
+    finally:
+        clear_cache()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'sizes': args.sizes,
+            'leaderboard_rows': args.leaderboard_rows
+        },
+        'results': results
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    for case, timing in results.items():
+        print(f"{case:<32} {timing['median_s'] * 1e6:>14,.1f} µs  (min {timing['min_s'] * 1e6:,.1f})")
+    print(f"✅ Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Synthetic question banks for benchmarks
+=======================================
+
+Generates questions with the same shape and category/difficulty mix as
+questions.json so benchmarks can run at sizes far beyond the shipped bank.
+"""
+
+import json
+import random
+
+CATEGORIES = ['Hollywood', 'Bollywood', 'History', 'Sports']
+DIFFICULTIES = ['easy', 'medium', 'hard']
+
+
+def iter_questions(count, seed=42):
+    """Yield count synthetic questions with deterministic categories and answers"""
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {
+            'id': i + 1,
+            'question': f"Synthetic question number {i + 1}?",
+            'options': [f"Option {i + 1}-{j}" for j in range(4)],
+            'answer_index': rng.randrange(4),
+            'category': CATEGORIES[rng.randrange(len(CATEGORIES))],
+            'difficulty': DIFFICULTIES[rng.randrange(len(DIFFICULTIES))]
+        }
+
+
+def make_questions(count, seed=42):
+    """Return count synthetic questions with deterministic categories and answers"""
+    return list(iter_questions(count, seed))
+
+
+def write_questions_json(path, count, seed=42):
+    """Write a questions.json-style array of count synthetic questions without holding them all in memory"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[\n')
+        for i, q in enumerate(iter_questions(count, seed)):
+            if i:
+                f.write(',\n')
+            json.dump(q, f, ensure_ascii=False)
+        f.write('\n]\n')
@@ -0,0 +1,297 @@
+"""
+Game Engine
+===========
+
+Headless rules for The Knowledge Arena, with no Streamlit dependency.
+
+A Game is an immutable snapshot and every move returns a new one:
+
+    game = new_game(new_player("Ada", "⚔️"))
+    game = game.deal([(7, 2), (12, 0), (3, 1), (40, 3), (18, 0)])
+    game = game.answer(7, 2, elapsed=3.1)
+    game = game.next()
+
+A round is dealt as (question_id, answer_index) pairs, so a game never needs
+the question bank itself and answers for anything but the current question
+are rejected. The Streamlit app keeps the current Game in session state and
+only draws questions and renders.
+
+Timers are server-side and cost nothing between events. deal() takes the
+round's time limit and ask(now) stamps the current question with a
+time.monotonic() reading when it is shown. answer(..., now=...) derives the
+elapsed time from that stamp and counts a late answer as a timeout.
+expire(now) applies the timeout lazily, on whatever event arrives after the
+deadline. Every answer is kept in Game.history as (question_id, outcome,
+elapsed).
+
+simulate_game() plays a whole game from a flat list of outcomes, for load
+tests and balance work. It applies the same scoring functions as Game, once
+per player state, and replays them from a table. Outcomes are CORRECT, WRONG
+or TIMED_OUT (plain booleans work too).
+"""
+
+import threading
+from collections import namedtuple
+
+START_HP = 100
+CORRECT_XP = 10
+WRONG_ANSWER_DAMAGE = 20
+TIMEOUT_DAMAGE = 10
+COMBO_STREAK = 3
+COMBO_HEAL = 15
+HEAL_AMOUNT = 20
+SCORE_HP_MULTIPLIER = 2
+QUESTIONS_PER_ROUND = 5
+MAX_ROUNDS = 3
+
+# Per-question outcomes for simulate_game()
+WRONG = 0
+CORRECT = 1
+TIMED_OUT = 2
+
+# Game phases
+READY = 'ready'            # round number set, waiting for deal()
+QUESTION = 'question'      # waiting for an answer to the current question
+ANSWERED = 'answered'      # showing the result of the last answer
+ROUND_OVER = 'round_over'  # between rounds, waiting for next_round()
+FINISHED = 'finished'      # survived the last round or was eliminated
+
+
+class GameError(Exception):
+    """Raised when a move is not valid in the game's current phase"""
+
+
+class Player(namedtuple('Player', 'name avatar hp max_hp xp streak shields heals eliminated')):
+    """Immutable player stats"""
+
+    __slots__ = ()
+
+    @property
+    def final_score(self):
+        return self.xp + self.hp * SCORE_HP_MULTIPLIER
+
+
+def new_player(name, avatar):
+    """Create a new player with initial stats"""
+    return Player(name, avatar, START_HP, START_HP, 0, 0, 0, 0, False)
+
+
+def score_answer(player, is_correct):
+    """Apply the XP, streak, combo heal, shield and damage rules for one answer"""
+    # Unpacked and rebuilt positionally: this runs once per answer in every simulation
+    name, avatar, hp, max_hp, xp, streak, shields, heals, eliminated = player
+    if is_correct:
+        xp += CORRECT_XP
+        streak += 1
+
+        # Combo heal for streak of 3
+        if streak >= COMBO_STREAK:
+            hp = min(max_hp, hp + COMBO_HEAL)
+            streak = 0
+    elif shields > 0:
+        # The shield absorbs the hit and leaves the streak alone
+        shields -= 1
+    else:
+        hp = max(0, hp - WRONG_ANSWER_DAMAGE)
+        streak = 0
+        eliminated = eliminated or hp <= 0
+    return Player(name, avatar, hp, max_hp, xp, streak, shields, heals, eliminated)
+
+
+def score_timeout(player):
+    """Apply the timeout penalty: HP loss that shields don't block, and a broken streak"""
+    name, avatar, hp, max_hp, xp, streak, shields, heals, eliminated = player
+    hp = max(0, hp - TIMEOUT_DAMAGE)
+    return Player(name, avatar, hp, max_hp, xp, 0, shields, heals, eliminated or hp <= 0)
+
+
+def award_round(player):
+    """Give survivors one shield and one heal at the end of a round"""
+    if player.eliminated:
+        return player
+    return player._replace(shields=player.shields + 1, heals=player.heals + 1)
+
+
+def use_heal(player):
+    """Spend a heal power-up if the player has one"""
+    if player.heals <= 0:
+        return player
+    return player._replace(heals=player.heals - 1, hp=min(player.max_hp, player.hp + HEAL_AMOUNT))
+
+
+class Game(namedtuple('Game', 'player round question questions phase last_correct last_elapsed '
+                              'questions_per_round max_rounds time_limit asked_at history')):
+    """Immutable game snapshot; every move returns a new Game"""
+
+    __slots__ = ()
+
+    @property
+    def current_question_id(self):
+        """Id of the question being asked or just answered, or None between rounds"""
+        if self.phase in (QUESTION, ANSWERED):
+            return self.questions[self.question][0]
+        return None
+
+    @property
+    def is_over(self):
+        return self.phase == FINISHED
+
+    @property
+    def deadline(self):
+        """Clock reading after which the current question times out, or None if it isn't timed"""
+        if self.asked_at is None or self.time_limit is None:
+            return None
+        return self.asked_at + self.time_limit
+
+    @property
+    def last_outcome(self):
+        """CORRECT, WRONG or TIMED_OUT for the most recent answer, or None"""
+        return self.history[-1][1] if self.history else None
+
+    def deal(self, questions, time_limit=None):
+        """Set the round's (question_id, answer_index) pairs and optional per-question time limit
+
+        From READY this starts the round. Mid-round it swaps in new questions
+        without moving the player's place or clock, e.g. after the bank was
+        reloaded.
+        """
+        questions = tuple((question_id, answer_index) for question_id, answer_index in questions)
+        if len(questions) < self.questions_per_round:
+            raise GameError(f"Need {self.questions_per_round} questions, got {len(questions)}")
+        if self.phase == READY:
+            return self._replace(questions=questions, question=0, phase=QUESTION, last_correct=None,
+                                 time_limit=time_limit, asked_at=None)
+        if self.phase in (QUESTION, ANSWERED):
+            return self._replace(questions=questions)
+        raise GameError(f"Cannot deal questions while {self.phase}")
+
+    def ask(self, now):
+        """Start the current question's clock, unless it is already running"""
+        if self.phase != QUESTION or self.asked_at is not None:
+            return self
+        return self._replace(asked_at=now)
+
+    def expire(self, now):
+        """Time out the current question if its deadline has passed by now"""
+        deadline = self.deadline
+        if self.phase != QUESTION or deadline is None or now <= deadline:
+            return self
+        return self._answered(None, now - self.asked_at)
+
+    def answer(self, question_id, choice, elapsed=None, now=None):
+        """Answer the current question, returning the game with the result applied
+
+        A choice of None means the player ran out of time. Given now, the
+        elapsed time comes from the clock started by ask() and an answer after
+        the deadline counts as a timeout.
+        """
+        if self.phase != QUESTION:
+            raise GameError(f"Cannot answer while {self.phase}")
+        expected_id = self.questions[self.question][0]
+        if question_id != expected_id:
+            raise GameError(f"Question {question_id} is not the current question")
+
+        if now is not None and self.asked_at is not None:
+            elapsed = now - self.asked_at
+            if self.time_limit is not None and elapsed > self.time_limit:
+                choice = None
+        return self._answered(choice, elapsed)
+
+    def _answered(self, choice, elapsed):
+        question_id, answer_index = self.questions[self.question]
+        if choice is None:
+            player, is_correct, outcome = score_timeout(self.player), False, TIMED_OUT
+        else:
+            is_correct = choice == answer_index
+            player, outcome = score_answer(self.player, is_correct), CORRECT if is_correct else WRONG
+        return Game(player, self.round, self.question, self.questions, ANSWERED, is_correct, elapsed,
+                    self.questions_per_round, self.max_rounds, self.time_limit, self.asked_at,
+                    self.history + ((question_id, outcome, elapsed),))
+
+    def next(self):
+        """Move past an answered question, ending the round after the last one"""
+        if self.phase != ANSWERED:
+            raise GameError(f"Cannot advance while {self.phase}")
+        question = self.question + 1
+        if question < self.questions_per_round:
+            return Game(self.player, self.round, question, self.questions, QUESTION, None, self.last_elapsed,
+                        self.questions_per_round, self.max_rounds, self.time_limit, None, self.history)
+
+        # Award power-ups to survivors; the game ends on elimination or after the last round
+        player = award_round(self.player)
+        over = player.eliminated or self.round >= self.max_rounds
+        return self._replace(player=player, question=0, phase=FINISHED if over else ROUND_OVER, asked_at=None)
+
+    def next_round(self):
+        """Start the next round; deal() then supplies its questions"""
+        if self.phase != ROUND_OVER:
+            raise GameError(f"Cannot start a new round while {self.phase}")
+        return self._replace(round=self.round + 1, question=0, questions=(), phase=READY, last_correct=None)
+
+    def heal(self):
+        """Use a heal power-up"""
+        if self.phase == FINISHED:
+            raise GameError("Cannot heal after the game is over")
+        return self._replace(player=use_heal(self.player))
+
+
+def new_game(player, questions_per_round=QUESTIONS_PER_ROUND, max_rounds=MAX_ROUNDS):
+    """Start a game at round 1, waiting for its first deal"""
+    return Game(player, 1, 0, (), READY, None, None, questions_per_round, max_rounds, None, None, ())
+
+
+# simulate_game() walks a table of every player state it has reached, numbered from 0 (a new player). Each row
+# holds the next state for CORRECT, WRONG and TIMED_OUT, then for the end of a round; -1 until first needed.
+_sim_players = [new_player('', '')]
+_sim_next = [[-1, -1, -1, -1]]
+_sim_ids = {_sim_players[0]: 0}
+_sim_lock = threading.Lock()
+_ROUND_END = 3
+
+
+def _sim_step(state, move):
+    """Add the state that follows state after move to the table, using the step API's rules"""
+    player = _sim_players[state]
+    if move == _ROUND_END:
+        player = award_round(player)
+    elif move == TIMED_OUT:
+        player = score_timeout(player)
+    else:
+        player = score_answer(player, move == CORRECT)
+    with _sim_lock:
+        following = _sim_ids.get(player)
+        if following is None:
+            following = _sim_ids[player] = len(_sim_players)
+            _sim_players.append(player)
+            _sim_next.append([-1, -1, -1, -1])
+        _sim_next[state][move] = following
+    return following
+
+
+def simulate_game(outcomes, questions_per_round=QUESTIONS_PER_ROUND, max_rounds=MAX_ROUNDS):
+    """Play a whole game from a flat sequence of per-question outcomes
+
+    Returns (final_score, rounds_played, eliminated). outcomes needs one
+    CORRECT, WRONG or TIMED_OUT entry per question the game could ask.
+
+    The rules are score_answer(), score_timeout() and award_round()
+    themselves, applied once per distinct player state and remembered, so a
+    game is a walk over a table of a few thousand states and can never
+    disagree with Game.
+    """
+    following = _sim_next
+    state = 0
+    outcomes = iter(outcomes)
+
+    for round_num in range(1, max_rounds + 1):
+        for _ in range(questions_per_round):
+            move = next(outcomes)
+            state_next = following[state][move]
+            state = state_next if state_next >= 0 else _sim_step(state, move)
+        if _sim_players[state].eliminated:
+            break
+        state_next = following[state][_ROUND_END]
+        state = state_next if state_next >= 0 else _sim_step(state, _ROUND_END)
+
+    player = _sim_players[state]
+    return player.final_score, round_num, player.eliminated
@@ -0,0 +1,456 @@
+"""
+Game Rooms
+==========
+
+Multiplayer arenas where every player answers the same question at once.
+
+A Room lives in a process-wide store rather than in any browser session, so
+every Streamlit session in the process sees the same state:
+
+    room = create_room("host-key", "Ada", "⚔️")
+    room.join("player-key", "Grace", "🛡️")
+    room.deal(questions)                  # host: the round's question records
+    room.submit("player-key", 7, 2)       # any session, any time before the tick
+    room.tick()                           # host: closes the question, scores everyone
+    room.next()
+
+Answers are only buffered when they arrive, timed from the server's
+time.monotonic() stamp on the question. tick() scores every player in one
+pass with the rules from game_engine, including a timeout for anyone who
+didn't answer, so a room of 1,000 players costs one batch per question
+instead of one rerun per player. As in a single-player game, a player
+knocked out mid-round plays the round out and is out from the next one.
+
+A question dealt with a time limit refuses late answers, and expire() ticks
+it on the first event after its deadline, so idle rooms cost nothing.
+
+Room.history keeps each player's answers as (question_id, outcome, elapsed),
+like Game.history, and Room.question_details the category and difficulty of
+every question dealt, for the stats store.
+
+Rooms share the phases of game_engine.Game. Each change bumps Room.version,
+so a session can tell whether there is anything new to render, and calls any
+watchers registered with Room.watch(), e.g. to push updates to clients.
+
+With a durable state store (ARENA_STATE_STORE=journal or sqlite, see
+state_store.py) rooms live in the store instead, so they survive a restart
+and, with SQLite, players on different app processes can share one. Every
+move takes the room's lock in the store, starts from its latest saved state
+and saves it again; get_room() brings a process's copy up to date on each
+lookup. Answers go into a per-room set of fields, one per player, so a
+submit writes a single small row rather than the whole room. Watchers only
+hear about moves made in their own process.
+"""
+
+import json
+import random
+import string
+import threading
+import time
+from contextlib import contextmanager
+
+from game_engine import (award_round, new_player, score_answer, score_timeout, ANSWERED, CORRECT, FINISHED,
+                         MAX_ROUNDS, QUESTION, QUESTIONS_PER_ROUND, READY, ROUND_OVER, TIMED_OUT, WRONG, Player)
+from state_store import get_state_store, monotonic_time, wall_time
+
+ROOM_CODE_LENGTH = 5
+ROOM_CODE_ALPHABET = ''.join(c for c in string.ascii_uppercase + string.digits if c not in 'O0I1')
+ROOM_IDLE_SECONDS = 60 * 60
+ROOM_KEY_PREFIX = 'room/'
+
+_rooms = {}
+_rooms_lock = threading.Lock()
+
+
+class RoomError(Exception):
+    """Raised when a room move is not valid in the room's current phase"""
+
+
+class Room:
+    """Shared state of one multiplayer game"""
+
+    def __init__(self, code, host, questions_per_round=QUESTIONS_PER_ROUND, max_rounds=MAX_ROUNDS, store=None):
+        self.code = code
+        self.host = host
+        self.questions_per_round = questions_per_round
+        self.max_rounds = max_rounds
+        self.players = {}
+        self.round = 1
+        self.question = 0
+        self.questions = ()
+        self.config = None
+        self.phase = READY
+        self.results = {}
+        self.elapsed = {}
+        self.history = {}
+        self.question_details = {}
+        self.time_limit = None
+        self.asked_at = None
+        self.version = 0
+        self.updated = time.monotonic()
+        self._answers = {}
+        self._active = set()
+        self._watchers = []
+        self._lock = threading.Lock()
+        self._store = store
+        self._key = ROOM_KEY_PREFIX + code
+        self._stored_version = 0
+
+    def _changed(self):
+        self.version += 1
+        self.updated = time.monotonic()
+        if self._store is not None:
+            self._stored_version = self._store.set(self._key, self._dump())
+        for callback in self._watchers:
+            callback(self)
+
+    @contextmanager
+    def _locked(self):
+        """Hold the room for one move; with a store, under its lock there and on its latest saved state"""
+        with self._lock:
+            if self._store is None:
+                yield
+                return
+            with self._store.lock(self._key):
+                if not self._load_latest():
+                    raise RoomError(f"Room {self.code} has closed")
+                yield
+
+    def refresh(self):
+        """Pick up moves other processes saved to the store, returning False if the room is gone"""
+        if self._store is None:
+            return True
+        with self._lock:
+            return self._load_latest()
+
+    def _load_latest(self):
+        version, data = self._store.get(self._key)
+        if data is None:
+            return False
+        if version != self._stored_version:
+            self._load(json.loads(data))
+            self._stored_version = version
+        return True
+
+    def _dump(self):
+        """Serialize the room for the store, with clock readings as wall-clock times"""
+        return json.dumps({
+            'host': self.host,
+            'questions_per_round': self.questions_per_round,
+            'max_rounds': self.max_rounds,
+            'players': self.players,
+            'round': self.round,
+            'question': self.question,
+            'questions': [q if isinstance(q, dict) else q.to_dict() for q in self.questions],
+            'config': self.config,
+            'phase': self.phase,
+            'results': self.results,
+            'elapsed': self.elapsed,
+            'history': self.history,
+            'question_details': [[question_id, *details] for question_id, details in self.question_details.items()],
+            'time_limit': self.time_limit,
+            'asked_at': wall_time(self.asked_at),
+            'version': self.version,
+            'active': sorted(self._active)
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def _load(self, state):
+        self.host = state['host']
+        self.questions_per_round = state['questions_per_round']
+        self.max_rounds = state['max_rounds']
+        self.players = {key: Player(*player) for key, player in state['players'].items()}
+        self.round = state['round']
+        self.question = state['question']
+        self.questions = tuple(state['questions'])
+        self.config = state['config']
+        self.phase = state['phase']
+        self.results = state['results']
+        self.elapsed = state['elapsed']
+        self.history = {key: [tuple(answer) for answer in answers] for key, answers in state['history'].items()}
+        self.question_details = {question_id: tuple(details) for question_id, *details in state['question_details']}
+        self.time_limit = state['time_limit']
+        self.asked_at = monotonic_time(state['asked_at'])
+        self.version = state['version']
+        self.updated = time.monotonic()
+        self._active = set(state['active'])
+
+    def _take_answers(self):
+        """Remove and return the buffered {key: (choice, elapsed)} answers"""
+        if self._store is None:
+            answers, self._answers = self._answers, {}
+            return answers
+        return {key: tuple(json.loads(answer)) for key, answer in self._store.take(self._key).items()}
+
+    def watch(self, callback):
+        """Call callback(room) after every change; it runs under the room lock, so it must not block"""
+        with self._lock:
+            self._watchers.append(callback)
+
+    def unwatch(self, callback):
+        with self._lock:
+            if callback in self._watchers:
+                self._watchers.remove(callback)
+
+    @property
+    def current_question(self):
+        """Record of the question being asked or just revealed, or None between rounds"""
+        if self.phase in (QUESTION, ANSWERED):
+            return self.questions[self.question]
+        return None
+
+    @property
+    def deadline(self):
+        """Clock reading after which the open question stops taking answers, or None"""
+        if self.phase != QUESTION or self.time_limit is None:
+            return None
+        return self.asked_at + self.time_limit
+
+    @property
+    def answered(self):
+        """Number of answers buffered for the current question"""
+        if self._store is not None:
+            return self._store.count(self._key)
+        return len(self._answers)
+
+    def has_answered(self, key):
+        if self._store is not None:
+            return self._store.has(self._key, key)
+        return key in self._answers
+
+    def is_active(self, key):
+        """Whether the player is playing the current round"""
+        return key in self._active
+
+    def join(self, key, name, avatar):
+        """Add a player before the first question, returning their Player"""
+        with self._locked():
+            if key in self.players:
+                return self.players[key]
+            if self.round != 1 or self.phase != READY:
+                raise RoomError(f"Room {self.code} has already started")
+            player = self.players[key] = new_player(name, avatar)
+            self._changed()
+            return player
+
+    def leave(self, key):
+        """Remove a player; one who leaves mid-game is scored as eliminated"""
+        with self._locked():
+            player = self.players.get(key)
+            if player is None:
+                return
+            if self.round == 1 and self.phase == READY:
+                del self.players[key]
+            else:
+                self.players[key] = player._replace(eliminated=True)
+                self._active.discard(key)
+            if key == self.host:
+                # Hand the room to someone still standing so the game can go on
+                remaining = [k for k, p in self.players.items() if k != key and not p.eliminated]
+                self.host = remaining[0] if remaining else None
+            self._changed()
+
+    def deal(self, questions, config=None, time_limit=None):
+        """Start the round with its question records (dicts or Question objects) and per-question time limit"""
+        questions = tuple(questions)
+        with self._locked():
+            if self.phase != READY:
+                raise RoomError(f"Cannot deal questions while {self.phase}")
+            if len(questions) < self.questions_per_round:
+                raise RoomError(f"Need {self.questions_per_round} questions, got {len(questions)}")
+            if not self.players:
+                raise RoomError(f"Room {self.code} has no players")
+            self.questions = questions
+            self.question_details.update((q['id'], (q['category'], q['difficulty'])) for q in questions)
+            self.config = config
+            self.time_limit = time_limit
+            self.asked_at = time.monotonic()
+            self.question = 0
+            self.phase = QUESTION
+            self.results = {}
+            self.elapsed = {}
+            self._take_answers()
+            # Players still standing when the round starts play all of it
+            self._active = {key for key, player in self.players.items() if not player.eliminated}
+            self._changed()
+
+    def submit(self, key, question_id, choice, now=None):
+        """Buffer a player's answer for the current question, returning False if it was not accepted
+
+        Only the first answer counts, and only while the question is open and
+        inside its time limit.
+        """
+        now = time.monotonic() if now is None else now
+        with self._locked():
+            if self.phase != QUESTION or self.questions[self.question]['id'] != question_id:
+                return False
+            if key not in self._active:
+                return False
+            elapsed = now - self.asked_at
+            if self.time_limit is not None and elapsed > self.time_limit:
+                return False
+            if self._store is not None:
+                return self._store.add(self._key, key, json.dumps([choice, elapsed]).encode('utf-8'))
+            if key in self._answers:
+                return False
+            self._answers[key] = (choice, elapsed)
+            return True
+
+    def tick(self):
+        """Close the current question and score every active player in one pass
+
+        Returns {key: CORRECT, WRONG or TIMED_OUT} for the players scored.
+        """
+        with self._locked():
+            if self.phase != QUESTION:
+                raise RoomError(f"Cannot score while {self.phase}")
+            return self._tick()
+
+    def expire(self, now=None):
+        """Tick the open question if its deadline has passed, returning the results or None"""
+        now = time.monotonic() if now is None else now
+        # Checked first without the lock, since every rerun of every player calls this
+        deadline = self.deadline
+        if deadline is None or now <= deadline:
+            return None
+        with self._locked():
+            deadline = self.deadline
+            if deadline is None or now <= deadline:
+                return None
+            return self._tick()
+
+    def _tick(self):
+        question = self.questions[self.question]
+        question_id = question['id']
+        answer_index = question['answer_index']
+        answers = self._take_answers()
+        players = self.players
+        history = self.history
+        results = {}
+        elapsed = {}
+        for key in self._active:
+            answer = answers.get(key)
+            if answer is None:
+                players[key] = score_timeout(players[key])
+                results[key] = TIMED_OUT
+                history.setdefault(key, []).append((question_id, TIMED_OUT, None))
+                continue
+            elapsed[key] = answer[1]
+            if answer[0] == answer_index:
+                players[key] = score_answer(players[key], True)
+                results[key] = CORRECT
+            else:
+                players[key] = score_answer(players[key], False)
+                results[key] = WRONG
+            history.setdefault(key, []).append((question_id, results[key], answer[1]))
+        self.results = results
+        self.elapsed = elapsed
+        self.phase = ANSWERED
+        self._changed()
+        return results
+
+    def next(self):
+        """Move past a revealed question, ending the round after the last one"""
+        with self._locked():
+            if self.phase != ANSWERED:
+                raise RoomError(f"Cannot advance while {self.phase}")
+            self.question += 1
+            if self.question >= self.questions_per_round:
+                # Survivors get their power-ups; the game ends after the last round or when nobody is left
+                players = self.players
+                for key in self._active:
+                    players[key] = award_round(players[key])
+                survivors = any(not player.eliminated for player in players.values())
+                over = not survivors or self.round >= self.max_rounds
+                self.question = 0
+                self.phase = FINISHED if over else ROUND_OVER
+            else:
+                self.phase = QUESTION
+                self.asked_at = time.monotonic()
+            self._changed()
+
+    def next_round(self):
+        """Start the next round; deal() then supplies its questions"""
+        with self._locked():
+            if self.phase != ROUND_OVER:
+                raise RoomError(f"Cannot start a new round while {self.phase}")
+            self.round += 1
+            self.question = 0
+            self.questions = ()
+            self.config = None
+            self.time_limit = None
+            self.results = {}
+            self.elapsed = {}
+            self.phase = READY
+            self._changed()
+
+    def standings(self, limit=None):
+        """Return (key, Player) pairs, best final score first"""
+        ranked = sorted(self.players.items(), key=lambda item: item[1].final_score, reverse=True)
+        return ranked if limit is None else ranked[:limit]
+
+
+def _room_store():
+    """The state store if rooms are kept in it, else None"""
+    store = get_state_store()
+    return store if store.durable else None
+
+
+def _sweep_idle_rooms(now):
+    """Drop rooms nobody has touched for ROOM_IDLE_SECONDS; caller holds _rooms_lock"""
+    for code in [code for code, room in _rooms.items() if now - room.updated > ROOM_IDLE_SECONDS]:
+        del _rooms[code]
+
+
+def create_room(host, name, avatar, questions_per_round=QUESTIONS_PER_ROUND, max_rounds=MAX_ROUNDS):
+    """Open a room with a fresh code and the host as its first player"""
+    store = _room_store()
+    with _rooms_lock:
+        _sweep_idle_rooms(time.monotonic())
+        if store is None:
+            code = ''.join(random.choices(ROOM_CODE_ALPHABET, k=ROOM_CODE_LENGTH))
+            while code in _rooms:
+                code = ''.join(random.choices(ROOM_CODE_ALPHABET, k=ROOM_CODE_LENGTH))
+            room = _rooms[code] = Room(code, host, questions_per_round, max_rounds)
+        else:
+            store.sweep(ROOM_KEY_PREFIX, ROOM_IDLE_SECONDS)
+            # Claim the code in the store, so no other process can open the same room
+            with store.lock(ROOM_KEY_PREFIX):
+                code = ''.join(random.choices(ROOM_CODE_ALPHABET, k=ROOM_CODE_LENGTH))
+                while store.get(ROOM_KEY_PREFIX + code)[1] is not None:
+                    code = ''.join(random.choices(ROOM_CODE_ALPHABET, k=ROOM_CODE_LENGTH))
+                room = _rooms[code] = Room(code, host, questions_per_round, max_rounds, store)
+                room._stored_version = store.set(room._key, room._dump())
+    room.join(host, name, avatar)
+    return room
+
+
+def get_room(code):
+    """Return the room with this code, ignoring case, or None"""
+    code = code.strip().upper()
+    store = _room_store()
+    with _rooms_lock:
+        room = _rooms.get(code)
+        if store is None:
+            return room
+        if room is None:
+            # A room opened by another process, or before a restart
+            room = Room(code, None, store=store)
+            if not room.refresh():
+                return None
+            _rooms[code] = room
+            return room
+    if not room.refresh():
+        with _rooms_lock:
+            _rooms.pop(code, None)
+        return None
+    return room
+
+
+def close_room(code):
+    """Remove a room from the store"""
+    code = code.strip().upper()
+    store = _room_store()
+    with _rooms_lock:
+        _rooms.pop(code, None)
+    if store is not None:
+        store.delete(ROOM_KEY_PREFIX + code)
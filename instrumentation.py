@@ -0,0 +1,252 @@
+"""
+Instrumentation
+===============
+
+Opt-in timing of each phase of a Streamlit rerun.
+
+Timing is off unless ARENA_TIMING=1 is set for the process or a session opens
+the app with ?timing=1. While it is off, timed() returns a shared no-op
+context manager after a single thread-local lookup, so reruns pay next to
+nothing for the instrumented phases:
+
+    begin_rerun(enabled)
+    with timed('load_questions'):
+        questions = load_questions()
+    end_rerun()
+
+A Streamlit fragment can rerun without the rest of the script, so it opens
+a timed rerun of its own and ends it under its own phase name instead of
+'rerun'; see rerun_timed().
+
+Every phase feeds a histogram with fixed Prometheus-style buckets and a
+rolling window of recent samples for percentiles. These are exported:
+
+* as timing.prom and timing.json under ARENA_TIMING_DIR (default: timing/),
+  rewritten every ARENA_TIMING_EXPORT_EVERY timed reruns,
+* on http://127.0.0.1:$ARENA_TIMING_PORT/metrics (Prometheus text) and
+  /metrics.json, if ARENA_TIMING_PORT is set.
+
+With ARENA_PROFILE_EVERY=N, every Nth timed rerun also runs under cProfile
+and is dumped to ARENA_TIMING_DIR/rerun-<n>.prof for snakeviz or pstats.
+The profiler and HTTP server modules are only imported once they are used,
+so the app's cold start doesn't pay for them.
+"""
+
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+WINDOW = 1024
+PERCENTILES = (50, 90, 99)
+METRIC_NAME = 'arena_phase_seconds'
+RERUN_PHASE = 'rerun'
+
+ENABLED = os.environ.get('ARENA_TIMING', '') not in ('', '0')
+TIMING_DIR = os.environ.get('ARENA_TIMING_DIR', 'timing')
+EXPORT_EVERY = int(os.environ.get('ARENA_TIMING_EXPORT_EVERY', '20'))
+PROFILE_EVERY = int(os.environ.get('ARENA_PROFILE_EVERY', '0'))
+METRICS_PORT = int(os.environ.get('ARENA_TIMING_PORT', '0'))
+
+_NOT_TIMING = contextlib.nullcontext()
+_local = threading.local()
+_lock = threading.Lock()
+_histograms = {}
+_reruns = 0
+_server = None
+
+
+class Histogram:
+    """Cumulative bucket counts for Prometheus plus a rolling window for percentiles"""
+
+    __slots__ = ('counts', 'count', 'total', 'recent')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=WINDOW)
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+    def percentiles(self):
+        """Percentiles over the rolling window, in seconds"""
+        ordered = sorted(self.recent)
+        if not ordered:
+            return {}
+        return {p: ordered[min(len(ordered) - 1, len(ordered) * p // 100)] for p in PERCENTILES}
+
+
+class _Timer:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def observe(name, seconds):
+    """Record one timing for a phase"""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+
+def timed(name):
+    """Time a block as phase name if this rerun is being timed, otherwise do nothing"""
+    if getattr(_local, 'started', None) is None:
+        return _NOT_TIMING
+    return _Timer(name)
+
+
+def rerun_timed():
+    """Whether this thread is inside a timed rerun"""
+    return getattr(_local, 'started', None) is not None
+
+
+def begin_rerun(enabled=False):
+    """Start timing this thread's rerun if timing is on for the process or the session"""
+    global _reruns
+    if not (ENABLED or enabled):
+        _local.started = None
+        return
+    with _lock:
+        _reruns += 1
+        rerun = _reruns
+    _local.rerun = rerun
+    _local.profiler = None
+    if PROFILE_EVERY and rerun % PROFILE_EVERY == 0:
+        import cProfile
+        _local.profiler = cProfile.Profile()
+        _local.profiler.enable()
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    _local.started = time.perf_counter()
+
+
+def end_rerun(phase=RERUN_PHASE):
+    """Finish timing this thread's rerun as phase, exporting and dumping profiles when due"""
+    started = getattr(_local, 'started', None)
+    if started is None:
+        return
+    _local.started = None
+    observe(phase, time.perf_counter() - started)
+
+    profiler = _local.profiler
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(TIMING_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(TIMING_DIR, f'rerun-{_local.rerun}.prof'))
+    if EXPORT_EVERY and _local.rerun % EXPORT_EVERY == 0:
+        export(TIMING_DIR)
+
+
+def snapshot():
+    """Return {phase: summary} for every phase timed so far"""
+    with _lock:
+        histograms = [(name, h.count, h.total, list(h.counts), h.percentiles()) for name, h in _histograms.items()]
+    return {
+        name: {
+            'count': count,
+            'total_seconds': total,
+            'mean_ms': total / count * 1000 if count else 0.0,
+            'percentiles_ms': {f'p{p}': seconds * 1000 for p, seconds in percentiles.items()},
+            'buckets': dict(zip([str(b) for b in BUCKETS] + ['+Inf'], counts))
+        }
+        for name, count, total, counts, percentiles in sorted(histograms)
+    }
+
+
+def prometheus_text():
+    """Render every phase histogram in the Prometheus text exposition format"""
+    lines = [f'# HELP {METRIC_NAME} Time spent in each phase of a Streamlit rerun.',
+             f'# TYPE {METRIC_NAME} histogram']
+    for name, summary in snapshot().items():
+        cumulative = 0
+        for bound, count in summary['buckets'].items():
+            cumulative += count
+            lines.append(f'{METRIC_NAME}_bucket{{phase="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_sum{{phase="{name}"}} {summary["total_seconds"]:.6f}')
+        lines.append(f'{METRIC_NAME}_count{{phase="{name}"}} {summary["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _write_atomic(path, text):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def export(directory=TIMING_DIR):
+    """Write timing.prom and timing.json into directory"""
+    os.makedirs(directory, exist_ok=True)
+    _write_atomic(os.path.join(directory, 'timing.prom'), prometheus_text())
+    _write_atomic(os.path.join(directory, 'timing.json'), json.dumps(snapshot(), indent=2))
+
+
+def _metrics_response(path):
+    """(body, content type) for a metrics endpoint path, or None"""
+    if path == '/metrics':
+        return prometheus_text().encode('utf-8'), 'text/plain; version=0.0.4'
+    if path == '/metrics.json':
+        return json.dumps(snapshot()).encode('utf-8'), 'application/json'
+    return None
+
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """Serve /metrics and /metrics.json on a daemon thread, once per process"""
+    global _server
+    if _server is not None:
+        return None if isinstance(_server, OSError) else _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            response = _metrics_response(self.path)
+            if response is None:
+                self.send_error(404)
+                return
+            body, content_type = response
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            except OSError as e:
+                # Another worker on this host already serves the port; don't retry every rerun
+                _server = e
+                return None
+            threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+    return None if isinstance(_server, OSError) else _server
+
+
+def reset():
+    """Forget every recorded timing"""
+    with _lock:
+        _histograms.clear()
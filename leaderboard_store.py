@@ -0,0 +1,233 @@
+"""
+Leaderboard Store
+=================
+
+Append-only score history kept in SQLite in WAL mode.
+
+Every finished game is a single INSERT in its own transaction. Concurrent
+sessions and worker processes therefore never overwrite each other's scores,
+and a crash cannot leave a half-written file behind. Nothing is dropped: the
+top-N board is an indexed query over the full history.
+
+Submissions are idempotent: each carries the id of the game that produced
+it, and a unique index on game_id turns any repeat into a no-op. Per-game
+submission and write counters show how often the UI tried to save a game
+versus how many rows actually hit the disk.
+
+Pages read through a shared LeaderboardView rather than querying on every
+rerun. The view holds a bounded top-N heap and a case-folded name -> best
+score map. It re-reads only the rows appended since its last refresh, and
+only when SQLite's data_version reports a commit from another connection.
+
+The scores in leaderboard.json are imported once, when the database is first
+created next to it. A leaderboard.json that can't be parsed (e.g. cut short
+by an interrupted write) is not imported and not marked as done, so its
+scores can still be brought in once the file is repaired.
+"""
+
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import Counter
+
+LEADERBOARD_DB = 'leaderboard.db'
+LEGACY_LEADERBOARD_FILE = 'leaderboard.json'
+LEADERBOARD_SIZE = 10
+BUSY_TIMEOUT_SECONDS = 30
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS scores (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        score INTEGER NOT NULL,
+        avatar TEXT NOT NULL,
+        date TEXT NOT NULL,
+        game_id TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS scores_by_rank ON scores (score DESC, id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS scores_by_game ON scores (game_id)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+)
+
+INSERT_SCORE = "INSERT OR IGNORE INTO scores (name, score, avatar, date, game_id) VALUES (?, ?, ?, ?, ?)"
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_counter_lock = threading.Lock()
+_submissions = Counter()
+_writes = Counter()
+_views = {}
+_views_lock = threading.Lock()
+
+
+def _read_legacy_leaderboard(path):
+    """Return the rows of an old leaderboard.json, nothing if it is missing, or None if it is unreadable"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except FileNotFoundError:
+        return []
+    except json.JSONDecodeError as e:
+        logger.error("Not importing %s, which is damaged (%s); it will be retried on the next start", path, e)
+        return None
+    return [(e['name'], e['score'], e['avatar'], e['date'], None) for e in entries]
+
+
+def _initialize(conn, path):
+    """Create the schema and import the legacy leaderboard exactly once"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(SCHEMA[0])
+        # Databases created before idempotent submission have no game_id column
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(scores)")}
+        if 'game_id' not in columns:
+            conn.execute("ALTER TABLE scores ADD COLUMN game_id TEXT")
+        for statement in SCHEMA[1:]:
+            conn.execute(statement)
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone() is None:
+            legacy_path = os.path.join(os.path.dirname(path), LEGACY_LEADERBOARD_FILE)
+            rows = _read_legacy_leaderboard(legacy_path)
+            if rows is not None:
+                conn.executemany(INSERT_SCORE, rows)
+                conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)", (legacy_path,))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def connect(path=LEADERBOARD_DB):
+    """Return this thread's connection to the leaderboard database, creating it on first use"""
+    path = os.path.abspath(path)
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(path)
+    if conn is None:
+        # Autocommit mode: every statement is its own atomic transaction
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _initialize(conn, path)
+        connections[path] = conn
+    return conn
+
+
+def add_score(name, score, avatar, date, game_id=None, path=LEADERBOARD_DB):
+    """Append one finished game to the score history, returning False if game_id was already saved"""
+    written = connect(path).execute(INSERT_SCORE, (name, score, avatar, date, game_id)).rowcount == 1
+    with _counter_lock:
+        _submissions[game_id] += 1
+        _writes[game_id] += written
+        submissions = _submissions[game_id]
+    if not written:
+        logger.info("Ignored repeat submission %d for game %s", submissions, game_id)
+    return written
+
+
+def write_counts(game_id):
+    """Return how many times this process submitted game_id and how many rows it wrote"""
+    with _counter_lock:
+        return {'submissions': _submissions[game_id], 'writes': _writes[game_id]}
+
+
+def write_stats():
+    """Return process-wide submission and write totals across all games"""
+    with _counter_lock:
+        games = sum(1 for game_id in _submissions if game_id is not None)
+        submissions = sum(_submissions.values())
+        writes = sum(_writes.values())
+    return {
+        'games': games,
+        'submissions': submissions,
+        'writes': writes,
+        'redundant_submissions': submissions - writes
+    }
+
+
+def top_scores(limit=LEADERBOARD_SIZE, path=LEADERBOARD_DB):
+    """Return the highest scores, earliest first among ties, as leaderboard dicts"""
+    rows = connect(path).execute(
+        "SELECT name, score, avatar, date FROM scores ORDER BY score DESC, id LIMIT ?", (limit,)
+    ).fetchall()
+    return [{'name': name, 'score': score, 'avatar': avatar, 'date': date} for name, score, avatar, date in rows]
+
+
+def count_scores(path=LEADERBOARD_DB):
+    """Return the number of games in the score history"""
+    return connect(path).execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+
+class LeaderboardView:
+    """In-memory top-N heap and per-player bests, kept current from appended rows"""
+
+    def __init__(self, size=LEADERBOARD_SIZE):
+        self.size = size
+        self.version = None
+        self._heap = []
+        self._best = {}
+        self._last_id = 0
+        self._top = []
+
+    def apply(self, rows):
+        """Fold newly appended (id, name, score, avatar, date) rows into the view"""
+        changed = False
+        for row_id, name, score, avatar, date in rows:
+            entry = {'name': name, 'score': score, 'avatar': avatar, 'date': date}
+            self._last_id = max(self._last_id, row_id)
+
+            # Min-heap of the best `size` rows; earlier rows win ties
+            item = (score, -row_id, entry)
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, item)
+                changed = True
+            elif item[:2] > self._heap[0][:2]:
+                heapq.heapreplace(self._heap, item)
+                changed = True
+
+            key = name.casefold()
+            best = self._best.get(key)
+            if best is None or score > best['score']:
+                self._best[key] = entry
+
+        if changed:
+            self._top = [entry for _, _, entry in sorted(self._heap, key=lambda item: item[:2], reverse=True)]
+
+    def refresh(self, conn):
+        """Pull any rows committed since the last refresh"""
+        self.apply(conn.execute(
+            "SELECT id, name, score, avatar, date FROM scores WHERE id > ? ORDER BY id", (self._last_id,)
+        ))
+
+    def top(self, limit=None):
+        """Return the leaderboard entries, best first"""
+        return self._top if limit is None else self._top[:limit]
+
+    def best_score(self, name):
+        """Return the player's best leaderboard entry, matching names case-insensitively"""
+        return self._best.get(name.casefold())
+
+
+def get_leaderboard_view(path=LEADERBOARD_DB):
+    """Return the shared leaderboard view, refreshed only if the database has changed"""
+    path = os.path.abspath(path)
+    with _views_lock:
+        cached = _views.get(path)
+        if cached is None:
+            # A dedicated connection, so data_version sees commits from every writer
+            conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None,
+                                   check_same_thread=False)
+            connect(path)
+            cached = _views[path] = (conn, LeaderboardView())
+        conn, view = cached
+
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != view.version:
+            view.refresh(conn)
+            view.version = version
+    return view
@@ -0,0 +1,380 @@
+"""
+Player Stats
+============
+
+Full per-player history in SQLite (WAL mode), with aggregates kept current
+as games arrive so a profile is two indexed reads, not a scan of the history.
+
+Every finished game is stored with each of its answers: question, category,
+difficulty, outcome and response time. The same transaction folds the game
+into two aggregate tables:
+
+* players: games, total and best score, answers, correct answers, timeouts,
+  response time, current and best answer streak (streaks run across games),
+* player_categories: answers, correct answers and response time per category.
+
+Response times only cover questions the player answered; timeouts count
+towards accuracy but not towards speed.
+
+The UI never waits on the disk. record_game() puts the game on an in-process
+queue and returns; one writer thread per database drains the queue and
+applies everything waiting in a single transaction. Sessions on other
+worker processes write through their own writer, and SQLite serializes
+the transactions. A repeat of a game_id is ignored, so a results screen can
+submit its game on every rerun:
+
+    record_game(game_id, "Ada", "⚔️", 260, [(7, "Science", "easy", CORRECT, 3.1), ...])
+    profile = get_profile("Ada")
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from game_engine import CORRECT, TIMED_OUT
+
+PLAYER_STATS_DB = 'player_stats.db'
+BUSY_TIMEOUT_SECONDS = 30
+MAX_BATCH = 500
+EXIT_FLUSH_SECONDS = 5
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS games (
+        game_id TEXT PRIMARY KEY,
+        player TEXT NOT NULL,
+        name TEXT NOT NULL,
+        avatar TEXT NOT NULL,
+        score INTEGER NOT NULL,
+        rounds INTEGER NOT NULL,
+        eliminated INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        answered INTEGER NOT NULL,
+        correct INTEGER NOT NULL,
+        best_streak INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS games_by_player ON games (player)",
+    """CREATE TABLE IF NOT EXISTS answers (
+        game_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        question_id INTEGER,
+        category TEXT,
+        difficulty TEXT,
+        outcome INTEGER NOT NULL,
+        elapsed REAL,
+        PRIMARY KEY (game_id, seq)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS players (
+        player TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        avatar TEXT NOT NULL,
+        games INTEGER NOT NULL,
+        total_score INTEGER NOT NULL,
+        best_score INTEGER NOT NULL,
+        answered INTEGER NOT NULL,
+        correct INTEGER NOT NULL,
+        timed_out INTEGER NOT NULL,
+        timed_answers INTEGER NOT NULL,
+        total_elapsed REAL NOT NULL,
+        current_streak INTEGER NOT NULL,
+        best_streak INTEGER NOT NULL,
+        last_played TEXT NOT NULL
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS player_categories (
+        player TEXT NOT NULL,
+        category TEXT NOT NULL,
+        answered INTEGER NOT NULL,
+        correct INTEGER NOT NULL,
+        timed_answers INTEGER NOT NULL,
+        total_elapsed REAL NOT NULL,
+        PRIMARY KEY (player, category)
+    ) WITHOUT ROWID"""
+)
+
+INSERT_GAME = ("INSERT OR IGNORE INTO games (game_id, player, name, avatar, score, rounds, eliminated, date, "
+               "answered, correct, best_streak) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+INSERT_ANSWER = ("INSERT INTO answers (game_id, seq, question_id, category, difficulty, outcome, elapsed) "
+                 "VALUES (?, ?, ?, ?, ?, ?, ?)")
+UPSERT_PLAYER = """
+    INSERT INTO players (player, name, avatar, games, total_score, best_score, answered, correct, timed_out,
+                         timed_answers, total_elapsed, current_streak, best_streak, last_played)
+    VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (player) DO UPDATE SET
+        name = excluded.name,
+        avatar = excluded.avatar,
+        games = games + 1,
+        total_score = total_score + excluded.total_score,
+        best_score = max(best_score, excluded.best_score),
+        answered = answered + excluded.answered,
+        correct = correct + excluded.correct,
+        timed_out = timed_out + excluded.timed_out,
+        timed_answers = timed_answers + excluded.timed_answers,
+        total_elapsed = total_elapsed + excluded.total_elapsed,
+        current_streak = excluded.current_streak,
+        best_streak = excluded.best_streak,
+        last_played = max(last_played, excluded.last_played)
+"""
+UPSERT_CATEGORY = """
+    INSERT INTO player_categories (player, category, answered, correct, timed_answers, total_elapsed)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (player, category) DO UPDATE SET
+        answered = answered + excluded.answered,
+        correct = correct + excluded.correct,
+        timed_answers = timed_answers + excluded.timed_answers,
+        total_elapsed = total_elapsed + excluded.total_elapsed
+"""
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+class GameRecord(namedtuple('GameRecord', 'game_id name avatar score rounds eliminated date answers')):
+    """One finished game; answers are (question_id, category, difficulty, outcome, elapsed) tuples"""
+
+    __slots__ = ()
+
+
+def connect(path=PLAYER_STATS_DB):
+    """Return this thread's connection to the stats database, creating the schema on first use"""
+    path = os.path.abspath(path)
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        connections[path] = conn
+    return conn
+
+
+def _fold_game(conn, player, record):
+    """Add one stored game to the player's aggregates"""
+    answered = correct = timed_out = timed_answers = 0
+    total_elapsed = 0.0
+    categories = {}
+    row = conn.execute("SELECT current_streak, best_streak FROM players WHERE player = ?", (player,)).fetchone()
+    streak, best_streak = row if row else (0, 0)
+
+    for question_id, category, difficulty, outcome, elapsed in record.answers:
+        answered += 1
+        totals = categories.get(category)
+        if totals is None:
+            totals = categories[category] = [0, 0, 0, 0.0]
+        totals[0] += 1
+        if outcome == CORRECT:
+            correct += 1
+            totals[1] += 1
+            streak += 1
+            best_streak = max(best_streak, streak)
+        else:
+            streak = 0
+            if outcome == TIMED_OUT:
+                timed_out += 1
+        if outcome != TIMED_OUT and elapsed is not None:
+            timed_answers += 1
+            total_elapsed += elapsed
+            totals[2] += 1
+            totals[3] += elapsed
+
+    conn.execute(UPSERT_PLAYER, (player, record.name, record.avatar, record.score, record.score, answered, correct,
+                                 timed_out, timed_answers, total_elapsed, streak, best_streak, record.date))
+    conn.executemany(UPSERT_CATEGORY, ((player, category, *totals) for category, totals in categories.items()
+                                       if category is not None))
+
+
+def _game_streak(answers):
+    """Longest run of correct answers within one game"""
+    best = streak = 0
+    for answer in answers:
+        streak = streak + 1 if answer[3] == CORRECT else 0
+        best = max(best, streak)
+    return best
+
+
+def apply_games(conn, records):
+    """Store games and fold them into the aggregates in one transaction, returning how many were new"""
+    written = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for record in records:
+            player = record.name.casefold()
+            correct = sum(1 for answer in record.answers if answer[3] == CORRECT)
+            inserted = conn.execute(INSERT_GAME, (
+                record.game_id, player, record.name, record.avatar, record.score, record.rounds,
+                int(record.eliminated), record.date, len(record.answers), correct, _game_streak(record.answers)
+            )).rowcount == 1
+            if not inserted:
+                continue
+            conn.executemany(INSERT_ANSWER, ((record.game_id, seq, *answer)
+                                             for seq, answer in enumerate(record.answers)))
+            _fold_game(conn, player, record)
+            written += 1
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return written
+
+
+class StatsWriter:
+    """Background thread that drains queued games into one database in batches"""
+
+    def __init__(self, path=PLAYER_STATS_DB):
+        self.path = path
+        self.written = 0
+        self.batches = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='player-stats-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        """Queue a GameRecord; returns at once"""
+        self._queue.put(record)
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is on disk, returning False on timeout"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        conn = connect(self.path)
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [item for item in batch if isinstance(item, GameRecord)]
+            if records:
+                try:
+                    self.written += apply_games(conn, records)
+                    self.batches += 1
+                except sqlite3.Error:
+                    logger.exception("Failed to save stats for %d games", len(records))
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+
+def get_writer(path=PLAYER_STATS_DB):
+    """Return the process-wide writer for a stats database, starting it on first use"""
+    path = os.path.abspath(path)
+    writer = _writers.get(path)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(path)
+            if writer is None:
+                writer = _writers[path] = StatsWriter(path)
+                atexit.register(writer.flush, EXIT_FLUSH_SECONDS)
+    return writer
+
+
+def record_game(game_id, name, avatar, score, answers, rounds=1, eliminated=False, date=None,
+                path=PLAYER_STATS_DB):
+    """Queue a finished game for the stats store without waiting for the write
+
+    answers are (question_id, category, difficulty, outcome, elapsed) tuples
+    in the order they were played.
+    """
+    date = date or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    get_writer(path).submit(GameRecord(game_id, name, avatar, score, rounds, eliminated, date, tuple(answers)))
+
+
+def answers_from_history(history, question_details):
+    """Turn Game.history entries into record_game() answers
+
+    question_details maps question_id -> (category, difficulty); questions
+    missing from it are stored without a category.
+    """
+    return [(question_id, *question_details.get(question_id, (None, None)), outcome, elapsed)
+            for question_id, outcome, elapsed in history]
+
+
+def flush(timeout=None, path=PLAYER_STATS_DB):
+    """Wait for the queued games of one database to be written"""
+    return get_writer(path).flush(timeout)
+
+
+def _rates(answered, correct, timed_answers, total_elapsed):
+    return {
+        'answered': answered,
+        'correct': correct,
+        'accuracy': correct / answered if answered else 0.0,
+        'average_seconds': total_elapsed / timed_answers if timed_answers else None
+    }
+
+
+def get_profile(name, path=PLAYER_STATS_DB):
+    """Return a player's aggregated stats, matching names case-insensitively, or None if they never played"""
+    conn = connect(path)
+    player = name.casefold()
+    row = conn.execute(
+        "SELECT name, avatar, games, total_score, best_score, answered, correct, timed_out, timed_answers, "
+        "total_elapsed, current_streak, best_streak, last_played FROM players WHERE player = ?", (player,)
+    ).fetchone()
+    if row is None:
+        return None
+    (name, avatar, games, total_score, best_score, answered, correct, timed_out, timed_answers, total_elapsed,
+     current_streak, best_streak, last_played) = row
+    categories = conn.execute(
+        "SELECT category, answered, correct, timed_answers, total_elapsed FROM player_categories "
+        "WHERE player = ? ORDER BY answered DESC, category", (player,)
+    ).fetchall()
+    return {
+        'name': name,
+        'avatar': avatar,
+        'games': games,
+        'best_score': best_score,
+        'average_score': total_score / games,
+        **_rates(answered, correct, timed_answers, total_elapsed),
+        'timed_out': timed_out,
+        'current_streak': current_streak,
+        'best_streak': best_streak,
+        'last_played': last_played,
+        'categories': {category: _rates(*totals) for category, *totals in categories}
+    }
+
+
+def recent_games(name, limit=10, path=PLAYER_STATS_DB):
+    """Return a player's latest games, newest first"""
+    rows = connect(path).execute(
+        "SELECT game_id, score, rounds, eliminated, date, answered, correct, best_streak FROM games "
+        "WHERE player = ? ORDER BY rowid DESC LIMIT ?", (name.casefold(), limit)
+    ).fetchall()
+    return [{'game_id': game_id, 'score': score, 'rounds': rounds, 'eliminated': bool(eliminated), 'date': date,
+             'answered': answered, 'correct': correct, 'best_streak': best_streak}
+            for game_id, score, rounds, eliminated, date, answered, correct, best_streak in rows]
+
+
+def rebuild_aggregates(path=PLAYER_STATS_DB):
+    """Recompute every player's aggregates from the stored games, in the order they were recorded"""
+    conn = connect(path)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM players")
+        conn.execute("DELETE FROM player_categories")
+        games = conn.execute("SELECT game_id, player, name, avatar, score, rounds, eliminated, date FROM games "
+                             "ORDER BY rowid").fetchall()
+        for game_id, player, name, avatar, score, rounds, eliminated, date in games:
+            answers = conn.execute("SELECT question_id, category, difficulty, outcome, elapsed FROM answers "
+                                   "WHERE game_id = ? ORDER BY seq", (game_id,)).fetchall()
+            _fold_game(conn, player, GameRecord(game_id, name, avatar, score, rounds, eliminated, date, answers))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return len(games)
@@ -0,0 +1,840 @@
+"""
+Question Bank
+=============
+
+Process-wide, read-only cache of the question bank.
+
+Every Streamlit session in a worker process shares one validated snapshot of
+questions.json. The file is only re-read when its modification time or size
+changes, so a rerun costs a single os.stat() instead of a full parse and
+validation pass.
+
+Each snapshot also carries a (difficulty, category) index, with the category
+unions for every arena topic precomputed, so picking the questions for a round
+is a dictionary lookup rather than a scan over the whole bank.
+
+Questions are held as compact Question records (__slots__, tuple options,
+interned category and difficulty strings) and the index stores integer
+positions into the bank, so sessions can keep positions instead of copies.
+sample_positions() draws a round from a selection in O(k) without copying it.
+
+Large banks are kept as line-delimited JSON (NDJSON) with a byte-offset
+sidecar index (<bank>.ndjson.idx). Only the sidecar is read at startup; each
+question is parsed from a memory-mapped view of the file the first time a
+round asks for it. A JSON array bigger than CONVERT_THRESHOLD_BYTES is
+converted to NDJSON automatically, or convert one by hand with:
+
+    python question_bank.py questions.json
+
+question_import.py validates and deduplicates large dumps offline and writes
+a compiled bank that is opened without any validation pass. Point the app at
+one with ARENA_QUESTIONS. The default compiled format is a binary .qbank file:
+
+    [magic] [string pool] [record table] [string offsets] [positions] [header] [trailer]
+
+Records are fixed-width rows of integers (id, string numbers, codes) and
+every string lives once in the UTF-8 pool. Positions are grouped by
+(difficulty, category), in topic order so that each arena topic is one
+contiguous run. Opening a .qbank maps the file and reads the small JSON
+header; the tables and every round selection are views straight into the
+mapping, so nothing is parsed or copied per question at startup and all the
+workers on a host share one copy in the page cache. A question is decoded
+from its row only when a round asks for it.
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections.abc import Sequence
+from contextlib import contextmanager
+from functools import lru_cache
+
+QUESTIONS_FILE = 'questions.json'
+# The bank the app and answer server deal from, e.g. a compiled bank from question_import.py
+QUESTIONS_PATH = os.environ.get('ARENA_QUESTIONS', QUESTIONS_FILE)
+REQUIRED_FIELDS = ('id', 'question', 'options', 'answer_index', 'category', 'difficulty')
+
+# JSON arrays at least this large are served from an NDJSON copy
+CONVERT_THRESHOLD_BYTES = 8 * 1024 * 1024
+INDEX_SUFFIX = '.idx'
+INDEX_VERSION = 1
+RECORD_CACHE_SIZE = 4096
+# Category and difficulty codes are stored as uint16 and uint8, in the sidecar and in .qbank records
+MAX_CATEGORIES = 1 << 16
+MAX_DIFFICULTIES = 1 << 8
+
+BINARY_SUFFIX = '.qbank'
+BINARY_MAGIC = b'QBANK\x00\x00\x01'
+# id (int, or string number if STRING_ID), question string, first option string,
+# category code, difficulty code, option count, answer_index, flags
+BINARY_RECORD = struct.Struct('<qIIHBBBBxx')
+BINARY_TRAILER = struct.Struct('<QQ8s')
+MAX_BINARY_STRINGS = 1 << 32
+STRING_ID = 1
+
+# The arena topics and the question categories each one draws from
+TOPIC_TO_CATEGORIES = {
+    'Hollywood/Bollywood': ('Hollywood', 'Bollywood'),
+    'History/GK': ('History',),
+    'Sports': ('Sports',)
+}
+# Each round's difficulty and per-question time limit in seconds; rounds past the last play like it
+ROUND_DIFFICULTIES = {1: 'easy', 2: 'medium', 3: 'hard'}
+ROUND_TIME_LIMITS = {1: 15, 2: 12, 3: 10}
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionBankError(Exception):
+    """Raised when a question file fails validation"""
+
+
+class Question:
+    """Compact, read-only question record that also supports q['field'] access"""
+
+    __slots__ = REQUIRED_FIELDS
+
+    def __init__(self, id, question, options, answer_index, category, difficulty):
+        self.id = id
+        self.question = question
+        self.options = options
+        self.answer_index = answer_index
+        self.category = category
+        self.difficulty = difficulty
+
+    @classmethod
+    def from_dict(cls, q):
+        """Build a record from a validated question dict, interning the repeated strings"""
+        return cls(q['id'], q['question'], tuple(q['options']), q['answer_index'],
+                   sys.intern(q['category']), sys.intern(q['difficulty']))
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def to_dict(self):
+        """Return the question as a plain dict in the questions.json layout"""
+        q = {field: getattr(self, field) for field in REQUIRED_FIELDS}
+        q['options'] = list(self.options)
+        return q
+
+    def __repr__(self):
+        return f"Question(id={self.id!r}, category={self.category!r}, difficulty={self.difficulty!r})"
+
+
+class QuestionBank:
+    """Immutable, validated snapshot of a question file"""
+
+    def __init__(self, path, questions, signature, load_seconds=0.0, validate_seconds=0.0):
+        self.path = path
+        self.questions = questions
+        self.signature = signature
+        self.load_seconds = load_seconds
+        self.validate_seconds = validate_seconds
+        self.loaded_at = time.time()
+        self.reloads = 0
+
+        started = time.perf_counter()
+        self._build_index()
+        self.index_seconds = time.perf_counter() - started
+
+    def __len__(self):
+        return len(self.questions)
+
+    @classmethod
+    def from_questions(cls, questions, path='<memory>'):
+        """Validate an in-memory list of question dicts and build a bank from it"""
+        validate_questions(questions)
+        return cls(path, tuple(Question.from_dict(q) for q in questions), None)
+
+    def record(self, position):
+        """Return the question at position in the bank"""
+        return self.questions[position]
+
+    def _build_index(self):
+        """Group question positions by (difficulty, category) and precompute topic unions"""
+        by_category = {}
+        for position, q in enumerate(self.questions):
+            key = (q.difficulty, q.category)
+            if key not in by_category:
+                by_category[key] = array('I')
+            by_category[key].append(position)
+        self.by_category = {key: QuestionView(self, positions) for key, positions in by_category.items()}
+        self._build_topic_unions()
+
+    def _build_topic_unions(self):
+        """Precompute the category union of every arena topic at every difficulty"""
+        self.by_categories = {}
+        difficulties = {difficulty for difficulty, _ in self.by_category}
+        for categories in TOPIC_TO_CATEGORIES.values():
+            for difficulty in difficulties:
+                self.by_categories[(difficulty, categories)] = self._union(difficulty, categories)
+
+    def _union(self, difficulty, categories):
+        """Concatenate the per-category positions for one difficulty"""
+        positions = array('I')
+        for category in dict.fromkeys(categories):
+            view = self.by_category.get((difficulty, category))
+            if view is not None:
+                positions.extend(view.positions)
+        return QuestionView(self, positions)
+
+    def select(self, difficulty, categories):
+        """Return the questions matching difficulty and any of categories"""
+        categories = tuple(categories)
+        cached = self.by_categories.get((difficulty, categories))
+        if cached is not None:
+            return cached
+        return self._union(difficulty, categories)
+
+    def stats(self):
+        """Return load and validation timings for monitoring"""
+        return {
+            'path': self.path,
+            'questions': len(self.questions),
+            'load_ms': round(self.load_seconds * 1000, 3),
+            'validate_ms': round(self.validate_seconds * 1000, 3),
+            'index_ms': round(self.index_seconds * 1000, 3),
+            'loaded_at': self.loaded_at,
+            'reloads': self.reloads
+        }
+
+
+class QuestionView(Sequence):
+    """Read-only sequence of bank positions that resolves questions on access"""
+
+    def __init__(self, bank, positions):
+        self.bank = bank
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return QuestionView(self.bank, self.positions[i])
+        return self.bank.record(self.positions[i])
+
+
+class LazyQuestionBank(QuestionBank):
+    """Question bank backed by a memory-mapped NDJSON file and its sidecar index"""
+
+    def __init__(self, path, signature, header, offsets, category_codes, difficulty_codes):
+        self._header = header
+        self._offsets = offsets
+        self._category_codes = category_codes
+        self._difficulty_codes = difficulty_codes
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if header['count'] else b''
+        self.record = lru_cache(maxsize=RECORD_CACHE_SIZE)(self._read_record)
+        super().__init__(path, QuestionView(self, range(header['count'])), signature)
+
+    def _read_record(self, n):
+        """Parse record n straight out of the mapped file"""
+        return Question.from_dict(json.loads(self._data[self._offsets[n]:self._offsets[n + 1]]))
+
+    def _build_index(self):
+        """Group record numbers by (difficulty, category) using the sidecar codes"""
+        categories = self._header['categories']
+        difficulties = self._header['difficulties']
+        by_category = {}
+        for n, (category, difficulty) in enumerate(zip(self._category_codes, self._difficulty_codes)):
+            key = (difficulties[difficulty], categories[category])
+            if key not in by_category:
+                by_category[key] = array('I')
+            by_category[key].append(n)
+        self.by_category = {key: QuestionView(self, numbers) for key, numbers in by_category.items()}
+        self._build_topic_unions()
+
+
+class BinaryQuestionBank(QuestionBank):
+    """Question bank backed by a memory-mapped compiled .qbank file"""
+
+    def __init__(self, path, signature):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        data = memoryview(self._map)
+        header_start, header_length, magic = BINARY_TRAILER.unpack_from(data, len(data) - BINARY_TRAILER.size)
+        if data[:len(BINARY_MAGIC)] != BINARY_MAGIC or magic != BINARY_MAGIC:
+            raise QuestionBankError(f"{path} is not a compiled question bank")
+        self._header = json.loads(bytes(data[header_start:header_start + header_length]))
+        self._categories = [sys.intern(category) for category in self._header['categories']]
+        self._difficulties = [sys.intern(difficulty) for difficulty in self._header['difficulties']]
+        self._data = data
+        self._records = self._section('records')
+        self._strings = self._section('strings', 'Q')
+        self._positions = self._section('positions', 'I')
+        self.record = lru_cache(maxsize=RECORD_CACHE_SIZE)(self._read_record)
+        super().__init__(path, QuestionView(self, range(self._header['count'])), signature)
+
+    def _section(self, name, typecode=None):
+        """A view of one table in the mapping, as native integers when typecode is given"""
+        start, end = self._header['sections'][name]
+        view = self._data[start:end]
+        if typecode is None:
+            return view
+        if sys.byteorder == 'little':
+            return view.cast(typecode)
+        # Tables are little-endian on disk; big-endian hosts pay for a copy
+        packed = array(typecode, view)
+        packed.byteswap()
+        return packed
+
+    def _string(self, n):
+        return str(self._data[self._strings[n]:self._strings[n + 1]], 'utf-8')
+
+    def _read_record(self, n):
+        """Decode record n straight out of the mapped file"""
+        (id, question, first_option, category, difficulty, option_count, answer_index,
+         flags) = BINARY_RECORD.unpack_from(self._records, n * BINARY_RECORD.size)
+        options = tuple(self._string(first_option + i) for i in range(option_count))
+        return Question(self._string(id) if flags & STRING_ID else id, self._string(question), options,
+                        answer_index, self._categories[category], self._difficulties[difficulty])
+
+    def _build_index(self):
+        """Slice the stored position groups instead of scanning the records"""
+        positions = self._positions
+        self._groups = {}
+        self.by_category = {}
+        for difficulty, category, start, end in self._header['groups']:
+            self._groups[(difficulty, category)] = (start, end)
+            self.by_category[(difficulty, category)] = QuestionView(self, positions[start:end])
+        self._build_topic_unions()
+
+    def _union(self, difficulty, categories):
+        """One view over adjacent position groups, or a concatenated copy if they are not adjacent"""
+        runs = [self._groups[(difficulty, category)] for category in dict.fromkeys(categories)
+                if (difficulty, category) in self._groups]
+        runs.sort()
+        if all(previous[1] == following[0] for previous, following in zip(runs, runs[1:])):
+            start, end = (runs[0][0], runs[-1][1]) if runs else (0, 0)
+            return QuestionView(self, self._positions[start:end])
+        return super()._union(difficulty, categories)
+
+
+def sample_positions(view, k, exclude=(), rng=random):
+    """Draw k distinct bank positions from view, preferring questions whose id is not in exclude
+
+    Runs a partial Fisher-Yates shuffle over a sparse swap table, so a draw
+    costs O(k) regardless of the pool size while enough unseen questions
+    remain. Once the unseen ones run out the draw is topped up with
+    already-seen questions.
+    """
+    n = len(view)
+    if k > n:
+        raise ValueError("Sample larger than population")
+
+    swaps = {}
+    picked = []
+    skipped = []
+    for j in range(n):
+        if len(picked) == k:
+            break
+        r = rng.randrange(j, n)
+        i = swaps.get(r, r)
+        swaps[r] = swaps.pop(j, j)
+        if exclude and view[i].id in exclude:
+            skipped.append(i)
+        else:
+            picked.append(view.positions[i])
+
+    picked.extend(view.positions[i] for i in skipped[:k - len(picked)])
+    return picked
+
+
+def next_topic(used_topics=(), rng=random):
+    """A random topic not used earlier in the game, or any topic once every one has been"""
+    return rng.choice([topic for topic in TOPIC_TO_CATEGORIES if topic not in used_topics] or list(TOPIC_TO_CATEGORIES))
+
+
+def round_config(round_num, topic):
+    """The config of a round on topic, shared by the app, the answer server and tournaments"""
+    last = max(ROUND_DIFFICULTIES)
+    return {'difficulty': ROUND_DIFFICULTIES.get(round_num, ROUND_DIFFICULTIES[last]), 'topic': topic,
+            'categories': TOPIC_TO_CATEGORIES[topic],
+            'time_limit': ROUND_TIME_LIMITS.get(round_num, ROUND_TIME_LIMITS[last])}
+
+
+_lock = threading.Lock()
+_banks = {}
+_reload_counts = {}
+
+
+def question_errors(q):
+    """Return every problem with one question's required fields and answer_index bounds"""
+    if not isinstance(q, dict):
+        return [f"is not a JSON object: {q!r:.40}"]
+    errors = [f"missing required field: {field}" for field in REQUIRED_FIELDS if field not in q]
+    if 'options' in q and not isinstance(q['options'], list):
+        errors.append(f"has invalid options: {q['options']!r:.40}")
+    elif 'answer_index' in q and 'options' in q:
+        # Validate answer_index is within options range
+        answer_index = q['answer_index']
+        # JSON true/false would otherwise pass as the indexes 1 and 0
+        if (isinstance(answer_index, bool) or not isinstance(answer_index, int)
+                or answer_index >= len(q['options']) or answer_index < 0):
+            errors.append(f"has invalid answer_index: {answer_index}")
+    return errors
+
+
+def validate_question(q, i):
+    """Check one question's required fields and answer_index bounds"""
+    errors = question_errors(q)
+    if errors:
+        raise QuestionBankError(f"Question {i+1} {errors[0]}")
+
+
+def validate_questions(questions):
+    """Validate every question, raising on the first bad one"""
+    for i, q in enumerate(questions):
+        validate_question(q, i)
+
+
+def _file_signature(path):
+    """Return the (mtime, size) pair used to detect changes to a question file"""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def iter_json_array(f, chunk_size=1 << 20):
+    """Yield the elements of a JSON array file without parsing it all at once"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    expect = '['
+
+    while True:
+        # Skip whitespace, pulling in more text whenever the buffer runs dry
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+        if pos >= len(buffer):
+            raise json.JSONDecodeError("Unexpected end of question array", buffer, pos)
+
+        if expect == '[':
+            if buffer[pos] != '[':
+                raise json.JSONDecodeError("Expected a JSON array of questions", buffer, pos)
+            pos += 1
+            expect = 'value or ]'
+        elif expect in ('value or ]', ', or ]') and buffer[pos] == ']':
+            return
+        elif expect == ', or ]':
+            if buffer[pos] != ',':
+                raise json.JSONDecodeError("Expected ',' or ']' between questions", buffer, pos)
+            pos += 1
+            expect = 'value'
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            pos = end
+            expect = ', or ]'
+            yield value
+
+
+@contextmanager
+def _replacing(path):
+    """Write a temp file beside path and rename it into place; on any error the temp file is removed"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _code(codes, value, limit, name):
+    """The code for value in codes, assigning the next one; QuestionBankError if more than limit are needed"""
+    code = codes.get(value)
+    if code is None:
+        if len(codes) == limit:
+            raise QuestionBankError(f"More than {limit:,} distinct {name}; a compiled bank stores at most {limit:,}")
+        code = codes[value] = len(codes)
+    return code
+
+
+def _write_index(index_path, header, offsets, category_codes, difficulty_codes):
+    """Atomically write the sidecar: a JSON header line followed by packed arrays"""
+    with _replacing(index_path) as f:
+        f.write(json.dumps(header).encode('utf-8') + b'\n')
+        offsets.tofile(f)
+        category_codes.tofile(f)
+        difficulty_codes.tofile(f)
+
+
+def _read_index(index_path):
+    """Read a sidecar index, returning (header, offsets, category_codes, difficulty_codes)"""
+    with open(index_path, 'rb') as f:
+        header = json.loads(f.readline())
+        if header.get('version') != INDEX_VERSION:
+            raise QuestionBankError(f"Unsupported question index version in {index_path}")
+        count = header['count']
+        offsets = array('Q')
+        offsets.fromfile(f, count + 1)
+        category_codes = array('H')
+        category_codes.fromfile(f, count)
+        difficulty_codes = array('B')
+        difficulty_codes.fromfile(f, count)
+
+    if header['byteorder'] != sys.byteorder:
+        for packed in (offsets, category_codes, difficulty_codes):
+            packed.byteswap()
+    return header, offsets, category_codes, difficulty_codes
+
+
+def _index_records(records, write_line=None):
+    """Collect the offsets and codes for a sidecar index from (category, difficulty, line) records"""
+    offsets = array('Q', [0])
+    category_codes = array('H')
+    difficulty_codes = array('B')
+    categories = {}
+    difficulties = {}
+
+    for category, difficulty, line in records:
+        if write_line is not None:
+            write_line(line)
+        offsets.append(offsets[-1] + len(line))
+        category_codes.append(_code(categories, category, MAX_CATEGORIES, 'categories'))
+        difficulty_codes.append(_code(difficulties, difficulty, MAX_DIFFICULTIES, 'difficulties'))
+
+    header = {
+        'version': INDEX_VERSION,
+        'byteorder': sys.byteorder,
+        'count': len(category_codes),
+        'categories': list(categories),
+        'difficulties': list(difficulties)
+    }
+    return header, offsets, category_codes, difficulty_codes
+
+
+def convert_to_ndjson(json_path, ndjson_path=None):
+    """Stream a JSON array of questions into NDJSON plus its sidecar index"""
+    ndjson_path = ndjson_path or os.path.splitext(json_path)[0] + '.ndjson'
+    source_signature = _file_signature(json_path)
+
+    def encoded(questions):
+        for i, q in enumerate(questions):
+            validate_question(q, i)
+            yield q['category'], q['difficulty'], encode_line(q)
+
+    with open(json_path, 'r', encoding='utf-8') as src, _replacing(ndjson_path) as dst:
+        indexed = _index_records(encoded(iter_json_array(src)), dst.write)
+
+    header, offsets, category_codes, difficulty_codes = indexed
+    header['data'] = list(_file_signature(ndjson_path))
+    header['source'] = list(source_signature)
+    _write_index(ndjson_path + INDEX_SUFFIX, header, offsets, category_codes, difficulty_codes)
+    logger.info("Converted %d questions from %s to %s", header['count'], json_path, ndjson_path)
+    return ndjson_path
+
+
+def encode_line(q):
+    """Serialize one question as a compact NDJSON line"""
+    return json.dumps(q, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def write_compiled_bank(records, ndjson_path, info=None):
+    """Write pre-validated (category, difficulty, line) records as an NDJSON bank and sidecar
+
+    The sidecar is marked as compiled, so loading the bank never validates
+    it again, even after a copy changes the file's mtime. Returns the header.
+    """
+    with _replacing(ndjson_path) as dst:
+        header, offsets, category_codes, difficulty_codes = _index_records(records, dst.write)
+    header['data'] = list(_file_signature(ndjson_path))
+    header['source'] = None
+    header['compiled'] = info or {}
+    _write_index(ndjson_path + INDEX_SUFFIX, header, offsets, category_codes, difficulty_codes)
+    return header
+
+
+def check_field_types(q):
+    """Raise ValueError unless a validated question's fields have the types every compiled bank needs"""
+    id, question, options, answer_index, category, difficulty = (q[field] for field in REQUIRED_FIELDS)
+    if isinstance(id, bool) or not isinstance(id, (int, str)):
+        raise ValueError(f"id must be an integer or a string, not {type(id).__name__}")
+    for name, value in (('question', question), ('category', category), ('difficulty', difficulty)):
+        if not isinstance(value, str):
+            raise ValueError(f"{name} must be a string, not {type(value).__name__}")
+    if not all(isinstance(option, str) for option in options):
+        raise ValueError("options must be strings")
+
+
+def binary_fields(q):
+    """Return a validated question's fields as stored in a .qbank, or raise ValueError if they cannot be"""
+    check_field_types(q)
+    id, question, options, answer_index, category, difficulty = (q[field] for field in REQUIRED_FIELDS)
+    if isinstance(id, int) and not -2**63 <= id < 2**63:
+        raise ValueError(f"id {id} does not fit in 64 bits")
+    if len(options) > 255:
+        raise ValueError(f"{len(options)} options, at most 255 can be stored")
+    return id, question, tuple(options), answer_index, category, difficulty
+
+
+def _topic_order(categories):
+    """Categories with each arena topic's categories adjacent, so topic selections are contiguous"""
+    ordered = [category for topic in TOPIC_TO_CATEGORIES.values() for category in topic if category in categories]
+    return list(dict.fromkeys(ordered + list(categories)))
+
+
+def _align(f):
+    """Pad the file to an 8-byte boundary so the next table can be cast in place"""
+    f.write(bytes(-f.tell() % 8))
+    return f.tell()
+
+
+def write_binary_bank(records, path, info=None):
+    """Write validated binary_fields() tuples as a compiled .qbank file; returns the header
+
+    The string pool streams straight to disk, so writing holds only the
+    record table, string offsets and positions (about 70 bytes per
+    question) in memory. Raises QuestionBankError, leaving no file behind,
+    if the bank has more categories, difficulties or strings than the
+    record fields can hold.
+    """
+    records_table = bytearray()
+    offsets = array('Q')
+    categories = {}
+    difficulties = {}
+    grouped = {}
+
+    with _replacing(path) as f:
+        f.write(BINARY_MAGIC)
+
+        def add_string(text):
+            offsets.append(f.tell())
+            f.write(text.encode('utf-8'))
+            return len(offsets) - 1
+
+        for n, (id, question, options, answer_index, category, difficulty) in enumerate(records):
+            category_code = _code(categories, category, MAX_CATEGORIES, 'categories')
+            difficulty_code = _code(difficulties, difficulty, MAX_DIFFICULTIES, 'difficulties')
+            # String numbers are stored as uint32
+            if len(offsets) + len(options) + 2 > MAX_BINARY_STRINGS:
+                raise QuestionBankError(f"More than {MAX_BINARY_STRINGS:,} strings; a .qbank stores at most that many")
+            flags = 0
+            if isinstance(id, str):
+                id, flags = add_string(id), STRING_ID
+            question_string = add_string(question)
+            first_option = len(offsets)
+            for option in options:
+                add_string(option)
+            records_table += BINARY_RECORD.pack(id, question_string, first_option, category_code, difficulty_code,
+                                                len(options), answer_index, flags)
+            grouped.setdefault((difficulty, category), array('I')).append(n)
+        offsets.append(f.tell())
+
+        sections = {}
+        sections['records'] = [_align(f), f.tell() + len(records_table)]
+        f.write(records_table)
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        sections['strings'] = [_align(f), f.tell() + offsets.itemsize * len(offsets)]
+        offsets.tofile(f)
+
+        groups = []
+        sections['positions'] = [_align(f), 0]
+        order = _topic_order(categories)
+        for difficulty in difficulties:
+            for category in order:
+                positions = grouped.get((difficulty, category))
+                if positions is None:
+                    continue
+                start = (f.tell() - sections['positions'][0]) // positions.itemsize
+                groups.append([difficulty, category, start, start + len(positions)])
+                if sys.byteorder != 'little':
+                    positions.byteswap()
+                positions.tofile(f)
+        sections['positions'][1] = f.tell()
+
+        header = {
+            'version': INDEX_VERSION,
+            'count': len(records_table) // BINARY_RECORD.size,
+            'categories': list(categories),
+            'difficulties': list(difficulties),
+            'groups': groups,
+            'sections': sections,
+            'compiled': info or {}
+        }
+        encoded = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        header_start = f.tell()
+        f.write(encoded)
+        f.write(BINARY_TRAILER.pack(header_start, len(encoded), BINARY_MAGIC))
+    return header
+
+
+def convert_to_binary(json_path, path=None):
+    """Validate a JSON array of questions and compile it to a .qbank file"""
+    path = path or os.path.splitext(json_path)[0] + BINARY_SUFFIX
+
+    def fields(questions):
+        for i, q in enumerate(questions):
+            validate_question(q, i)
+            try:
+                yield binary_fields(q)
+            except ValueError as e:
+                raise QuestionBankError(f"Question {i+1} {e}") from None
+
+    with open(json_path, 'r', encoding='utf-8') as src:
+        header = write_binary_bank(fields(iter_json_array(src)), path)
+    logger.info("Compiled %d questions from %s to %s", header['count'], json_path, path)
+    return path
+
+
+def build_ndjson_index(ndjson_path):
+    """Validate an NDJSON bank line by line and write its sidecar index"""
+    signature = _file_signature(ndjson_path)
+
+    def parsed(f):
+        for i, line in enumerate(f):
+            # Record offsets are contiguous, so every line must hold a question
+            if not line.strip():
+                raise QuestionBankError(f"Blank line in {ndjson_path}")
+            q = json.loads(line)
+            validate_question(q, i)
+            yield q['category'], q['difficulty'], line
+
+    with open(ndjson_path, 'rb') as f:
+        header, offsets, category_codes, difficulty_codes = _index_records(parsed(f))
+    header['data'] = list(signature)
+    header['source'] = None
+    _write_index(ndjson_path + INDEX_SUFFIX, header, offsets, category_codes, difficulty_codes)
+    return header, offsets, category_codes, difficulty_codes
+
+
+def _open_ndjson_bank(ndjson_path, signature, source_path=None):
+    """Open an NDJSON bank, rebuilding or reconverting its sidecar if it is stale"""
+    started = time.perf_counter()
+    index_path = ndjson_path + INDEX_SUFFIX
+    indexed = None
+    try:
+        indexed = _read_index(index_path)
+        header = indexed[0]
+        data = list(_file_signature(ndjson_path))
+        # A compiled bank was validated when it was built; only a change in size makes it stale
+        if header['data'] != data and not ('compiled' in header and header['data'][1] == data[1]):
+            indexed = None
+        elif source_path is not None and header['source'] != list(signature):
+            indexed = None
+    except (FileNotFoundError, ValueError, EOFError, KeyError, QuestionBankError):
+        indexed = None
+
+    if indexed is None:
+        if source_path is not None:
+            convert_to_ndjson(source_path, ndjson_path)
+            indexed = _read_index(index_path)
+        else:
+            indexed = build_ndjson_index(ndjson_path)
+
+    bank = LazyQuestionBank(ndjson_path, signature, *indexed)
+    bank.load_seconds = time.perf_counter() - started
+    return bank
+
+
+def _load_bank(path, signature):
+    """Read, validate and freeze a question file"""
+    if path.endswith(BINARY_SUFFIX):
+        started = time.perf_counter()
+        bank = BinaryQuestionBank(path, signature)
+        bank.load_seconds = time.perf_counter() - started
+    elif path.endswith('.ndjson'):
+        bank = _open_ndjson_bank(path, signature)
+    elif signature[1] >= CONVERT_THRESHOLD_BYTES:
+        ndjson_path = os.path.splitext(path)[0] + '.ndjson'
+        bank = _open_ndjson_bank(ndjson_path, signature, source_path=path)
+    else:
+        started = time.perf_counter()
+        with open(path, 'r', encoding='utf-8') as f:
+            questions = json.load(f)
+        loaded = time.perf_counter()
+
+        validate_questions(questions)
+        validated = time.perf_counter()
+
+        records = tuple(Question.from_dict(q) for q in questions)
+        bank = QuestionBank(path, records, signature, loaded - started, validated - loaded)
+
+    logger.info("Loaded %d questions from %s (load %.1f ms, validate %.1f ms, index %.1f ms)",
+                len(bank), bank.path, bank.load_seconds * 1000, bank.validate_seconds * 1000,
+                bank.index_seconds * 1000)
+    return bank
+
+
+def get_question_bank(path=QUESTIONS_PATH):
+    """Return the shared bank for path, reloading only when the file has changed"""
+    path = os.path.abspath(path)
+    signature = _file_signature(path)
+
+    bank = _banks.get(path)
+    if bank is not None and bank.signature == signature:
+        return bank
+
+    with _lock:
+        # Another thread may have reloaded while we waited for the lock
+        bank = _banks.get(path)
+        if bank is None or bank.signature != signature:
+            bank = _load_bank(path, signature)
+            bank.reloads = _reload_counts[path] = _reload_counts.get(path, 0) + 1
+            _banks[path] = bank
+    return bank
+
+
+def question_bank_loaded(path=QUESTIONS_PATH):
+    """Whether get_question_bank(path) would return without loading or reloading the file"""
+    path = os.path.abspath(path)
+    bank = _banks.get(path)
+    return bank is not None and bank.signature == _file_signature(path)
+
+
+def clear_cache():
+    """Drop every cached bank so the next access reloads from disk"""
+    with _lock:
+        _banks.clear()
+
+
+def main():
+    """Convert a JSON array question file to NDJSON with a sidecar index, or to a .qbank"""
+    parser = argparse.ArgumentParser(description="Convert questions.json to the NDJSON or compiled bank format")
+    parser.add_argument('source', nargs='?', default=QUESTIONS_FILE, help="JSON array of questions")
+    parser.add_argument('-o', '--output', help="NDJSON or .qbank file to write (default: NDJSON alongside the source)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.output and args.output.endswith(BINARY_SUFFIX):
+        path = convert_to_binary(args.source, args.output)
+        print(f"✅ Wrote {path} in {time.perf_counter() - started:.2f}s")
+        return
+    ndjson_path = convert_to_ndjson(args.source, args.output)
+    print(f"✅ Wrote {ndjson_path} and {ndjson_path + INDEX_SUFFIX} in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Question Import
+===============
+
+Offline pipeline that turns raw question dumps into a compiled bank.
+
+Input files are streamed (JSON arrays or NDJSON, any number of them) and cut
+into chunks that a process pool validates in parallel. Every record gets the
+same checks as question_bank.validate_question(), but all of its problems
+are reported instead of stopping at the first bad question. Workers also
+fingerprint each question with a 64-bit hash of its canonical text: the
+question and its options, casefolded, without punctuation, extra spacing or
+articles, and with the options in sorted order. Re-submitted questions that
+differ only in those ways hash the same. To find them the parent keeps the
+id, fingerprint and source location of every accepted question, about 205
+bytes per question as measured by benchmarks/bench_memory.py (roughly 200 MB
+for a million questions).
+
+The parent keeps input order and drops, with a reason, any record that is
+invalid, reuses an earlier id, or has the fingerprint of an earlier question.
+
+Accepted questions are written as a compiled bank that loads with no
+validation at all: a memory-mapped binary .qbank (see
+question_bank.write_binary_bank), or an NDJSON bank plus sidecar index when
+the output ends in .ndjson. Workers also encode each record for the chosen
+format. A JSON report lists every rejected record:
+
+    python question_import.py dump1.json dump2.ndjson -o questions.qbank
+    ARENA_QUESTIONS=questions.qbank streamlit run quiz_royale.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+
+from question_bank import (binary_fields, check_field_types, encode_line, iter_json_array, question_errors,
+                           write_binary_bank, write_compiled_bank, BINARY_SUFFIX, REQUIRED_FIELDS)
+
+CHUNK_SIZE = 2000
+MAX_REPORTED = 10_000
+IGNORED_WORDS = frozenset(('a', 'an', 'the'))
+
+_WORD = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Casefolded words without punctuation, extra spacing or articles"""
+    return ' '.join(word for word in _WORD.findall(str(text).casefold()) if word not in IGNORED_WORDS)
+
+
+def fingerprint(question, options):
+    """64-bit hash shared by questions that only differ in case, punctuation, spacing, articles or option order"""
+    canonical = normalize(question) + '\n' + '\n'.join(sorted(normalize(option) for option in options))
+    return int.from_bytes(hashlib.blake2b(canonical.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def ndjson_payload(record):
+    """What write_compiled_bank() takes for one record, or ValueError if its fields have the wrong types"""
+    check_field_types(record)
+    return record['category'], record['difficulty'], encode_line(record)
+
+
+def check_record(q, encode=binary_fields):
+    """Validate one raw record, encode it for the output and fingerprint it
+
+    Returns (errors, None) for a bad record, otherwise
+    (None, (id, fingerprint, payload)) where payload is encode(record).
+    """
+    errors = question_errors(q)
+    if errors:
+        return errors, None
+    record = {field: q[field] for field in REQUIRED_FIELDS}
+    try:
+        hash(record['id'])
+        payload = encode(record)
+    except (TypeError, ValueError) as e:
+        return [f"cannot be stored: {e}"], None
+    return None, (record['id'], fingerprint(record['question'], record['options']), payload)
+
+
+def check_chunk(chunk, encode=binary_fields):
+    """Worker entry point: check a list of (source, number, raw) records"""
+    results = []
+    for source, number, raw in chunk:
+        if isinstance(raw, bytes):
+            try:
+                raw = json.loads(raw)
+            except ValueError as e:
+                results.append(([f"is not valid JSON: {e}"], None))
+                continue
+        results.append(check_record(raw, encode))
+    return results
+
+
+def read_records(path):
+    """Yield (path, record number, raw) for every record in a JSON array or NDJSON file"""
+    if path.endswith(('.ndjson', '.jsonl')):
+        # Lines go to the workers unparsed, so parsing is parallel too
+        with open(path, 'rb') as f:
+            number = 0
+            for line in f:
+                if line.strip():
+                    number += 1
+                    yield path, number, line
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            for number, q in enumerate(iter_json_array(f), 1):
+                yield path, number, q
+
+
+def chunked(records, size=CHUNK_SIZE):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def checked_chunks(chunks, workers, encode=binary_fields):
+    """Yield (chunk, results) in input order, keeping at most 2 chunks per worker in flight"""
+    check = partial(check_chunk, encode=encode)
+    if workers <= 1:
+        for chunk in chunks:
+            yield chunk, check(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, pool.submit(check, chunk)))
+            if len(pending) >= 2 * workers:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+
+
+class Deduplicator:
+    """Remembers accepted questions by id and by fingerprint, about 205 bytes each"""
+
+    def __init__(self):
+        self.ids = {}
+        self.fingerprints = {}
+
+    def duplicate_of(self, question_id, fingerprint):
+        """Why this question repeats an accepted one, or None"""
+        first = self.ids.get(question_id)
+        if first is not None:
+            return f"duplicate id {question_id!r} (first seen at {first})"
+        first = self.fingerprints.get(fingerprint)
+        if first is not None:
+            return f"duplicate of question {first!r}"
+        return None
+
+    def add(self, question_id, where, fingerprint):
+        self.ids[question_id] = where
+        self.fingerprints[fingerprint] = question_id
+
+
+def run_import(sources, output, workers=None):
+    """Validate, deduplicate and compile sources into output; returns the report"""
+    workers = os.cpu_count() if workers is None else workers
+    binary = output.endswith(BINARY_SUFFIX)
+    encode = binary_fields if binary else ndjson_payload
+    started = time.perf_counter()
+    dedup = Deduplicator()
+    rejected = []
+    counts = {'read': 0, 'accepted': 0, 'invalid': 0, 'duplicate': 0}
+
+    def accepted():
+        chunks = chunked(record for path in sources for record in read_records(path))
+        for chunk, results in checked_chunks(chunks, workers, encode):
+            for (source, number, _), (errors, checked) in zip(chunk, results):
+                counts['read'] += 1
+                where = f"{source}:{number}"
+                if errors:
+                    counts['invalid'] += 1
+                    reason = '; '.join(errors)
+                else:
+                    question_id, question_hash, payload = checked
+                    reason = dedup.duplicate_of(question_id, question_hash)
+                if reason is None:
+                    dedup.add(question_id, where, question_hash)
+                    counts['accepted'] += 1
+                    yield payload
+                    continue
+                if not errors:
+                    counts['duplicate'] += 1
+                if len(rejected) < MAX_REPORTED:
+                    rejected.append({'record': where, 'reason': reason})
+
+    info = {'built': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'sources': [os.path.basename(p) for p in sources]}
+    header = (write_binary_bank if binary else write_compiled_bank)(accepted(), output, info)
+    seconds = time.perf_counter() - started
+    return {
+        'output': output,
+        'questions': header['count'],
+        'categories': header['categories'],
+        'difficulties': header['difficulties'],
+        **counts,
+        'workers': workers,
+        'seconds': round(seconds, 3),
+        'rejected': rejected
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', help="JSON array or NDJSON question files")
+    parser.add_argument('-o', '--output', default='questions' + BINARY_SUFFIX,
+                        help="compiled bank to write: .qbank, or .ndjson for NDJSON plus index")
+    parser.add_argument('--report', help="where to write the JSON report (default: <output>.report.json)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="validation processes (1: no pool)")
+    parser.add_argument('--strict', action='store_true', help="exit 1 if any record was rejected")
+    args = parser.parse_args()
+
+    report = run_import(args.sources, args.output, args.workers)
+    report_path = args.report or args.output + '.report.json'
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    for entry in report['rejected'][:10]:
+        print(f"  ✗ {entry['record']}: {entry['reason']}")
+    if len(report['rejected']) > 10:
+        print(f"  … see {report_path}")
+    print(f"{report['read']:,} read, {report['accepted']:,} accepted, {report['invalid']:,} invalid, "
+          f"{report['duplicate']:,} duplicates in {report['seconds']:.2f}s "
+          f"({report['read'] / max(report['seconds'], 1e-9):,.0f} records/s, {report['workers']} workers)")
+    written = report['output'] if report['output'].endswith(BINARY_SUFFIX) else f"{report['output']} and its index"
+    print(f"✅ Wrote {written}")
+    if args.strict and report['read'] != report['accepted']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,22 @@
 import streamlit as st
+import streamlit.components.v1 as components
+import inspect
 import json
-import random
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import os
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+from functools import partial, wraps
+from adaptive import difficulty_label, get_adaptive_engine
+from assets import inline_theme, theme_loader
+from game_engine import new_game, new_player, GameError, ANSWERED, CORRECT, FINISHED, QUESTION, READY, ROUND_OVER, TIMED_OUT
+from game_rooms import create_room, get_room, RoomError
+from instrumentation import begin_rerun, end_rerun, rerun_timed, timed
+from leaderboard_store import add_score, get_leaderboard_view, LeaderboardView
+from player_stats import answers_from_history, get_profile, record_game
+from question_bank import get_question_bank, next_topic, round_config, sample_positions, QuestionBank, QuestionBankError
+from state_store import decode_session, encode_session, get_state_store, session_key, SESSION_IDLE_SECONDS
 
 # Page configuration
 st.set_page_config(
@@ -13,85 +26,34 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for animations and styling
-st.markdown("""
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
-    body {
-        font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
-    }
-    
-    .stApp {
-        background: #000000;
-    }
-    
-    .main-header {
-        font-family: 'Inter', sans-serif;
-        font-size: 4rem;
-        font-weight: 700;
-        letter-spacing: -0.02em;
-        text-align: center;
-        color: #ff0000;
-        margin: 0;
-        text-shadow: 0 0 20px rgba(255, 0, 0, 0.5);
-    }
-    
-    .stButton > button {
-        background: #000000;
-        border: 1px solid #ffffff;
-        border-radius: 4px;
-        color: #ffffff;
-        padding: 10px 24px;
-        font-size: 14px;
-        font-weight: 500;
-        transition: all 0.15s ease;
-    }
-    
-    .stButton > button:hover {
-        background: #1a1a1a;
-        border-color: #ff0000;
-    }
-    
-    .stTextInput > div > div > input {
-        background: #000000 !important;
-        border: 1px solid #ffffff !important;
-        border-radius: 4px;
-        color: #ffffff !important;
-        padding: 10px 12px;
-        font-size: 14px;
-    }
-    
-    .stSelectbox > div > div {
-        background: #000000 !important;
-        border: 1px solid #ffffff !important;
-        border-radius: 4px;
-    }
-    
-    .stSelectbox > div > div > div {
-        color: #ffffff !important;
-        font-size: 14px;
-    }
-    
-    [data-testid="stAppViewContainer"] {
-        background: #000000;
-    }
-    
-    .css-1d391kg {
-        background-color: #000000;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+# Opt-in per-phase timing (ARENA_TIMING=1, or ?timing=1 for one session); see instrumentation.py
+query_params = st.query_params if hasattr(st, 'query_params') else st.experimental_get_query_params()
+st.session_state.timing = query_params.get('timing') not in (None, '', '0', ['0'])
+begin_rerun(st.session_state.timing)
+
+# Panels that rerun on their own when their buttons are clicked; plain functions (full reruns) before Streamlit 1.33
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
+
+# Scripts run in the page through st.html where it can run them (Streamlit 1.52+, the minimum in requirements.txt,
+# which deprecates components.html), else in a zero-height component
+if 'unsafe_allow_javascript' in inspect.signature(getattr(st, 'html', lambda body: None)).parameters:
+    run_script = partial(st.html, unsafe_allow_javascript=True)
+else:
+    run_script = partial(components.html, height=0)
+
+# Theme CSS from static/theme.css: loaded into the page once per session when static serving is on (see assets.py)
+with timed('css'):
+    if not st.get_option('server.enableStaticServing'):
+        st.markdown(inline_theme(), unsafe_allow_html=True)
+    elif not st.session_state.get('theme_loaded'):
+        run_script(theme_loader())
+        st.session_state.theme_loaded = True
     
 # Initialize session state
 if 'game_state' not in st.session_state:
     st.session_state.game_state = 'setup'
 if 'players' not in st.session_state:
     st.session_state.players = []
-if 'current_round' not in st.session_state:
-    st.session_state.current_round = 1
-if 'current_question' not in st.session_state:
-    st.session_state.current_question = 0
 if 'questions_per_round' not in st.session_state:
     st.session_state.questions_per_round = 5
 if 'max_rounds' not in st.session_state:
@@ -100,29 +62,88 @@ if 'game_started' not in st.session_state:
     st.session_state.game_started = False
 if 'leaderboard_data' not in st.session_state:
     st.session_state.leaderboard_data = []
-if 'round_completed' not in st.session_state:
-    st.session_state.round_completed = False
+if 'seen_questions' not in st.session_state:
+    st.session_state.seen_questions = set()
+if 'question_details' not in st.session_state:
+    st.session_state.question_details = {}
+if 'game_id' not in st.session_state:
+    st.session_state.game_id = uuid.uuid4().hex
+
+# Optional answer server beside the UI (ARENA_ANSWER_SERVER=host:port), sharing this process's rooms;
+# if its port is taken the failure is logged once and the UI carries on without it
+if os.environ.get('ARENA_ANSWER_SERVER'):
+    from answer_server import start_in_background, DEFAULT_HOST
+    answer_host, _, answer_port = os.environ['ARENA_ANSWER_SERVER'].rpartition(':')
+    start_in_background(answer_host or DEFAULT_HOST, int(answer_port))
+
+def query_value(name):
+    """A query parameter of the page URL, from either query params API"""
+    value = query_params.get(name)
+    return value[0] if isinstance(value, list) else value
+
+def restore_session():
+    """On a session's first rerun, resume the game saved under the page's ?sid=, or start a new sid"""
+    if 'session_id' in st.session_state:
+        return
+    store = get_state_store()
+    session_id = query_value('sid')
+    data = store.get(session_key(session_id))[1] if session_id else None
+    if data is None:
+        store.sweep(session_key(''), SESSION_IDLE_SECONDS)
+        session_id = uuid.uuid4().hex
+        if hasattr(st, 'query_params'):
+            st.query_params['sid'] = session_id
+        else:
+            st.experimental_set_query_params(**{**query_params, 'sid': session_id})
+    else:
+        st.session_state.update(decode_session(data))
+    st.session_state.session_id = session_id
+    st.session_state.saved_session = data
+
+def save_session():
+    """Write the session's game to the state store if this rerun changed it"""
+    session_id = st.session_state.get('session_id')
+    if session_id is None:
+        return
+    data = encode_session(st.session_state)
+    if data != st.session_state.get('saved_session'):
+        with timed('save_session'):
+            get_state_store().set(session_key(session_id), data)
+        st.session_state.saved_session = data
+
+def saves_session(func):
+    """Save the session after func, for fragments that rerun without main()"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            save_session()
+    return wrapper
+
+def timed_fragment(name):
+    """Time a fragment as phase fragment:<name>, within the full rerun or as a rerun of its own"""
+    phase = f'fragment:{name}'
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if rerun_timed():
+                with timed(phase):
+                    return func(*args, **kwargs)
+            # A fragment rerun: only this function runs, so the module-level begin_rerun() never does
+            begin_rerun(st.session_state.get('timing', False))
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end_rerun(phase)
+        return wrapper
+    return decorate
 
 def load_questions():
-    """Load questions from JSON file with better error handling"""
+    """Load questions from the shared, mtime-invalidated question bank"""
     try:
-        with open('questions.json', 'r', encoding='utf-8') as f:
-            questions = json.load(f)
-            
-        # Validate question structure
-        for i, q in enumerate(questions):
-            required_fields = ['id', 'question', 'options', 'answer_index', 'category', 'difficulty']
-            for field in required_fields:
-                if field not in q:
-                    st.error(f"Question {i+1} missing required field: {field}")
-                    return []
-            
-            # Validate answer_index is within options range
-            if q['answer_index'] >= len(q['options']) or q['answer_index'] < 0:
-                st.error(f"Question {i+1} has invalid answer_index: {q['answer_index']}")
-                return []
-                
-        return questions
+        with timed('load_questions'):
+            return get_question_bank()
         
     except FileNotFoundError:
         st.error("❌ questions.json file not found! Please ensure the file exists.")
@@ -130,160 +151,93 @@ def load_questions():
     except json.JSONDecodeError as e:
         st.error(f"❌ Error parsing questions.json: {e}")
         return []
+    except QuestionBankError as e:
+        st.error(str(e))
+        return []
     except Exception as e:
         st.error(f"❌ Unexpected error loading questions: {e}")
         return []
 
-def load_leaderboard():
-    """Load leaderboard from JSON file"""
+def load_leaderboard_view():
+    """Load the shared leaderboard view, which only touches the store after a new score"""
     try:
-        with open('leaderboard.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        # Create empty leaderboard if file doesn't exist
-        return []
-    except json.JSONDecodeError:
-        # If JSON is corrupted, return empty list
-        return []
+        with timed('leaderboard_read'):
+            return get_leaderboard_view()
+    except sqlite3.Error as e:
+        st.error(f"Error loading leaderboard: {e}")
+        return LeaderboardView()
 
-def save_leaderboard(leaderboard):
-    """Save leaderboard to JSON file"""
-    try:
-        with open('leaderboard.json', 'w', encoding='utf-8') as f:
-            json.dump(leaderboard, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        st.error(f"Error saving leaderboard: {e}")
+def load_leaderboard():
+    """Load the top of the leaderboard"""
+    return load_leaderboard_view().top()
 
-def add_to_leaderboard(player_name, final_score, avatar):
-    """Add player score to leaderboard"""
-    leaderboard = load_leaderboard()
-    
-    # Add new score
-    leaderboard.append({
-        'name': player_name,
-        'score': final_score,
-        'avatar': avatar,
-        'date': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')
-    })
-    
-    # Sort by score (highest first) and keep top 10
-    leaderboard.sort(key=lambda x: x['score'], reverse=True)
-    leaderboard = leaderboard[:10]
-    
-    # Save updated leaderboard
-    save_leaderboard(leaderboard)
+def add_to_leaderboard(player_name, final_score, avatar, game_id=None):
+    """Add player score to leaderboard, at most once per game"""
+    # Results screens rerun on every interaction, so only the first call for a game writes
+    if game_id is None or st.session_state.get('submitted_game_id') != game_id:
+        try:
+            add_score(player_name, final_score, avatar, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), game_id)
+        except sqlite3.Error as e:
+            st.error(f"Error saving leaderboard: {e}")
+            return load_leaderboard()
+        st.session_state.submitted_game_id = game_id
     
     # Debug: Show what was saved
     st.success(f"✅ {player_name}'s score ({final_score}) saved to leaderboard!")
     
-    return leaderboard
+    return load_leaderboard()
+
+def save_player_stats(game_id, player, history, question_details, rounds):
+    """Queue a finished game for the player's stats, at most once per game"""
+    # record_game() only queues the game; a background writer stores it
+    if st.session_state.get('stats_game_id') != game_id:
+        record_game(game_id, player.name, player.avatar, player.final_score,
+                    answers_from_history(history, question_details), rounds, player.eliminated)
+        st.session_state.stats_game_id = game_id
+
+def load_player_profile(player_name):
+    """Load a player's aggregated stats, or None if they haven't finished a game yet"""
+    try:
+        with timed('player_profile'):
+            return get_profile(player_name)
+    except sqlite3.Error as e:
+        st.error(f"Error loading player stats: {e}")
+        return None
 
 def get_questions_by_difficulty_and_topic(questions, difficulty, topic_categories):
     """Filter questions by difficulty and topic categories"""
-    filtered = [q for q in questions if q['difficulty'] == difficulty and q['category'] in topic_categories]
-    return filtered
-
-def create_player(name, avatar):
-    """Create a new player with initial stats"""
-    return {
-        'name': name,
-        'avatar': avatar,
-        'hp': 100,
-        'max_hp': 100,
-        'xp': 0,
-        'streak': 0,
-        'powerups': {'shield': 0, 'heal': 0},
-        'eliminated': False,
-        'final_score': 0
-    }
-
-def update_player_hp(player, change, reason=""):
-    """Update player HP with animations"""
-    old_hp = player['hp']
-    player['hp'] = max(0, min(player['max_hp'], player['hp'] + change))
-    
-    if change < 0:
-        st.session_state.last_damage = {
-            'player': player['name'],
-            'damage': abs(change),
-            'reason': reason
-        }
-    elif change > 0:
-        st.session_state.last_heal = {
-            'player': player['name'],
-            'heal': change,
-            'reason': reason
-        }
-    
-    return old_hp != player['hp']
-
-def check_elimination(player):
-    """Check if player is eliminated"""
-    if player['hp'] <= 0 and not player['eliminated']:
-        player['eliminated'] = True
-        return True
-    return False
-
-def apply_powerup(player, powerup_type):
-    """Apply power-up to player"""
-    if powerup_type == 'shield' and player['powerups']['shield'] > 0:
-        player['powerups']['shield'] -= 1
-        return True
-    elif powerup_type == 'heal' and player['powerups']['heal'] > 0:
-        player['powerups']['heal'] -= 1
-        update_player_hp(player, 20, "Heal Power-up")
-        return True
-    return False
+    with timed('filter_questions'):
+        # The shared bank answers from its prebuilt index instead of scanning
+        if isinstance(questions, QuestionBank):
+            return questions.select(difficulty, topic_categories)
+        filtered = [q for q in questions if q['difficulty'] == difficulty and q['category'] in topic_categories]
+        return filtered
 
 def get_round_config(round_num):
     """Get configuration for each round with 3 specific topics"""
-    # The 3 specific topics
-    topics = ['Hollywood/Bollywood', 'History/GK', 'Sports']
-    
     # Initialize round topic if not already done
     if f'round_{round_num}_topic' not in st.session_state:
-        # Get available topics (not used in previous rounds)
-        used_topics = []
-        for i in range(1, round_num):
-            if f'round_{i}_topic' in st.session_state:
-                used_topics.append(st.session_state[f'round_{i}_topic'])
-        
-        # Choose from remaining topics
-        available_topics = [topic for topic in topics if topic not in used_topics]
-        if available_topics:
-            st.session_state[f'round_{round_num}_topic'] = random.choice(available_topics)
-        else:
-            # If all topics used, pick randomly
-            st.session_state[f'round_{round_num}_topic'] = random.choice(topics)
-    
-    # Map topics to categories for question filtering
-    topic_to_categories = {
-        'Hollywood/Bollywood': ['Hollywood', 'Bollywood'],
-        'History/GK': ['History'],
-        'Sports': ['Sports']
-    }
+        # Choose from topics not used in previous rounds
+        used_topics = [st.session_state[f'round_{i}_topic'] for i in range(1, round_num)
+                       if f'round_{i}_topic' in st.session_state]
+        st.session_state[f'round_{round_num}_topic'] = next_topic(used_topics)
     
-    current_topic = st.session_state[f'round_{round_num}_topic']
-    configs = {
-        1: {'difficulty': 'easy', 'topic': current_topic, 'categories': topic_to_categories[current_topic]},
-        2: {'difficulty': 'medium', 'topic': current_topic, 'categories': topic_to_categories[current_topic]},
-        3: {'difficulty': 'hard', 'topic': current_topic, 'categories': topic_to_categories[current_topic]}
-    }
-    return configs.get(round_num, configs[3])
+    return round_config(round_num, st.session_state[f'round_{round_num}_topic'])
 
 
 def render_player_setup():
     """Render player setup interface"""
     # Hero section with 70% height
     st.markdown("""
-    <div style="height: 70vh; display: flex; flex-direction: column; justify-content: center; align-items: center; text-align: center;">
-        <h1 class="main-header" style="font-size: 4rem; margin-bottom: 2rem;">THE KNOWLEDGE ARENA</h1>
-        <p style="font-size: 1.5rem; color: #ffffff; margin-bottom: 3rem;">Test your knowledge in the ultimate quiz battle</p>
+    <div class="arena-hero">
+        <h1 class="main-header">THE KNOWLEDGE ARENA</h1>
+        <p>Test your knowledge in the ultimate quiz battle</p>
     </div>
     """, unsafe_allow_html=True)
     
     # Leaderboard section
-    leaderboard = load_leaderboard()
+    leaderboard_view = load_leaderboard_view()
+    leaderboard = leaderboard_view.top()
     if leaderboard:
         st.markdown("### LEADERBOARD")
         for i, entry in enumerate(leaderboard[:5]):
@@ -300,20 +254,25 @@ def render_player_setup():
     
     player_name = st.text_input("NAME", placeholder="Enter name")
     
+    profile = None
     if player_name:
-        leaderboard = load_leaderboard()
-        player_scores = [entry for entry in leaderboard if entry['name'].lower() == player_name.lower()]
-        if player_scores:
-            best_score = max(player_scores, key=lambda x: x['score'])
+        best_score = leaderboard_view.best_score(player_name)
+        if best_score:
             st.caption(f"Best: {best_score['score']} pts")
+        profile = load_player_profile(player_name)
+        if profile:
+            st.caption(f"{profile['games']} games · {profile['accuracy']:.0%} correct · "
+                       f"best streak {profile['best_streak']}")
+            if st.button("VIEW PROFILE"):
+                st.session_state.show_profile = True
+                st.rerun()
     
     avatar_options = ["⚔️", "🛡️", "🏹", "🗡️", "⚡", "🔥", "❄️", "🌟"]
     selected_avatar = st.selectbox("AVATAR", avatar_options)
     
     if st.button("ADD PLAYER", type="primary"):
         if player_name:
-            new_player = create_player(player_name, selected_avatar)
-            st.session_state.players.append(new_player)
+            st.session_state.players.append(new_player(player_name, selected_avatar))
             st.rerun()
         else:
             st.error("Please enter your name!")
@@ -322,17 +281,22 @@ def render_player_setup():
         for i, player in enumerate(st.session_state.players):
             col1, col2 = st.columns([5, 1])
             with col1:
-                st.write(f"{player['avatar']} **{player['name']}**")
+                st.write(f"{player.avatar} **{player.name}**")
             with col2:
                 if st.button("✕", key=f"remove_{i}"):
                     st.session_state.players.pop(i)
                     st.rerun()
         
         st.markdown("---")
+        st.checkbox("ADAPTIVE DIFFICULTY", key='adaptive',
+                    help="Pick each question to match your skill instead of easy → medium → hard")
         if st.button("START", type="primary", use_container_width=True):
                 st.session_state.game_state = 'playing'
                 st.session_state.game_started = True
-                st.session_state.round_completed = False
+                st.session_state.game_id = uuid.uuid4().hex
+                st.session_state.game = new_game(
+                    st.session_state.players[0], st.session_state.questions_per_round, st.session_state.max_rounds
+                )
                 for i in range(1, 4):
                     if f'round_{i}_topic' in st.session_state:
                         del st.session_state[f'round_{i}_topic']
@@ -341,10 +305,41 @@ def render_player_setup():
         if st.button("VIEW LEADERBOARD"):
                 st.session_state.show_full_leaderboard = True
                 st.rerun()
+        
+        st.markdown("### ARENA ROOM")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("CREATE ROOM", use_container_width=True):
+                player = st.session_state.players[0]
+                st.session_state.game_id = uuid.uuid4().hex
+                room = create_room(st.session_state.game_id, player.name, player.avatar,
+                                   st.session_state.questions_per_round, st.session_state.max_rounds)
+                for i in range(1, 4):
+                    if f'round_{i}_topic' in st.session_state:
+                        del st.session_state[f'round_{i}_topic']
+                st.session_state.room_code = room.code
+                st.session_state.game_state = 'room'
+                st.rerun()
+        with col2:
+            room_code = st.text_input("ROOM CODE", placeholder="Enter code", label_visibility="collapsed")
+            if st.button("JOIN ROOM", use_container_width=True):
+                room = get_room(room_code) if room_code else None
+                if room is None:
+                    st.error("No room with that code!")
+                else:
+                    player = st.session_state.players[0]
+                    st.session_state.game_id = uuid.uuid4().hex
+                    try:
+                        room.join(st.session_state.game_id, player.name, player.avatar)
+                    except RoomError as e:
+                        st.error(str(e))
+                    else:
+                        st.session_state.room_code = room.code
+                        st.session_state.game_state = 'room'
+                        st.rerun()
     
     if st.session_state.get('show_full_leaderboard', False):
         st.markdown("### COMPLETE LEADERBOARD")
-        leaderboard = load_leaderboard()
         
         if leaderboard:
             for i, entry in enumerate(leaderboard):
@@ -364,29 +359,103 @@ def render_player_setup():
         if st.button("BACK"):
             st.session_state.show_full_leaderboard = False
             st.rerun()
+    
+    if profile and st.session_state.get('show_profile', False):
+        render_player_profile(profile)
+
+def render_player_profile(profile):
+    """Render a player's lifetime stats and per-category accuracy"""
+    st.markdown(f"### {profile['avatar']} {profile['name']}")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("GAMES", profile['games'])
+    with col2:
+        st.metric("BEST", profile['best_score'])
+    with col3:
+        st.metric("ACCURACY", f"{profile['accuracy']:.0%}")
+    with col4:
+        st.metric("BEST STREAK", profile['best_streak'])
+    
+    average_seconds = profile['average_seconds']
+    speed = f"{average_seconds:.1f}s per answer" if average_seconds is not None else "no timed answers"
+    st.caption(f"Average {profile['average_score']:.0f} pts · {speed} · {profile['timed_out']} timeouts · "
+               f"last played {profile['last_played'][:10]}")
+    
+    for category, stats in profile['categories'].items():
+        col1, col2, col3 = st.columns([3, 2, 2])
+        with col1:
+            st.write(category)
+        with col2:
+            st.write(f"{stats['correct']}/{stats['answered']} ({stats['accuracy']:.0%})")
+        with col3:
+            if stats['average_seconds'] is not None:
+                st.caption(f"{stats['average_seconds']:.1f}s")
+    
+    if st.button("CLOSE PROFILE"):
+        st.session_state.show_profile = False
+        st.rerun()
+
+def render_question_timer(deadline, time_limit):
+    """Render a countdown bar that the browser animates, so the timer needs no reruns"""
+    if deadline is None:
+        return
+    remaining = max(0.0, deadline - time.monotonic())
+    st.markdown(
+        f'<div class="question-timer" style="animation-duration: {time_limit}s; '
+        f'animation-delay: -{time_limit - remaining:.2f}s"></div>',
+        unsafe_allow_html=True
+    )
+    st.caption(f"⏱ {remaining:.0f}s left")
+
+def count_rerun(scope):
+    """Count this session's full reruns and each panel's runs, shown under the status panel with ?timing=1"""
+    counts = st.session_state.setdefault('rerun_counts', {})
+    counts[scope] = counts.get(scope, 0) + 1
 
 def render_game_interface():
     """Render main game interface"""
+    # A question whose time ran out is timed out now, on the first rerun after its deadline
+    game = st.session_state.game = st.session_state.game.expire(time.monotonic())
+    
     # Check if we're in round completion state
-    if st.session_state.get('round_completed', False):
+    if game.phase in (ROUND_OVER, FINISHED):
         end_round()
         return
     
+    render_question_panel()
+
+@fragment
+@timed_fragment('question_panel')
+@saves_session
+def render_question_panel():
+    """Render the question, its answers and the player status
+
+    A fragment: answering or moving on reruns only this panel, once, via the
+    button callbacks.
+    """
+    count_rerun('question_panel')
+    game = st.session_state.game = st.session_state.game.expire(time.monotonic())
+    if game.phase in (ROUND_OVER, FINISHED):
+        # The round ended inside the panel; the round summary replaces the whole page
+        st.rerun()
+    
     questions = load_questions()
     if not questions:
         st.error("No questions available!")
         return
     
     # Get current round configuration
-    round_config = get_round_config(st.session_state.current_round)
+    round_config = get_round_config(game.round)
     round_questions = get_questions_by_difficulty_and_topic(
         questions, round_config['difficulty'], round_config['categories']
     )
     
-    # Validate we have enough questions
-    if len(round_questions) < st.session_state.questions_per_round:
+    # Adaptive rounds draw from every difficulty, so only fixed rounds need enough at this one
+    adaptive = st.session_state.get('adaptive', False)
+    if not adaptive and len(round_questions) < game.questions_per_round:
         st.error(f"Not enough {round_config['difficulty']} {round_config['topic']} questions available!")
-        st.info(f"Need {st.session_state.questions_per_round} questions, but only found {len(round_questions)}")
+        st.info(f"Need {game.questions_per_round} questions, but only found {len(round_questions)}")
         st.info(f"Looking for: {round_config['categories']} with difficulty: {round_config['difficulty']}")
         
         # Show available questions for debugging
@@ -397,224 +466,385 @@ def render_game_interface():
         
         return
     
-    # Initialize round questions if not already done
-    if f'round_{st.session_state.current_round}_questions' not in st.session_state:
-        # Shuffle questions for this round
-        shuffled_questions = round_questions.copy()
-        random.shuffle(shuffled_questions)
-        st.session_state[f'round_{st.session_state.current_round}_questions'] = shuffled_questions
-        st.session_state[f'round_{st.session_state.current_round}_used_questions'] = []
-    
-    # Get the current question from the shuffled list
-    round_questions_list = st.session_state[f'round_{st.session_state.current_round}_questions']
-    used_questions = st.session_state[f'round_{st.session_state.current_round}_used_questions']
-    
-    # Find next unused question
-    if st.session_state.current_question < len(round_questions_list):
-        current_question_data = round_questions_list[st.session_state.current_question]
-        # Mark this question as used
-        if current_question_data['id'] not in used_questions:
-            used_questions.append(current_question_data['id'])
-    else:
-        # If we run out of questions, cycle through unused ones
-        available_questions = [q for q in round_questions_list if q['id'] not in used_questions]
-        if available_questions:
-            current_question_data = available_questions[0]
-            used_questions.append(current_question_data['id'])
+    # Deal this round's questions if not already done (or if the bank was reloaded underneath them)
+    round_key = f'round_{game.round}_questions'
+    bank_key = f'round_{game.round}_bank'
+    if (game.phase != READY and st.session_state.get(bank_key) != questions.signature
+            and same_questions(questions, st.session_state.get(round_key, ()), game)):
+        # Same questions at the same positions, e.g. a game restored on a host whose copy has another mtime
+        st.session_state[bank_key] = questions.signature
+    if game.phase == READY or st.session_state.get(bank_key) != questions.signature:
+        # Draw this round's questions, skipping ones this player has already seen
+        if adaptive:
+            try:
+                positions = get_adaptive_engine(questions).deal(
+                    game.player.name, round_config['categories'], game.questions_per_round,
+                    st.session_state.seen_questions
+                )
+            except ValueError:
+                st.error(f"Not enough {round_config['topic']} questions available!")
+                return
         else:
-            # If all questions used, reset and start over
-            used_questions.clear()
-            current_question_data = round_questions_list[0]
-            used_questions.append(current_question_data['id'])
+            positions = sample_positions(round_questions, game.questions_per_round, st.session_state.seen_questions)
+        dealt = [questions.record(p) for p in positions]
+        game = game.deal(((q['id'], q['answer_index']) for q in dealt), round_config['time_limit'])
+        st.session_state.game = game
+        st.session_state[round_key] = positions
+        st.session_state[bank_key] = questions.signature
+    
+    if adaptive:
+        game = st.session_state.game = adapt_round(game, questions, round_config)
+    
+    current_question_data = questions.record(st.session_state[round_key][game.question])
+    st.session_state.seen_questions.add(current_question_data['id'])
+    st.session_state.question_details[current_question_data['id']] = (
+        current_question_data['category'], current_question_data['difficulty']
+    )
+    
+    # Start the clock the first time this question is shown
+    game = st.session_state.game = game.ask(time.monotonic())
     
-    st.markdown(f"### Round {st.session_state.current_round} - {round_config['topic']} ({round_config['difficulty'].upper()})")
-    st.caption(f"Question {st.session_state.current_question + 1} / {st.session_state.questions_per_round}")
+    difficulty = round_config['difficulty']
+    if adaptive:
+        position = st.session_state[round_key][game.question]
+        difficulty = difficulty_label(get_adaptive_engine(questions).index.difficulty[position])
+    st.markdown(f"### Round {game.round} - {round_config['topic']} ({difficulty.upper()})")
+    st.caption(f"Question {game.question + 1} / {game.questions_per_round}")
     st.markdown("---")
     
     # Players status will be shown at the bottom
     
-    # Initialize answer state for new question
-    if 'answer_submitted' not in st.session_state:
-        st.session_state.answer_submitted = False
-    
     st.markdown(f"**{current_question_data['question']}**")
     
-    if st.session_state.get('answer_submitted', False):
-        if 'last_answer_result' in st.session_state:
-            result = st.session_state.last_answer_result
-            if result['is_correct']:
-                st.success("✓ Correct")
-            else:
-                st.error("✗ Wrong")
-            st.info(f"Answer: {result['correct_answer']}")
-            
-            if st.button("NEXT", key="next_question_btn"):
-                next_question()
+    if game.phase == ANSWERED:
+        if game.last_outcome == TIMED_OUT:
+            st.error("⏱ Time's up")
+        elif game.last_correct:
+            st.success("✓ Correct")
+        else:
+            st.error("✗ Wrong")
+        st.info(f"Answer: {current_question_data['options'][current_question_data['answer_index']]}")
+        if game.last_elapsed is not None:
+            st.caption(f"Answered in {game.last_elapsed:.1f}s")
+        
+        st.button("NEXT", key="next_question_btn", on_click=next_question)
     else:
+        render_question_timer(game.deadline, game.time_limit)
         cols = st.columns(2)
         for i, option in enumerate(current_question_data['options']):
             with cols[i % 2]:
-                if st.button(option, key=f"option_{i}", use_container_width=True):
-                    handle_answer(i, current_question_data, round_config)
+                st.button(option, key=f"option_{i}", use_container_width=True,
+                          on_click=handle_answer, args=(i, current_question_data['id']))
     
     st.markdown("---")
-    if len(st.session_state.players) > 0:
-        player = st.session_state.players[0]
-        hp_percentage = (player['hp'] / player['max_hp']) * 100
-        hp_color = "#ff0000" if hp_percentage < 50 else "#ffffff"
-        
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.write(f"**{player['avatar']} {player['name']}**")
-        with col2:
-            st.metric("HP", f"{player['hp']}/{player['max_hp']}")
-        with col3:
-            st.metric("XP", player['xp'])
-        with col4:
-            st.metric("Streak", player['streak'])
-        
-        st.progress(hp_percentage / 100)
-        st.caption(f"🛡 {player['powerups']['shield']}  💉 {player['powerups']['heal']}")
+    render_player_status()
 
-def handle_answer(selected_index, question_data, round_config):
-    """Handle player's answer"""
-    st.session_state.answer_submitted = True
-    
-    correct_index = question_data['answer_index']
-    is_correct = selected_index == correct_index
-    
-    # Process the single player's answer
-    player = st.session_state.players[0]  # Single player game
-    
-    if is_correct:
-        # Correct answer
-        player['xp'] += 10
-        player['streak'] += 1
-        
-        # Combo heal for streak of 3
-        if player['streak'] >= 3:
-            update_player_hp(player, 15, "Combo Heal!")
-            player['streak'] = 0  # Reset streak
-    else:
-        # Wrong answer
-        if player['powerups']['shield'] > 0:
-            # Use shield
-            apply_powerup(player, 'shield')
-        else:
-            # Take damage
-            update_player_hp(player, -20, "Wrong answer")
-            player['streak'] = 0
-            check_elimination(player)
-    
-    # Store result for display
-    st.session_state.last_answer_result = {
-        'is_correct': is_correct,
-        'correct_answer': question_data['options'][correct_index]
-    }
+@fragment
+@timed_fragment('player_status')
+@saves_session
+def render_player_status():
+    """Render HP, XP and power-ups; using a heal reruns only this panel"""
+    count_rerun('player_status')
+    game = st.session_state.game
+    player = game.player
+    hp_percentage = (player.hp / player.max_hp) * 100
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.write(f"**{player.avatar} {player.name}**")
+    with col2:
+        st.metric("HP", f"{player.hp}/{player.max_hp}")
+    with col3:
+        st.metric("XP", player.xp)
+    with col4:
+        st.metric("Streak", player.streak)
     
-    # Refresh to show result
-    st.rerun()
+    st.progress(hp_percentage / 100)
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.caption(f"🛡 {player.shields}  💉 {player.heals}")
+    with col2:
+        st.button("USE HEAL", key="use_heal", disabled=player.heals <= 0 or player.hp >= player.max_hp,
+                  on_click=heal_player, use_container_width=True)
+    if st.session_state.get('timing'):
+        st.caption(" · ".join(f"{scope} {count}" for scope, count in st.session_state.rerun_counts.items()))
+
+def same_questions(questions, positions, game):
+    """Whether the bank still holds the game's dealt questions at the session's positions"""
+    try:
+        return [questions.record(p)['id'] for p in positions] == [question_id for question_id, _ in game.questions]
+    except IndexError:
+        return False
+
+def adapt_round(game, questions, round_config):
+    """Learn from the answer just given and re-pick the round's next question for the player's new skill"""
+    # Runs once per answer, on the rerun that reveals it, so timeouts count as well as clicks
+    if game.phase != ANSWERED or st.session_state.get('adapted_answers') == len(game.history):
+        return game
+    st.session_state.adapted_answers = len(game.history)
+    
+    engine = get_adaptive_engine(questions)
+    round_key = f'round_{game.round}_questions'
+    positions = list(st.session_state[round_key])
+    engine.record(game.player.name, positions[game.question], game.last_outcome == CORRECT)
+    
+    if game.question + 1 < game.questions_per_round:
+        dealt = {questions.record(p)['id'] for i, p in enumerate(positions) if i != game.question + 1}
+        position = engine.next_question(game.player.name, round_config['categories'],
+                                        st.session_state.seen_questions | dealt)
+        if position is not None:
+            positions[game.question + 1] = position
+            st.session_state[round_key] = positions
+            game = game.deal((questions.record(p)['id'], questions.record(p)['answer_index']) for p in positions)
+    return game
+
+def handle_answer(selected_index, question_id):
+    """Answer button callback; the rerun it triggers shows the result"""
+    # The engine times the answer against the question's clock, applies the
+    # XP/HP/streak/shield rules and records the result. A second click on
+    # an already answered question is ignored.
+    try:
+        st.session_state.game = st.session_state.game.answer(question_id, selected_index, now=time.monotonic())
+    except GameError:
+        pass
 
 def next_question():
-    """Move to next question or round"""
-    st.session_state.current_question += 1
-    st.session_state.answer_submitted = False
-    
-    # Clear previous answer result
-    if 'last_answer_result' in st.session_state:
-        del st.session_state.last_answer_result
-    
-    # Check if round is complete
-    if st.session_state.current_question >= st.session_state.questions_per_round:
-        end_round()
-    else:
-        st.rerun()
+    """NEXT button callback: move to the next question, or end the round"""
+    try:
+        st.session_state.game = st.session_state.game.next()
+    except GameError:
+        pass
+
+def heal_player():
+    """USE HEAL button callback"""
+    try:
+        st.session_state.game = st.session_state.game.heal()
+    except GameError:
+        pass
         
 def end_round():
-    """End current round and show results"""
-    # Set round completion state instead of immediately incrementing
-    st.session_state.round_completed = True
-    st.session_state.current_question = 0
-    
-    # Get the player
-    player = st.session_state.players[0]
+    """Show the results of the round that just ended"""
+    game = st.session_state.game
+    player = game.player
     
-    # Award power-ups to the player if they survived
-    if not player['eliminated']:
-        player['powerups']['shield'] += 1
-        player['powerups']['heal'] += 1
-    
-    if player['eliminated']:
-        player['final_score'] = player['xp'] + (player['hp'] * 2)
-        
+    if player.eliminated:
         st.error("## ELIMINATED")
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("FINAL SCORE", player['final_score'])
+            st.metric("FINAL SCORE", player.final_score)
         with col2:
-            st.metric("XP", player['xp'])
+            st.metric("XP", player.xp)
         with col3:
-            st.metric("HP", player['hp'])
+            st.metric("HP", player.hp)
         
-        if player['final_score'] > 0:
-            add_to_leaderboard(player['name'], player['final_score'], player['avatar'])
+        if player.final_score > 0:
+            add_to_leaderboard(player.name, player.final_score, player.avatar, st.session_state.game_id)
+        save_player_stats(st.session_state.game_id, player, game.history, st.session_state.question_details,
+                          game.round)
         
         if st.button("TRY AGAIN", use_container_width=True):
             reset_game()
         return
     
-    st.success(f"## ROUND {st.session_state.current_round} COMPLETE")
+    st.success(f"## ROUND {game.round} COMPLETE")
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("HP", f"{player['hp']}/{player['max_hp']}")
+        st.metric("HP", f"{player.hp}/{player.max_hp}")
     with col2:
-        st.metric("XP", player['xp'])
+        st.metric("XP", player.xp)
     with col3:
-        st.metric("STREAK", player['streak'])
+        st.metric("STREAK", player.streak)
     
-    if st.session_state.current_round >= st.session_state.max_rounds:
+    if game.phase == FINISHED:
         end_game()
     else:
         if st.button("NEXT ROUND"):
-            # Now safely increment round and initialize next round
-            st.session_state.current_round += 1
-            st.session_state.round_completed = False
-            
-            # Clear any existing round questions to force re-initialization
-            round_key = f'round_{st.session_state.current_round}_questions'
-            if round_key in st.session_state:
-                del st.session_state[round_key]
-            
+            st.session_state.game = game.next_round()
             st.rerun()
 
+def deal_room_round(room):
+    """Draw the room's questions for its next round (host only)"""
+    questions = load_questions()
+    if not questions:
+        st.error("No questions available!")
+        return
+    
+    round_config = get_round_config(room.round)
+    round_questions = get_questions_by_difficulty_and_topic(
+        questions, round_config['difficulty'], round_config['categories']
+    )
+    if len(round_questions) < room.questions_per_round:
+        st.error(f"Not enough {round_config['difficulty']} {round_config['topic']} questions available!")
+        return
+    
+    positions = sample_positions(round_questions, room.questions_per_round)
+    room.deal([questions.record(p) for p in positions], round_config, round_config['time_limit'])
+
+def render_standings(room, key, limit=10):
+    """Render the top of a room's standings and the player's own rank"""
+    standings = room.standings()
+    for i, (player_key, player) in enumerate(standings[:limit]):
+        col1, col2, col3 = st.columns([0.2, 3, 2])
+        with col1:
+            st.write(f"**{i+1}.**")
+        with col2:
+            status = "💀 " if player.eliminated else ""
+            you = " (you)" if player_key == key else ""
+            st.write(f"{status}{player.avatar} {player.name}{you}")
+        with col3:
+            st.write(f"{player.final_score} pts")
+    
+    if len(standings) > limit:
+        rank = next(i for i, (player_key, _) in enumerate(standings) if player_key == key)
+        st.caption(f"Your rank: {rank + 1} / {len(standings)}")
+
+def render_room():
+    """Render a multiplayer room shared with every session that joined it"""
+    room = get_room(st.session_state.get('room_code', ''))
+    key = st.session_state.game_id
+    if room is None or key not in room.players:
+        st.error("❌ This room has closed.")
+        if st.button("BACK"):
+            reset_game()
+        return
+    
+    try:
+        render_room_phase(room, key)
+    except RoomError as e:
+        # The room was closed or expired by another process, or another move got there first
+        st.error(f"❌ {e}")
+        # The same button as for a closed room above, so the click counts whichever one the next rerun shows
+        if get_room(room.code) is None and st.button("BACK"):
+            reset_game()
+
+def render_room_phase(room, key):
+    """Render the room's current phase and apply the player's moves, which raise RoomError on a closed room"""
+    # Close a question whose time ran out, on the first rerun of any session after its deadline
+    room.expire()
+    
+    is_host = key == room.host
+    st.markdown(f"### ROOM {room.code}")
+    st.caption(f"{len(room.players)} players" + (" · You are the host" if is_host else ""))
+    st.markdown("---")
+    
+    if room.phase == READY:
+        st.info("Waiting for players... Share the room code to let others join.")
+        render_standings(room, key)
+        if is_host:
+            if st.button("START", key="room_start", type="primary", use_container_width=True):
+                deal_room_round(room)
+                st.rerun()
+        else:
+            st.caption("The host will start the game.")
+    
+    elif room.phase in (QUESTION, ANSWERED):
+        question_data = room.current_question
+        round_config = room.config
+        st.markdown(f"### Round {room.round} - {round_config['topic']} ({round_config['difficulty'].upper()})")
+        st.caption(f"Question {room.question + 1} / {room.questions_per_round}")
+        st.markdown(f"**{question_data['question']}**")
+        
+        if room.phase == QUESTION:
+            render_question_timer(room.deadline, room.time_limit)
+            if room.has_answered(key):
+                st.info("Answer locked in. Waiting for the host...")
+            elif room.is_active(key):
+                cols = st.columns(2)
+                for i, option in enumerate(question_data['options']):
+                    with cols[i % 2]:
+                        if st.button(option, key=f"room_option_{i}", use_container_width=True):
+                            # Late answers are refused; the timeout shows once the question closes
+                            room.submit(key, question_data['id'], i)
+                            st.rerun()
+            else:
+                st.caption("💀 Eliminated - watching the rest of the game")
+            if is_host:
+                # A stable key: the live count in the label would change the widget id between render and click
+                st.caption(f"{room.answered} / {len(room.players)} answered")
+                if st.button("CLOSE QUESTION", key="room_close_question", type="primary"):
+                    room.tick()
+                    st.rerun()
+        else:
+            outcome = room.results.get(key)
+            if outcome == CORRECT:
+                st.success("✓ Correct")
+            elif outcome == TIMED_OUT:
+                st.error("⏱ Time's up")
+            elif outcome is not None:
+                st.error("✗ Wrong")
+            st.info(f"Answer: {question_data['options'][question_data['answer_index']]}")
+            if is_host:
+                if st.button("NEXT", key="room_next", type="primary"):
+                    room.next()
+                    st.rerun()
+    
+    elif room.phase == ROUND_OVER:
+        st.success(f"## ROUND {room.round} COMPLETE")
+        render_standings(room, key)
+        if is_host:
+            if st.button("NEXT ROUND", key="room_next_round", type="primary"):
+                room.next_round()
+                deal_room_round(room)
+                st.rerun()
+    
+    elif room.phase == FINISHED:
+        st.markdown("## FINAL RESULTS")
+        render_standings(room, key)
+        player = room.players[key]
+        if player.final_score > 0:
+            add_to_leaderboard(player.name, player.final_score, player.avatar, key)
+        save_player_stats(key, player, room.history.get(key, ()), room.question_details, room.round)
+        if st.button("LEAVE ROOM", key="room_leave", use_container_width=True):
+            reset_game()
+    
+    if room.phase != FINISHED:
+        st.markdown("---")
+        player = room.players[key]
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.write(f"**{player.avatar} {player.name}**")
+        with col2:
+            st.metric("HP", f"{player.hp}/{player.max_hp}")
+        with col3:
+            st.metric("XP", player.xp)
+        with col4:
+            st.metric("Streak", player.streak)
+        st.progress(player.hp / player.max_hp)
+        
+        # Other sessions' moves only show up on this session's next rerun
+        if not is_host and st.button("🔄 REFRESH"):
+            st.rerun()
+        if st.button("LEAVE ROOM"):
+            room.leave(key)
+            reset_game()
+
 def end_game():
     """End the game and show final results"""
     st.session_state.game_state = 'finished'
-    
-    # Calculate final score for the single player
-    player = st.session_state.players[0]
-    player['final_score'] = player['xp'] + (player['hp'] * 2)
+    player = st.session_state.game.player
     
     # Save score to leaderboard
-    add_to_leaderboard(player['name'], player['final_score'], player['avatar'])
+    add_to_leaderboard(player.name, player.final_score, player.avatar, st.session_state.game_id)
+    save_player_stats(st.session_state.game_id, player, st.session_state.game.history,
+                      st.session_state.question_details, st.session_state.game.round)
     
     st.markdown("## FINAL RESULTS")
     st.markdown("---")
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("SCORE", player['final_score'])
+        st.metric("SCORE", player.final_score)
     with col2:
-        st.metric("XP", player['xp'])
+        st.metric("XP", player.xp)
     with col3:
-        st.metric("HP", player['hp'])
+        st.metric("HP", player.hp)
     
     st.markdown("---")
     
-    if player['final_score'] >= 200:
+    if player.final_score >= 200:
         st.success("Outstanding!")
-    elif player['final_score'] >= 150:
+    elif player.final_score >= 150:
         st.info("Great work!")
     else:
         st.info("Keep practicing!")
@@ -625,15 +855,15 @@ def end_game():
 def reset_game():
     """Reset the game to initial state"""
     # Reset all game state safely
-    keys_to_reset = ['game_state', 'players', 'current_round', 'current_question', 
-                    'game_started', 'leaderboard_data', 'answer_submitted', 'question_start_time',
-                    'round_completed', 'last_answer_result', 'last_damage', 'last_heal']
+    keys_to_reset = ['game_state', 'players', 'game', 'game_started', 'leaderboard_data',
+                    'game_id', 'submitted_game_id', 'stats_game_id', 'question_details', 'adapted_answers',
+                    'room_code']
     
     for key in keys_to_reset:
             if key in st.session_state:
                 del st.session_state[key]
     
-    # Clear round topics
+    # Clear round topics and dealt questions
     for i in range(1, 4):
         round_key = f'round_{i}_topic'
         if round_key in st.session_state:
@@ -641,24 +871,24 @@ def reset_game():
         questions_key = f'round_{i}_questions'
         if questions_key in st.session_state:
             del st.session_state[questions_key]
-        used_key = f'round_{i}_used_questions'
-        if used_key in st.session_state:
-            del st.session_state[used_key]
+        bank_key = f'round_{i}_bank'
+        if bank_key in st.session_state:
+            del st.session_state[bank_key]
     
-        st.rerun()
+    st.rerun()
     
 def validate_session_state():
     """Validate and initialize session state"""
     required_keys = {
         'game_state': 'setup',
         'players': [],
-        'current_round': 1,
-        'current_question': 0,
         'questions_per_round': 5,
         'max_rounds': 3,
         'game_started': False,
         'leaderboard_data': [],
-        'round_completed': False
+        'seen_questions': set(),
+        'question_details': {},
+        'game_id': uuid.uuid4().hex
     }
     
     for key, default_value in required_keys.items():
@@ -676,8 +906,8 @@ def render_footer():
     
     with col1:
         st.markdown("""
-        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); border-radius: 15px; padding: 20px; margin: 10px 0; color: white; box-shadow: 0 8px 16px rgba(0,0,0,0.3);">
-            <h4 style="color: #feca57; margin-bottom: 15px;">👨‍💻 Team Members</h4>
+        <div class="arena-card team">
+            <h4>👨‍💻 Team Members</h4>
             <p>🎮 Jashan - UID: 25BBE10122</p>
             <p>🎮 Vishal - UID: 25BBE10134</p>
             <p>🎮 Vikanshi - UID: 25BBE10135</p>
@@ -688,8 +918,8 @@ def render_footer():
     
     with col2:
         st.markdown("""
-        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); border-radius: 15px; padding: 20px; margin: 10px 0; color: white; box-shadow: 0 8px 16px rgba(0,0,0,0.3);">
-            <h4 style="color: #feca57; margin-bottom: 15px;">👨‍💻 Team Members</h4>
+        <div class="arena-card team">
+            <h4>👨‍💻 Team Members</h4>
             <p>🎮 Surabhi - UID: 25BBE10140</p>
             <p>🎮 Amandeep - UID: 25BBE10196</p>
             <p>🎮 Jasmine - UID: 25BBE10171</p>
@@ -700,8 +930,8 @@ def render_footer():
     
     # Mentor Section
     st.markdown("""
-    <div style="background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%); border-radius: 15px; padding: 20px; margin: 10px 0; color: white; box-shadow: 0 8px 16px rgba(0,0,0,0.3);">
-        <h4 style="color: #feca57; margin-bottom: 15px;">🎓 Mentor</h4>
+    <div class="arena-card mentor">
+        <h4>🎓 Mentor</h4>
         <p>👨‍🏫 Mrs. Karuna Kaushik</p>
         <p>📋 Assistant Professor</p>
         <p>📧 karuna.e19106@cumail.in</p>
@@ -711,8 +941,8 @@ def render_footer():
     
     # Project Information
     st.markdown("""
-    <div style="background: linear-gradient(135deg, #45b7d1 0%, #96ceb4 100%); border-radius: 15px; padding: 20px; margin: 10px 0; color: white; box-shadow: 0 8px 16px rgba(0,0,0,0.3);">
-        <h4 style="color: #feca57; margin-bottom: 15px;">🚀 Project Information</h4>
+    <div class="arena-card project">
+        <h4>🚀 Project Information</h4>
         <p>📅 Development Period: 2024</p>
         <p>🛠️ Technology Stack: Python + Streamlit</p>
         <p>🎯 Project Type: Interactive Quiz Game</p>
@@ -722,30 +952,47 @@ def render_footer():
     
     # Copyright
     st.markdown("""
-    <div style="text-align: center; margin-top: 20px; padding: 15px; background: rgba(255,255,255,0.1); border-radius: 10px;">
-        <p style="color: rgba(255,255,255,0.8); margin: 0;">Made with ❤️ by our amazing development team | © 2025 The Knowledge Arena</p>
+    <div class="arena-copyright">
+        <p>Made with ❤️ by our amazing development team | © 2025 The Knowledge Arena</p>
     </div>
     """, unsafe_allow_html=True)
     
 def main():
     """Main game loop"""
-    # Validate session state
-    validate_session_state()
-    
-    # Ensure we have at least one player for single-player mode
-    if st.session_state.game_state == 'playing' and len(st.session_state.players) == 0:
-        st.error("❌ No player found! Redirecting to setup...")
-        st.session_state.game_state = 'setup'
-        st.rerun()
-    
-    if st.session_state.game_state == 'setup':
-        render_player_setup()
-    elif st.session_state.game_state == 'playing':
-        render_game_interface()
-    elif st.session_state.game_state == 'finished':
-        end_game()
-    
-    render_footer()
+    count_rerun('app')
+    try:
+        # Resume a game saved by another process, or before a restart
+        with timed('restore_session'):
+            restore_session()
+        
+        # Validate session state
+        with timed('validate_session_state'):
+            validate_session_state()
+        
+        # Ensure we have at least one player for single-player mode
+        if st.session_state.game_state == 'playing' and 'game' not in st.session_state:
+            st.error("❌ No player found! Redirecting to setup...")
+            st.session_state.game_state = 'setup'
+            st.rerun()
+        
+        if st.session_state.game_state == 'setup':
+            with timed('render_player_setup'):
+                render_player_setup()
+        elif st.session_state.game_state == 'playing':
+            with timed('render_game_interface'):
+                render_game_interface()
+        elif st.session_state.game_state == 'room':
+            with timed('render_room'):
+                render_room()
+        elif st.session_state.game_state == 'finished':
+            with timed('end_game'):
+                end_game()
+        
+        with timed('render_footer'):
+            render_footer()
+    finally:
+        save_session()
+        end_rerun()
 
 if __name__ == "__main__":
     main()
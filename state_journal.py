@@ -0,0 +1,354 @@
+"""
+State Journal
+=============
+
+A crash-safe state store for a single app process: the in-memory store of
+state_store.py with a write-ahead journal and periodic snapshots, the way
+Redis pairs its append-only file with RDB snapshots.
+
+    ARENA_STATE_STORE=journal:arena_journal streamlit run quiz_royale.py
+
+Every change (set, delete, a field added or taken) is appended to the
+current journal file before it is applied in memory. The write goes straight
+to the OS, so a crash or worker restart loses nothing. What a power cut can
+lose depends on ARENA_JOURNAL_FSYNC: 'everysec' (the default) fsyncs once a
+second from a background thread, 'always' fsyncs before every change returns.
+
+Journal files are numbered (journal.00000007.log). Once the current one
+passes SNAPSHOT_BYTES or the size of the last snapshot, whichever is bigger,
+the store starts the next file and writes a snapshot of everything up to
+that point in a background thread. The snapshot goes to a temp file, which
+is fsynced and renamed over snapshot.bin, then the directory is fsynced and
+the journals it covers are deleted. A crash at any point leaves either the
+old snapshot and its journals or the new ones. Calling snapshot() directly
+waits for any snapshot in progress, so snapshots never overlap.
+
+On startup the store loads snapshot.bin and replays the journals after it,
+so recovery reads the live state plus a journal no bigger than about the
+last snapshot (or SNAPSHOT_BYTES), however long the process ran. An entry
+cut short by a crash ends the replay and is cut off the file. The store then
+starts a fresh journal and, if it replayed anything, folds it into a new
+snapshot in the background.
+
+Journals and snapshots share one framing:
+
+    [body length <I] [crc32 of body <I] [body]
+    body = [op <B] [time <d] [version <Q] then [length <I][bytes] per argument
+
+A snapshot is a journal with one set per key and one add per field, after
+an 8-byte magic and the number of the last journal it covers.
+"""
+
+import atexit
+import logging
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+
+from state_store import MemoryStateStore
+
+JOURNAL_DIR = 'arena_journal'
+JOURNAL_FSYNC = os.environ.get('ARENA_JOURNAL_FSYNC', 'everysec')
+SNAPSHOT_BYTES = 64 * 1024 * 1024
+SNAPSHOT_FILE = 'snapshot.bin'
+SNAPSHOT_MAGIC = b'ARENASN\x01'
+JOURNAL_FILE = re.compile(r'journal\.(\d{8})\.log$')
+
+# Journal operations
+SET = 1
+DELETE = 2
+ADD = 3
+TAKE = 4
+
+_FRAME = struct.Struct('<II')
+_BODY = struct.Struct('<BdQ')
+_LENGTH = struct.Struct('<I')
+_GENERATION = struct.Struct('<Q')
+
+logger = logging.getLogger(__name__)
+
+
+class JournalError(Exception):
+    """Raised when a snapshot cannot be read back"""
+
+
+def encode_entry(op, when, version, *args):
+    """Frame one journal entry"""
+    parts = [_BODY.pack(op, when, version)]
+    for arg in args:
+        parts.append(_LENGTH.pack(len(arg)))
+        parts.append(arg)
+    body = b''.join(parts)
+    return _FRAME.pack(len(body), zlib.crc32(body)) + body
+
+
+def iter_entries(data, offset=0):
+    """Yield (end offset, op, time, version, args) for each intact entry from offset
+
+    Stops at the end of the data or at the first entry that is cut short or
+    fails its checksum.
+    """
+    end = len(data)
+    while offset + _FRAME.size <= end:
+        length, crc = _FRAME.unpack_from(data, offset)
+        start = offset + _FRAME.size
+        if start + length > end or zlib.crc32(data[start:start + length]) != crc:
+            return
+        op, when, version = _BODY.unpack_from(data, start)
+        args = []
+        position = start + _BODY.size
+        while position < start + length:
+            (size,) = _LENGTH.unpack_from(data, position)
+            position += _LENGTH.size
+            args.append(bytes(data[position:position + size]))
+            position += size
+        offset = start + length
+        yield offset, op, when, version, args
+
+
+def _fsync_directory(path):
+    # Makes a rename or new file durable; not possible (or needed) on Windows
+    if os.name == 'nt':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class JournaledStateStore(MemoryStateStore):
+    """MemoryStateStore whose changes survive a restart
+
+    Only one process may use a directory at a time; for several processes,
+    use the SQLite store.
+    """
+
+    durable = True
+
+    def __init__(self, directory=JOURNAL_DIR, fsync=JOURNAL_FSYNC, snapshot_bytes=SNAPSHOT_BYTES):
+        if fsync not in ('always', 'everysec'):
+            raise ValueError(f"Unknown fsync policy {fsync!r}; use always or everysec")
+        super().__init__()
+        self.directory = os.path.abspath(directory)
+        self.fsync = fsync
+        self.snapshot_bytes = snapshot_bytes
+        self.snapshots = 0
+        self._snapshot_size = 0
+        self._fd = None
+        self._dirty = False
+        self._journal_bytes = 0
+        self._snapshot_thread = None
+        # Held for a whole snapshot, so snapshots cover generations and replace snapshot.bin in order
+        self._snapshot_lock = threading.Lock()
+        self._closed = threading.Event()
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.recovery = self._recover()
+        self._open_journal(self.recovery['generation'] + 1)
+        if self.recovery['entries']:
+            self._start_snapshot()
+        if fsync == 'everysec':
+            threading.Thread(target=self._sync_every_second, name='state-journal-fsync', daemon=True).start()
+        atexit.register(self.close)
+
+    # Recovery
+
+    def _journal_path(self, generation):
+        return os.path.join(self.directory, f'journal.{generation:08d}.log')
+
+    def _journals(self):
+        """Numbers of the journal files in the directory, oldest first"""
+        return sorted(int(m.group(1)) for m in map(JOURNAL_FILE.match, os.listdir(self.directory)) if m)
+
+    def _apply(self, op, when, version, args):
+        """Apply one journal or snapshot entry to the in-memory state"""
+        if op == SET:
+            self._values[args[0].decode('utf-8')] = (args[1], version, when)
+        elif op == DELETE:
+            key = args[0].decode('utf-8')
+            self._values.pop(key, None)
+            self._fields.pop(key, None)
+        elif op == ADD:
+            self._fields.setdefault(args[0].decode('utf-8'), {}).setdefault(args[1].decode('utf-8'), args[2])
+        elif op == TAKE:
+            self._fields.pop(args[0].decode('utf-8'), None)
+
+    def _recover(self):
+        """Load the snapshot and replay every journal after it"""
+        started = time.perf_counter()
+        covered = 0
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, 'rb') as f:
+                data = f.read()
+            self._snapshot_size = len(data)
+            header = len(SNAPSHOT_MAGIC) + _GENERATION.size
+            if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                raise JournalError(f"{snapshot_path} is not a state snapshot")
+            (covered,) = _GENERATION.unpack_from(data, len(SNAPSHOT_MAGIC))
+            offset = header
+            for offset, op, when, version, args in iter_entries(data, header):
+                self._apply(op, when, version, args)
+            if offset != len(data):
+                # Snapshots are renamed into place complete, so this is damage, not a crash
+                raise JournalError(f"{snapshot_path} is damaged at byte {offset}")
+        snapshot_seconds = time.perf_counter() - started
+
+        entries = replayed_bytes = 0
+        generation = covered
+        journals = [g for g in self._journals() if g > covered]
+        for generation in journals:
+            path = self._journal_path(generation)
+            with open(path, 'rb') as f:
+                data = f.read()
+            offset = 0
+            for offset, op, when, version, args in iter_entries(data):
+                self._apply(op, when, version, args)
+                entries += 1
+            replayed_bytes += offset
+            if offset != len(data):
+                # Cut short by a crash mid-write: that entry never returned to its caller
+                logger.warning("Dropping %d bytes of a torn entry at the end of %s", len(data) - offset, path)
+                with open(path, 'r+b') as f:
+                    f.truncate(offset)
+        return {
+            'generation': generation,
+            'keys': len(self._values),
+            'journals': len(journals),
+            'entries': entries,
+            'journal_bytes': replayed_bytes,
+            'snapshot_seconds': snapshot_seconds,
+            'seconds': time.perf_counter() - started
+        }
+
+    # Journal
+
+    def _open_journal(self, generation):
+        self._generation = generation
+        self._fd = os.open(self._journal_path(generation), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._journal_bytes = 0
+        _fsync_directory(self.directory)
+
+    def _append(self, op, version, *args):
+        """Write an entry ahead of its change; the caller holds self._lock"""
+        if self._fd is None:
+            raise ValueError("The state journal is closed")
+        entry = encode_entry(op, time.time(), version, *args)
+        os.write(self._fd, entry)
+        if self.fsync == 'always':
+            os.fsync(self._fd)
+        else:
+            self._dirty = True
+        self._journal_bytes += len(entry)
+        if self._journal_bytes >= max(self.snapshot_bytes, self._snapshot_size):
+            self._start_snapshot()
+        return entry
+
+    def _start_snapshot(self):
+        if self._snapshot_thread is None:
+            self._snapshot_thread = threading.Thread(target=self._background_snapshot, name='state-snapshot',
+                                                     daemon=True)
+            self._snapshot_thread.start()
+
+    def _background_snapshot(self):
+        try:
+            self.snapshot()
+        finally:
+            self._snapshot_thread = None
+
+    def _sync_every_second(self):
+        while not self._closed.wait(1.0):
+            self.sync()
+
+    def sync(self):
+        """fsync the journal if anything was written since the last sync"""
+        with self._lock:
+            if self._dirty and self._fd is not None:
+                os.fsync(self._fd)
+                self._dirty = False
+
+    def set(self, key, value):
+        with self._lock:
+            version = self._values.get(key, (None, 0, None))[1] + 1
+            when = time.time()
+            self._append(SET, version, key.encode('utf-8'), value)
+            self._values[key] = (value, version, when)
+            return version
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._values or key in self._fields:
+                self._append(DELETE, 0, key.encode('utf-8'))
+                super().delete(key)
+
+    def add(self, key, field, value):
+        with self._lock:
+            if field in self._fields.get(key, ()):
+                return False
+            self._append(ADD, 0, key.encode('utf-8'), field.encode('utf-8'), value)
+            return super().add(key, field, value)
+
+    def take(self, key):
+        with self._lock:
+            if key in self._fields:
+                self._append(TAKE, 0, key.encode('utf-8'))
+            return super().take(key)
+
+    def sweep(self, prefix, max_idle):
+        cutoff = time.time() - max_idle
+        with self._lock:
+            for key in [k for k, (_, _, updated) in self._values.items() if k.startswith(prefix) and updated < cutoff]:
+                self.delete(key)
+
+    # Snapshots
+
+    def snapshot(self):
+        """Write everything up to now to snapshot.bin and drop the journals it covers"""
+        with self._snapshot_lock:
+            with self._lock:
+                if self._fd is None:
+                    return
+                values = dict(self._values)
+                fields = {key: dict(entries) for key, entries in self._fields.items()}
+                # Later changes go to the next journal, which the new snapshot will not cover
+                covered = self._generation
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._dirty = False
+                self._open_journal(covered + 1)
+
+            path = os.path.join(self.directory, SNAPSHOT_FILE)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(SNAPSHOT_MAGIC + _GENERATION.pack(covered))
+                for key, (value, version, updated) in values.items():
+                    f.write(encode_entry(SET, updated, version, key.encode('utf-8'), value))
+                for key, entries in fields.items():
+                    for field, value in entries.items():
+                        f.write(encode_entry(ADD, 0.0, 0, key.encode('utf-8'), field.encode('utf-8'), value))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            _fsync_directory(self.directory)
+            self._snapshot_size = os.path.getsize(path)
+
+            for generation in self._journals():
+                if generation <= covered:
+                    os.remove(self._journal_path(generation))
+            self.snapshots += 1
+
+    def close(self):
+        """Sync and close the journal; later changes raise ValueError"""
+        self._closed.set()
+        thread = self._snapshot_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        with self._lock:
+            if self._fd is not None:
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._fd = None
@@ -0,0 +1,343 @@
+"""
+State Store
+===========
+
+Where game progress lives outside a single Streamlit process.
+
+A session's game used to exist only in st.session_state, pinned to the
+process that served it: a load balancer needed sticky sessions and a restart
+lost every game in flight. The app now writes each session's game to a state
+store under the ?sid= in the page URL after every rerun that changed it, and
+a new session with that sid on any process picks the game up again.
+
+Three backends, picked with ARENA_STATE_STORE:
+
+* memory (the default): a dict in this process. Reloading the page resumes
+  the game, but nothing is shared and a restart still loses it.
+* journal or journal:<dir>: the same dict for one process, with a
+  write-ahead journal and snapshots on disk (arena_journal/ by default) so
+  that games survive a crash or restart; see state_journal.py.
+* sqlite or sqlite:<path>: a WAL-mode SQLite file (arena_state.db by
+  default) that every app process on the host opens. Games survive restarts
+  and any process can serve any session.
+
+With a durable backend (journal or sqlite) multiplayer rooms move into the
+store too (see game_rooms.py). All three have the same small interface, the
+subset of Redis the app needs, so a Redis backend is one more class:
+
+    store.get(key)                 -> (version, bytes) or (0, None)     GET
+    store.set(key, value)          -> new version                      SET
+    store.delete(key)                                                  DEL
+    store.add(key, field, value)   -> False if the field exists        HSETNX
+    store.has(key, field), store.count(key)                            HEXISTS, HLEN
+    store.take(key)                -> {field: bytes}, now empty        HGETALL + DEL
+    with store.lock(key): ...      exclusive across processes          SET NX lock
+    store.sweep(prefix, max_idle)  drops keys nobody wrote lately      EXPIRE
+
+Sessions are stored compactly: question ids and bank positions rather than
+question dicts, players and the Game as plain lists, and clock readings as
+wall-clock times, since time.monotonic() means nothing to another process.
+A mid-game session is a few hundred bytes of JSON:
+
+    data = encode_session(st.session_state)
+    st.session_state.update(decode_session(data))
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from game_engine import Game, Player
+
+STATE_DB = 'arena_state.db'
+STATE_STORE = os.environ.get('ARENA_STATE_STORE', 'memory')
+BUSY_TIMEOUT_SECONDS = 30
+SESSION_IDLE_SECONDS = 24 * 60 * 60
+SESSION_FORMAT = 1
+
+# Session state that makes up a game in progress; the rest (theme, timing, open panels) is per page
+SESSION_KEYS = ('game_state', 'players', 'questions_per_round', 'max_rounds', 'game_started', 'seen_questions',
+                'question_details', 'game_id', 'game', 'adaptive', 'adapted_answers', 'submitted_game_id',
+                'stats_game_id', 'room_code')
+ROUND_KEY = re.compile(r'round_\d+_(?:topic|questions|bank)$')
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS state (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        version INTEGER NOT NULL,
+        updated REAL NOT NULL
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS state_by_age ON state (updated)",
+    """CREATE TABLE IF NOT EXISTS fields (
+        key TEXT NOT NULL,
+        field TEXT NOT NULL,
+        value BLOB NOT NULL,
+        PRIMARY KEY (key, field)
+    ) WITHOUT ROWID"""
+)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def wall_time(reading):
+    """Convert a time.monotonic() reading to a wall-clock time another process can use"""
+    return None if reading is None else reading + time.time() - time.monotonic()
+
+
+def monotonic_time(wall):
+    """Convert a wall-clock time from wall_time() back to this process's monotonic clock"""
+    return None if wall is None else wall - time.time() + time.monotonic()
+
+
+class MemoryStateStore:
+    """State kept in this process; the default when nothing is shared"""
+
+    shared = False
+    durable = False
+
+    def __init__(self):
+        self._values = {}
+        self._fields = {}
+        self._locks = {}
+        self._lock = threading.RLock()
+
+    def get(self, key):
+        with self._lock:
+            value, version, _ = self._values.get(key, (None, 0, None))
+            return version, value
+
+    def set(self, key, value):
+        with self._lock:
+            version = self._values.get(key, (None, 0, None))[1] + 1
+            self._values[key] = (value, version, time.time())
+            return version
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+            self._fields.pop(key, None)
+
+    def add(self, key, field, value):
+        with self._lock:
+            fields = self._fields.setdefault(key, {})
+            if field in fields:
+                return False
+            fields[field] = value
+            return True
+
+    def has(self, key, field):
+        with self._lock:
+            return field in self._fields.get(key, ())
+
+    def count(self, key):
+        with self._lock:
+            return len(self._fields.get(key, ()))
+
+    def take(self, key):
+        with self._lock:
+            return self._fields.pop(key, {})
+
+    @contextmanager
+    def lock(self, key):
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.RLock())
+        with lock:
+            yield
+
+    def sweep(self, prefix, max_idle):
+        cutoff = time.time() - max_idle
+        with self._lock:
+            for key in [k for k, (_, _, updated) in self._values.items() if k.startswith(prefix) and updated < cutoff]:
+                del self._values[key]
+                self._fields.pop(key, None)
+
+
+class SQLiteStateStore:
+    """State in a SQLite file shared by every app process on the host
+
+    lock() is a write transaction (BEGIN IMMEDIATE), so it excludes every
+    other writer for its duration, not only those of its key; the app only
+    holds it for one room move at a time. Store calls made while it is held
+    on the same thread run inside that transaction.
+    """
+
+    shared = True
+    durable = True
+
+    def __init__(self, path=STATE_DB):
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+        self.connect()
+
+    def connect(self):
+        """Return this thread's connection, creating the schema on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode: every statement outside lock() is its own transaction
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    def get(self, key):
+        row = self.connect().execute("SELECT version, value FROM state WHERE key = ?", (key,)).fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    def set(self, key, value):
+        with self.lock(key):
+            conn = self.connect()
+            conn.execute(
+                "INSERT INTO state (key, value, version, updated) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, version = version + 1, "
+                "updated = excluded.updated",
+                (key, value, time.time())
+            )
+            return conn.execute("SELECT version FROM state WHERE key = ?", (key,)).fetchone()[0]
+
+    def delete(self, key):
+        with self.lock(key):
+            conn = self.connect()
+            conn.execute("DELETE FROM state WHERE key = ?", (key,))
+            conn.execute("DELETE FROM fields WHERE key = ?", (key,))
+
+    def add(self, key, field, value):
+        return self.connect().execute(
+            "INSERT OR IGNORE INTO fields (key, field, value) VALUES (?, ?, ?)", (key, field, value)
+        ).rowcount == 1
+
+    def has(self, key, field):
+        return self.connect().execute(
+            "SELECT 1 FROM fields WHERE key = ? AND field = ?", (key, field)
+        ).fetchone() is not None
+
+    def count(self, key):
+        return self.connect().execute("SELECT COUNT(*) FROM fields WHERE key = ?", (key,)).fetchone()[0]
+
+    def take(self, key):
+        with self.lock(key):
+            conn = self.connect()
+            fields = dict(conn.execute("SELECT field, value FROM fields WHERE key = ?", (key,)))
+            conn.execute("DELETE FROM fields WHERE key = ?", (key,))
+        return fields
+
+    @contextmanager
+    def lock(self, key):
+        conn = self.connect()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    def sweep(self, prefix, max_idle):
+        # Keys are matched with a range rather than LIKE so that '_' and '%' in prefixes stay literal
+        with self.lock(prefix):
+            conn = self.connect()
+            stale = (prefix, prefix + '\uffff', time.time() - max_idle)
+            conn.execute("DELETE FROM fields WHERE key IN "
+                         "(SELECT key FROM state WHERE key >= ? AND key < ? AND updated < ?)", stale)
+            conn.execute("DELETE FROM state WHERE key >= ? AND key < ? AND updated < ?", stale)
+
+
+def open_state_store(spec=STATE_STORE):
+    """Build a store from an ARENA_STATE_STORE value: memory, journal[:<dir>] or sqlite[:<path>]"""
+    kind, _, path = spec.partition(':')
+    if kind == 'memory':
+        return MemoryStateStore()
+    if kind == 'journal':
+        from state_journal import JournaledStateStore, JOURNAL_DIR
+        return JournaledStateStore(path or JOURNAL_DIR)
+    if kind == 'sqlite':
+        return SQLiteStateStore(path or STATE_DB)
+    raise ValueError(f"Unknown state store {spec!r}; use memory, journal[:<dir>] or sqlite[:<path>]")
+
+
+def get_state_store(spec=None):
+    """Return this process's store for spec (default: STATE_STORE), opening it on first use"""
+    spec = spec or STATE_STORE
+    with _stores_lock:
+        store = _stores.get(spec)
+        if store is None:
+            store = _stores[spec] = open_state_store(spec)
+        return store
+
+
+def session_key(session_id):
+    return f'session/{session_id}'
+
+
+def _dump_game(game):
+    fields = list(game)
+    fields[Game._fields.index('asked_at')] = wall_time(game.asked_at)
+    return fields
+
+
+def _load_game(fields):
+    (player, round_number, question, questions, phase, last_correct, last_elapsed, questions_per_round,
+     max_rounds, time_limit, asked_at, history) = fields
+    return Game(Player(*player), round_number, question, tuple(map(tuple, questions)), phase, last_correct,
+                last_elapsed, questions_per_round, max_rounds, time_limit, monotonic_time(asked_at),
+                tuple(map(tuple, history)))
+
+
+def encode_session(state):
+    """Serialize the game-related keys of a session state mapping to compact JSON bytes"""
+    data = {'v': SESSION_FORMAT}
+    for key in state.keys():
+        if key not in SESSION_KEYS and not ROUND_KEY.match(key):
+            continue
+        value = state[key]
+        if key == 'game':
+            value = _dump_game(value)
+        elif key == 'seen_questions':
+            # Ids may mix ints and strings, so no sort; an unchanged set still encodes to the same bytes
+            value = list(value)
+        elif key == 'question_details':
+            value = [[question_id, *details] for question_id, details in value.items()]
+        elif key.endswith('_questions') or (key.endswith('_bank') and value is not None):
+            value = list(value)
+        data[key] = value
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def decode_session(data):
+    """Rebuild session state values from encode_session() bytes"""
+    state = json.loads(data)
+    if state.pop('v', None) != SESSION_FORMAT:
+        return {}
+    for key, value in state.items():
+        if key == 'game':
+            state[key] = _load_game(value)
+        elif key == 'players':
+            state[key] = [Player(*player) for player in value]
+        elif key == 'seen_questions':
+            state[key] = set(value)
+        elif key == 'question_details':
+            state[key] = {question_id: tuple(details) for question_id, *details in value}
+        elif key.endswith('_bank') and value is not None:
+            state[key] = tuple(value)
+    return state
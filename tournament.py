@@ -0,0 +1,443 @@
+"""
+Tournament
+==========
+
+Single-elimination brackets for events that run hundreds of arenas at once.
+
+    tournament = Tournament({"ada": ("Ada", "⚔️"), "grace": ("Grace", "🛡️"), ...})
+    config = tournament.config            # difficulty, topic, categories, time_limit
+    tournament.deal(questions)            # host: the round's question records
+    tournament.submit("ada", 7, 2)        # any session, any time before the tick
+    tournament.tick()                     # host: closes the question in every match
+    tournament.next()
+
+Entrants are seeded in the order given. A stage has a slot for every
+entrant, rounded up to a power of match_size; empty slots are byes for the
+top seeds, and a match left with one entrant is a walkover. Seeds are
+spread over the bracket so the top match_size seeds can only meet in the
+final. Winners meet in the next stage in bracket order until one is left.
+
+Matches are played in waves of up to `capacity` matches of a stage at once
+(by default all of them). Every match in a wave plays the same game, with
+the round structure of a single-player one: questions_per_round,
+max_rounds, and per round the app's config from round_config() in
+question_bank.py. The wave shares one set of questions and one clock, so it
+moves in lockstep and a single tick closes the question in all of its
+matches. Within a match the rules are those of a room: a player knocked out
+plays the round out, and the match ends after the last round or once nobody
+in it is standing. The best final score wins, the higher seed on a tie.
+
+Answers are only buffered when they arrive. A tick scores every active
+player in the wave in one pass with the rules from game_engine. Players are
+kept in flat lists in wave order and each question's outcomes and answer
+times in one column, read back by result() and history(), so a tick
+allocates almost nothing per player and its cost per match stays flat as
+the wave grows to 10,000 matches. Per-tick latency is not flat: it grows
+linearly with the wave, a few microseconds per match on one core (about
+40 ms for a 10,000-match wave).
+
+Scoring is inline by default. With workers > 1 (capped at the CPU count)
+waves of more than SCORE_CHUNK_PLAYERS players are scored chunk by chunk in
+a process pool, but pickling a chunk to a worker and back costs the parent
+several times what scoring it inline does, so the pool only pays if the
+scoring rules grow much heavier than they are.
+
+A tournament lives in the process that created it. This is a library
+module: the app has no tournament screens, so brackets are run from code
+(see benchmarks/bench_tournament.py).
+"""
+
+import math
+import os
+import threading
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from game_engine import (award_round, new_player, score_answer, score_timeout, ANSWERED, CORRECT, FINISHED,
+                         MAX_ROUNDS, QUESTION, QUESTIONS_PER_ROUND, READY, ROUND_OVER, TIMED_OUT, WRONG)
+from question_bank import next_topic, round_config
+
+SCORE_CHUNK_PLAYERS = 4096
+UNSCORED = 255  # outcome column value for a player who was not playing the question
+
+
+class TournamentError(Exception):
+    """Raised when a tournament move is not valid in its current phase"""
+
+
+def bracket_order(matches, match_size=2):
+    """Top seed of each match, in bracket order, so that top seeds are kept apart until the last stages
+
+    matches must be a power of match_size.
+    """
+    order = [0]
+    while len(order) < matches:
+        size = len(order)
+        order = [branch * size + (size - 1 - seed if branch % 2 else seed)
+                 for seed in order for branch in range(match_size)]
+    return order
+
+
+def seed_bracket(entrants, match_size=2):
+    """Split seeds 0..entrants-1 into first-stage matches, in bracket order; byes go to the top seeds"""
+    if match_size < 2:
+        raise TournamentError("Matches need at least 2 players")
+    if entrants < 2:
+        raise TournamentError("A tournament needs at least 2 entrants")
+    matches = 1
+    while matches * match_size < entrants:
+        matches *= match_size
+    groups = []
+    for top in bracket_order(matches, match_size):
+        # Seeds snake across the matches row by row, so each row balances the one before it
+        seeds = (row * matches + (matches - 1 - top if row % 2 else top) for row in range(match_size))
+        groups.append([seed for seed in seeds if seed < entrants])
+    return groups
+
+
+def score_players(answer_index, players, answers):
+    """Score one question for each Player given their (choice, elapsed) answer or None
+
+    Returns the new Players and a bytes of their outcomes. Parallel lists
+    rather than a tuple per player keep a 10,000-match tick from feeding
+    the garbage collector tens of thousands of short-lived objects.
+    """
+    scored = []
+    outcomes = bytearray()
+    for player, answer in zip(players, answers):
+        if answer is None:
+            scored.append(score_timeout(player))
+            outcomes.append(TIMED_OUT)
+        elif answer[0] == answer_index:
+            scored.append(score_answer(player, True))
+            outcomes.append(CORRECT)
+        else:
+            scored.append(score_answer(player, False))
+            outcomes.append(WRONG)
+    return scored, bytes(outcomes)
+
+
+class Match:
+    """One match of the bracket
+
+    players is brought up to date at the end of every round (in between,
+    Tournament.player() has each player as of the last tick) and history
+    ({key: [(question_id, outcome, elapsed)]}) once the match is over. A
+    walkover has neither.
+    """
+
+    def __init__(self, stage, index, keys):
+        self.stage = stage
+        self.index = index
+        self.keys = keys
+        self.players = {}
+        self.history = {}
+        self.winner = keys[0] if len(keys) == 1 else None
+
+    @property
+    def over(self):
+        return self.winner is not None
+
+    def standings(self):
+        """Return (key, Player) pairs, best final score first and the higher seed first on a tie"""
+        return sorted(self.players.items(), key=lambda item: item[1].final_score, reverse=True)
+
+
+class Tournament:
+    """Bracket, schedule and shared game state of one tournament"""
+
+    def __init__(self, entrants, match_size=2, questions_per_round=QUESTIONS_PER_ROUND, max_rounds=MAX_ROUNDS,
+                 round_config=None, capacity=None, workers=None):
+        """entrants maps each player's key to (name, avatar), best seed first
+
+        round_config(round_num) returns the round's config dict, shaped like
+        question_bank.round_config(); by default every round of a game gets a
+        new topic and a harder difficulty. capacity caps the matches played
+        at once; workers is the scoring pool size, at most one per CPU
+        (default: 1, scoring inline).
+        """
+        self.entrants = dict(entrants)
+        self.match_size = match_size
+        self.questions_per_round = questions_per_round
+        self.max_rounds = max_rounds
+        self.round_config = round_config or self._round_config
+        self.capacity = capacity
+        self.workers = 1 if workers is None else max(1, min(workers, os.cpu_count() or 1))
+        self.stages = []
+        self.champion = None
+        self.waves = 0
+        self.round = 1
+        self.question = 0
+        self.questions = ()
+        self.config = None
+        self.phase = READY
+        self.question_details = {}
+        self.time_limit = None
+        self.asked_at = None
+        self.version = 0
+        self._wave = []
+        self._queue = []
+        self._keys = []
+        self._index = {}
+        self._matches = []
+        self._players = []
+        self._columns = []
+        self._answers = {}
+        self._active = set()
+        self._topics = []
+        self._pool = None
+        self._lock = threading.Lock()
+
+        keys = list(self.entrants)
+        self._seeds = {key: seed for seed, key in enumerate(keys)}
+        self._start_stage([[keys[seed] for seed in seeds] for seeds in seed_bracket(len(keys), match_size)])
+
+    def _round_config(self, round_num):
+        """The app's round config, on a topic not used earlier in this game"""
+        topic = next_topic(self._topics)
+        self._topics.append(topic)
+        return round_config(round_num, topic)
+
+    # Scheduling
+
+    @property
+    def stage(self):
+        """Number of the stage being played, from 1"""
+        return len(self.stages)
+
+    @property
+    def matches(self):
+        """Matches of the wave being played"""
+        return self._wave
+
+    @property
+    def pending(self):
+        """Matches of this stage still waiting for a wave"""
+        return len(self._queue)
+
+    def _start_stage(self, groups):
+        stage = len(self.stages) + 1
+        # Best seed first in every match, which is how ties are broken
+        matches = [Match(stage, index, sorted(keys, key=self._seeds.get)) for index, keys in enumerate(groups)]
+        self.stages.append(matches)
+        self._queue = [match for match in matches if not match.over]
+        self._start_wave()
+
+    def _start_wave(self):
+        """Start a new game for the next batch of matches waiting in this stage"""
+        capacity = self.capacity or len(self._queue)
+        self._wave, self._queue = self._queue[:capacity], self._queue[capacity:]
+        # Flat lists in wave order, so a tick walks its players in sequence instead of through every match
+        self._keys = [key for match in self._wave for key in match.keys]
+        self._index = {key: i for i, key in enumerate(self._keys)}
+        self._matches = [match for match in self._wave for _ in match.keys]
+        self._players = [new_player(*self.entrants[key]) for key in self._keys]
+        self._columns = []
+        for match in self._wave:
+            match.players = {key: self._players[self._index[key]] for key in match.keys}
+        self.waves += 1
+        self.round = 1
+        self.question = 0
+        self.questions = ()
+        self.phase = READY
+        self.time_limit = None
+        self._active = set()
+        self._topics = []
+        self.config = self.round_config(self.round)
+
+    def _end_wave(self):
+        """Move on to the next wave, the next stage, or the end of the tournament"""
+        if self._queue:
+            self._start_wave()
+            return
+        winners = [match.winner for match in self.stages[-1]]
+        if len(winners) > 1:
+            self._start_stage([winners[i:i + self.match_size] for i in range(0, len(winners), self.match_size)])
+            return
+        self.champion = winners[0]
+        self._wave = []
+        self._keys, self._index, self._matches, self._players, self._columns = [], {}, [], [], []
+        self.phase = FINISHED
+        self.close()
+
+    def match_of(self, key):
+        """The match a player is playing in the current wave, or None"""
+        index = self._index.get(key)
+        return None if index is None else self._matches[index]
+
+    def player(self, key):
+        """The player's Player as of the last tick, or None if they are not in the current wave"""
+        index = self._index.get(key)
+        return None if index is None else self._players[index]
+
+    def result(self, key):
+        """(outcome, elapsed) of the player's answer to the question just scored, or None"""
+        index = self._index.get(key)
+        if self.phase != ANSWERED or index is None:
+            return None
+        _, outcomes, elapsed = self._columns[-1]
+        if outcomes[index] == UNSCORED:
+            return None
+        return outcomes[index], None if math.isnan(elapsed[index]) else elapsed[index]
+
+    def history(self, key):
+        """The player's [(question_id, outcome, elapsed)] answers in the current wave"""
+        index = self._index.get(key)
+        if index is None:
+            return []
+        return [(question_id, outcomes[index], None if math.isnan(elapsed[index]) else elapsed[index])
+                for question_id, outcomes, elapsed in self._columns if outcomes[index] != UNSCORED]
+
+    def is_active(self, key):
+        """Whether the player is playing the current round"""
+        return self._index.get(key) in self._active
+
+    # Play
+
+    def deal(self, questions, time_limit=None):
+        """Start the round in every match of the wave with its question records
+
+        time_limit defaults to the round config's.
+        """
+        questions = tuple(questions)
+        with self._lock:
+            if self.phase != READY:
+                raise TournamentError(f"Cannot deal questions while {self.phase}")
+            if len(questions) < self.questions_per_round:
+                raise TournamentError(f"Need {self.questions_per_round} questions, got {len(questions)}")
+            self.questions = questions
+            self.question_details.update((q['id'], (q['category'], q['difficulty'])) for q in questions)
+            self.time_limit = self.config.get('time_limit') if time_limit is None else time_limit
+            self.asked_at = time.monotonic()
+            self.question = 0
+            self.phase = QUESTION
+            self._answers = {}
+            # Players still standing in a live match when the round starts play all of it
+            players = self._players
+            self._active = {i for i, match in enumerate(self._matches)
+                            if not match.over and not players[i].eliminated}
+            self.version += 1
+
+    def submit(self, key, question_id, choice, now=None):
+        """Buffer a player's answer for the current question, returning False if it was not accepted"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.phase != QUESTION or self.questions[self.question]['id'] != question_id:
+                return False
+            index = self._index.get(key)
+            if index not in self._active or index in self._answers:
+                return False
+            elapsed = now - self.asked_at
+            if self.time_limit is not None and elapsed > self.time_limit:
+                return False
+            self._answers[index] = (choice, elapsed)
+            return True
+
+    def tick(self):
+        """Close the current question and score every active player of every match in one batch
+
+        Returns the number of players scored; result() has each one's outcome.
+        """
+        with self._lock:
+            if self.phase != QUESTION:
+                raise TournamentError(f"Cannot score while {self.phase}")
+            return self._tick()
+
+    def expire(self, now=None):
+        """Tick the open question if its deadline has passed, returning the players scored or None"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.phase != QUESTION or self.time_limit is None or now <= self.asked_at + self.time_limit:
+                return None
+            return self._tick()
+
+    def _tick(self):
+        question = self.questions[self.question]
+        question_id = question['id']
+        answers, self._answers = self._answers, {}
+        players = self._players
+        active = sorted(self._active)
+        scored, scored_outcomes = self._score(question['answer_index'], [players[i] for i in active],
+                                              [answers.get(i) for i in active])
+        # One column of outcomes and one of answer times per question, rather than a tuple per player
+        outcomes = bytearray([UNSCORED]) * len(players)
+        for i, player, outcome in zip(active, scored, scored_outcomes):
+            players[i] = player
+            outcomes[i] = outcome
+        elapsed = array('d', [math.nan]) * len(players)
+        for i, answer in answers.items():
+            elapsed[i] = answer[1]
+        self._columns.append((question_id, bytes(outcomes), elapsed))
+        self.phase = ANSWERED
+        self.version += 1
+        return len(active)
+
+    def _score(self, answer_index, players, answers):
+        """Score inline, or chunk by chunk in the worker pool when there are several chunks"""
+        if self.workers <= 1 or len(players) <= SCORE_CHUNK_PLAYERS:
+            return score_players(answer_index, players, answers)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        starts = range(0, len(players), SCORE_CHUNK_PLAYERS)
+        scored = []
+        outcomes = []
+        for part, part_outcomes in self._pool.map(partial(score_players, answer_index),
+                                                  [players[i:i + SCORE_CHUNK_PLAYERS] for i in starts],
+                                                  [answers[i:i + SCORE_CHUNK_PLAYERS] for i in starts]):
+            scored.extend(part)
+            outcomes.append(part_outcomes)
+        return scored, b''.join(outcomes)
+
+    def next(self):
+        """Move past a revealed question; after the last one, end the round and any matches that are over"""
+        with self._lock:
+            if self.phase != ANSWERED:
+                raise TournamentError(f"Cannot advance while {self.phase}")
+            self.question += 1
+            if self.question < self.questions_per_round:
+                self.phase = QUESTION
+                self.asked_at = time.monotonic()
+                self.version += 1
+                return
+
+            players = self._players
+            index = self._index
+            for i in self._active:
+                players[i] = award_round(players[i])
+            last_round = self.round >= self.max_rounds
+            for match in self._wave:
+                if match.over:
+                    continue
+                match.players = {key: players[index[key]] for key in match.keys}
+                if last_round or all(player.eliminated for player in match.players.values()):
+                    # max() keeps the first of equal scores, and keys are best seed first
+                    match.winner = max(match.keys, key=lambda key: match.players[key].final_score)
+                    match.history = {key: self.history(key) for key in match.keys}
+            self.question = 0
+            self._active = set()
+            if all(match.over for match in self._wave):
+                self._end_wave()
+            else:
+                self.phase = ROUND_OVER
+            self.version += 1
+
+    def next_round(self):
+        """Start the next round of the wave's game; deal() then supplies its questions"""
+        with self._lock:
+            if self.phase != ROUND_OVER:
+                raise TournamentError(f"Cannot start a new round while {self.phase}")
+            self.round += 1
+            self.question = 0
+            self.questions = ()
+            self.time_limit = None
+            self.config = self.round_config(self.round)
+            self.phase = READY
+            self.version += 1
+
+    def close(self):
+        """Shut down the scoring pool"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None